@@ -1,10 +1,15 @@
 import React, { useEffect, useState } from 'react';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer, AreaChart, Area } from 'recharts';
 import { Thermometer, Droplets, Mountain, Compass, Activity, Waves, Sun, CloudRain, Wind } from 'lucide-react';
-import { ref, onValue } from "firebase/database";
+import { ref, onValue, query, orderByKey, limitToLast } from "firebase/database";
 import { database } from '../firebase';
 import axios from "axios";
 
+// Telemetry service (server/telemetry_server.py) serving downsampled sensor history
+const TELEMETRY_API = "http://localhost:8001";
+const HISTORY_POINTS = 300;
+const HISTORY_REFRESH_MS = 30000;
+
 interface SensorDashboardProps {
   selectedLake: string;
   setRiskLevel: React.Dispatch<React.SetStateAction<"low" | "medium" | "high">>;
@@ -62,9 +67,12 @@ const SensorDashboard: React.FC<SensorDashboardProps> = ({ selectedLake, setRisk
     return actualPercentage;
   };
 
+  const userId = "ggVVdic7v3gqsBkbQIRYWvlxOFo2"; // Replace with actual user ID
+
   useEffect(() => {
-    const userId = "ggVVdic7v3gqsBkbQIRYWvlxOFo2"; // Replace with actual user ID
-    const dataRef = ref(database, `UsersData/${userId}/readings`);
+    // Only the newest reading is synced; the telemetry service copies the full history from
+    // Firebase itself (server/telemetry_sync.py) and serves the graphs
+    const dataRef = query(ref(database, `UsersData/${userId}/readings`), orderByKey(), limitToLast(1));
 
     const unsubscribe = onValue(
       dataRef,
@@ -82,8 +90,6 @@ const SensorDashboard: React.FC<SensorDashboardProps> = ({ selectedLake, setRisk
           return;
         }
 
-        sensorEntries.sort(([a], [b]) => Number(a) - Number(b));
-
         const [latestTimestamp, latestValues] = sensorEntries[sensorEntries.length - 1];
         const { floatLatitude, floatLongitude, ...filteredValues } = latestValues as {
           floatLatitude: string;
@@ -92,7 +98,6 @@ const SensorDashboard: React.FC<SensorDashboardProps> = ({ selectedLake, setRisk
         };
         setLatestSensor({ timestamp: latestTimestamp, ...filteredValues });
         fetchLocationName(parseFloat(floatLatitude), parseFloat(floatLongitude));
-        updateGraphData(sensorEntries, timeRange);
         getPrediction(filteredValues);
       },
       (error) => {
@@ -101,6 +106,12 @@ const SensorDashboard: React.FC<SensorDashboardProps> = ({ selectedLake, setRisk
     );
 
     return () => unsubscribe();
+  }, []);
+
+  useEffect(() => {
+    updateGraphData(timeRange);
+    const interval = setInterval(() => updateGraphData(timeRange), HISTORY_REFRESH_MS);
+    return () => clearInterval(interval);
   }, [timeRange]);
 
   useEffect(() => {
@@ -185,50 +196,55 @@ const SensorDashboard: React.FC<SensorDashboardProps> = ({ selectedLake, setRisk
     }
   };
 
-  const updateGraphData = (data: any[], range: string) => {
-    const now = Date.now() / 1000;
-    let filteredData;
-
-    switch (range) {
-      case "hour":
-        filteredData = data.filter(([timestamp]) => now - Number(timestamp) <= 3600);
-        break;
-      case "day":
-      case "week":
-        filteredData = data.filter(([timestamp]) => now - Number(timestamp) <= 604800);
-        break;
-      case "all":
-        filteredData = data;
-        break;
-      default:
-        filteredData = data;
-    }
+  // Fetch at most HISTORY_POINTS downsampled points of some channels over a time range
+  const fetchHistory = async (range: string, channels: string[]) => {
+    const params = new URLSearchParams({ range, points: String(HISTORY_POINTS) });
+    channels.forEach(channel => params.append("channels", channel));
+    const response = await axios.get(`${TELEMETRY_API}/history/${userId}?${params}`);
+    const { timestamps, series } = response.data;
+    return timestamps.map((timestamp: number, i: number) => {
+      const point: { [key: string]: any } = { time: new Date(timestamp * 1000).toLocaleString() };
+      channels.forEach(channel => { point[channel] = series[channel].mean[i] ?? 0; });
+      return point;
+    });
+  };
 
-    const formattedFloatData = filteredData.map(([timestamp, values]) => ({
-      time: new Date(Number(timestamp) * 1000).toLocaleString(),
-      temperature: parseFloat(values.floatTemperature || 0),
-      humidity: parseFloat(values.floatHumidity || 0),
-      waterTemperature: parseFloat(values.floatWaterTemperature || 0)
-    }));
-
-    const formattedShoreData = filteredData.map(([timestamp, values]) => ({
-      time: new Date(Number(timestamp) * 1000).toLocaleString(),
-      temperature: parseFloat(values.shoreTemperature || 0),
-      humidity: parseFloat(values.shoreHumidity || 0),
-      vibration: parseFloat(values.shoreVibration || 0)
-    }));
-    const formattedGyroData = filteredData.map(([timestamp, values]) => ({
-      time: new Date(Number(timestamp) * 1000).toLocaleString(),
-      magnitude: Math.sqrt(
-        Math.pow(parseFloat(values['floatX-Axis'] || 0), 2) +
-        Math.pow(parseFloat(values['floatY-Axis'] || 0), 2) +
-        Math.pow(parseFloat(values['floatZ-Axis'] || 0), 2)
-      )
-    }));
-    setGyroGraphData(formattedGyroData);
-
-    setFloatGraphData(formattedFloatData);
-    setShoreGraphData(formattedShoreData);
+  const updateGraphData = async (range: string) => {
+    try {
+      const [floatData, shoreData, gyroData] = await Promise.all([
+        fetchHistory(range, ["air_temp_C", "air_humidity_%", "water_temp_C"]),
+        fetchHistory(range, ["ground_temp_C", "shore_humidity_%", "seismic_activity_Hz"]),
+        fetchHistory(range, ["tilt_x_deg", "tilt_y_deg", "tilt_z_deg"])
+      ]);
+
+      const formattedFloatData = floatData.map((point: any) => ({
+        time: point.time,
+        temperature: point.air_temp_C,
+        humidity: point["air_humidity_%"],
+        waterTemperature: point.water_temp_C
+      }));
+
+      const formattedShoreData = shoreData.map((point: any) => ({
+        time: point.time,
+        temperature: point.ground_temp_C,
+        humidity: point["shore_humidity_%"],
+        vibration: point.seismic_activity_Hz
+      }));
+      const formattedGyroData = gyroData.map((point: any) => ({
+        time: point.time,
+        magnitude: Math.sqrt(
+          Math.pow(point.tilt_x_deg, 2) +
+          Math.pow(point.tilt_y_deg, 2) +
+          Math.pow(point.tilt_z_deg, 2)
+        )
+      }));
+      setGyroGraphData(formattedGyroData);
+
+      setFloatGraphData(formattedFloatData);
+      setShoreGraphData(formattedShoreData);
+    } catch (error) {
+      console.error("Error fetching sensor history:", error);
+    }
   };
 
 
@@ -1,10 +1,12 @@
-import rasterio
 import numpy as np
 import plotly.graph_objects as go
-from scipy.ndimage import gaussian_filter, binary_dilation, generate_binary_structure
 import streamlit as st
 import time
 
+from flood_simulator import FloodSimulator, load_dem, prepare_dem
+from flow_routing import route
+from shallow_water import ShallowWaterSimulator, triangular_hydrograph
+
 # Streamlit app title
 st.title("DEM Water Flow Simulation for GLOF Outbreaks")
 
@@ -13,21 +15,29 @@ if 'animation_running' not in st.session_state:
     st.session_state.animation_running = False
 if 'frame_count' not in st.session_state:
     st.session_state.frame_count = 0
-if 'water_state' not in st.session_state:
-    st.session_state.water_state = None
-if 'threshold' not in st.session_state:
-    st.session_state.threshold = None
-if 'metrics_data' not in st.session_state:
-    st.session_state.metrics_data = {"coverage": [], "volume": [], "max_depth": [], "velocity": []}
+if 'simulator' not in st.session_state:
+    st.session_state.simulator = None
+    st.session_state.simulator_key = None
 if 'fig' not in st.session_state:
     st.session_state.fig = None
 
 # Sidebar controls
 dem_file = st.sidebar.file_uploader("Upload DEM GeoTIFF file:", type=["tif", "tiff"])
 downscale_factor = st.sidebar.slider("Downscaling Factor:", 1, 10, 5)
-water_level = st.sidebar.slider("Initial Water Level (% of max height):", 1, 100, 90)
-flow_speed = st.sidebar.slider("Flow Speed:", 1, 10, 5)
+solver = st.sidebar.selectbox("Solver:", ["Spreading (fast preview)", "Shallow water (breach hydrograph)"])
+if solver.startswith("Shallow"):
+    # Hydrodynamic mode: a breach hydrograph feeds one cell, depths and velocities are physical
+    cell_size = st.sidebar.number_input("DEM Cell Size (m, full resolution):", 1.0, 1000.0, 30.0)
+    breach_row = st.sidebar.slider("Breach Row (% of DEM height):", 0, 100, 50)
+    breach_col = st.sidebar.slider("Breach Column (% of DEM width):", 0, 100, 50)
+    peak_discharge = st.sidebar.number_input("Peak Breach Discharge (m³/s):", 10.0, 100000.0, 3000.0)
+    breach_minutes = st.sidebar.slider("Breach Duration (minutes):", 10, 600, 60)
+    frame_minutes = st.sidebar.slider("Simulated Minutes per Frame:", 1, 60, 5)
+else:
+    water_level = st.sidebar.slider("Initial Water Level (% of max height):", 1, 100, 90)
+    flow_speed = st.sidebar.slider("Flow Speed:", 1, 10, 5)
 animation_speed = st.sidebar.slider("Frame Delay (seconds):", 0.05, 1.0, 0.1)
+show_flow_paths = st.sidebar.checkbox("Show Flow Paths (full-resolution D8 routing)", False)
 
 # Animation control
 if st.sidebar.button('Toggle Animation'):
@@ -44,13 +54,19 @@ metrics_container = st.container()
 metrics_display = metrics_container.empty()
 
 @st.cache_data
-def load_dem(file):
-    with rasterio.open(file) as src:
-        data = src.read(1).astype(float)
-        # Handle nodata values
-        if src.nodata is not None:
-            data[data == src.nodata] = np.nan
-        return data
+def load_smoothed_dem(file, downscale_factor):
+    return prepare_dem(load_dem(file, downscale_factor))
+
+@st.cache_data
+def load_flow_paths(file, downscale_factor, percentile=99):
+    # Routing runs on the full-resolution DEM (and is cached on disk by content);
+    # only the display is downscaled, keeping any block a flow path crosses
+    accumulation = route(prepare_dem(load_dem(file)))['accumulation_d8']
+    paths = accumulation >= np.percentile(accumulation, percentile)
+    rows, cols = paths.shape
+    blocks = np.zeros((-(-rows // downscale_factor) * downscale_factor, -(-cols // downscale_factor) * downscale_factor), dtype=bool)
+    blocks[:rows, :cols] = paths
+    return blocks.reshape(blocks.shape[0] // downscale_factor, downscale_factor, -1, downscale_factor).any(axis=(1, 3))
 
 def initialize_figure():
     # Create a figure only once and store it in session state
@@ -72,7 +88,7 @@ def initialize_figure():
     )
     return fig
 
-def update_figure(fig, dem_data, water_state, threshold):
+def update_figure(fig, dem_data, water_surface, flow_paths=None):
     # Clear existing traces
     fig.data = []
     
@@ -86,106 +102,97 @@ def update_figure(fig, dem_data, water_state, threshold):
     ))
     
     # Water surface
-    water_height = np.where(water_state > 0, threshold, np.nan)
+    water_state = np.isfinite(water_surface).astype(float)
     
     fig.add_trace(go.Surface(
-        z=water_height,
+        z=water_surface,
         surfacecolor=water_state,
         colorscale='Blues',
         showscale=False,
         opacity=0.7,
         name="Water"
     ))
+
+    # Flow paths (cells draining the largest upstream areas)
+    if flow_paths is not None:
+        fig.add_trace(go.Surface(
+            z=np.where(flow_paths, dem_data + 1, np.nan),
+            colorscale=[[0, 'red'], [1, 'red']],
+            showscale=False,
+            opacity=0.9,
+            name="Flow Paths"
+        ))
     
     return fig
 
 if dem_file is not None:
     try:
         # Load and prepare DEM data
-        dem_data = load_dem(dem_file)
-        dem_data = dem_data[::downscale_factor, ::downscale_factor]
-        dem_smoothed = gaussian_filter(dem_data, sigma=1)
-        
-        # Calculate threshold based on water level percentage
-        st.session_state.threshold = np.nanpercentile(dem_smoothed, water_level)
-        
-        # Calculate flow directions and magnitude
-        dy, dx = np.gradient(-dem_smoothed)
-        flow_magnitude = np.sqrt(dx**2 + dy**2)
-        
-        # Initialize water state if not exists
-        if st.session_state.water_state is None:
-            # Start with water at high elevations (above threshold)
-            st.session_state.water_state = (dem_smoothed >= st.session_state.threshold).astype(float)
-        
+        dem_smoothed = load_smoothed_dem(dem_file, downscale_factor)
+
+        # The simulation engines live in flood_simulator.py and shallow_water.py; this app only drives and draws them.
+        # A new DEM, resolution or scenario starts a new simulation.
+        if solver.startswith("Shallow"):
+            key = (dem_file.file_id, downscale_factor, cell_size, breach_row, breach_col, peak_discharge, breach_minutes)
+            if st.session_state.simulator_key != key:
+                rows, cols = dem_smoothed.shape
+                breach = (min(breach_row * rows // 100, rows - 1), min(breach_col * cols // 100, cols - 1))
+                hydrograph = triangular_hydrograph(peak_discharge, breach_minutes * 60)
+                st.session_state.simulator = ShallowWaterSimulator(dem_smoothed, cell_size * downscale_factor, breach, hydrograph)
+                st.session_state.simulator_key = key
+            simulator = st.session_state.simulator
+            simulator.frame_seconds = frame_minutes * 60
+        else:
+            key = (dem_file.file_id, downscale_factor, water_level)
+            if st.session_state.simulator_key != key:
+                st.session_state.simulator = FloodSimulator(dem_smoothed, water_level, flow_speed, cell_area=downscale_factor**2)
+                st.session_state.simulator_key = key
+            simulator = st.session_state.simulator
+            simulator.flow_speed = flow_speed
+        flow_paths = load_flow_paths(dem_file, downscale_factor) if show_flow_paths else None
+
         # Initialize figure if not exists
         if st.session_state.fig is None:
             st.session_state.fig = initialize_figure()
-        
+
         # Initial update of the figure
-        fig = update_figure(st.session_state.fig, dem_smoothed, st.session_state.water_state, st.session_state.threshold)
+        fig = update_figure(st.session_state.fig, dem_smoothed, simulator.water_surface(), flow_paths)
         plot_output = plot_display.plotly_chart(fig, use_container_width=True)
-        
+
         # Visualization loop
         while st.session_state.animation_running:
             status_text.text(f"Simulation Running - Frame {st.session_state.frame_count}")
-            
+
             # Simulate water flow
-            water_state = st.session_state.water_state.copy()
-            kernel = generate_binary_structure(2, 2)
-            previous_water = water_state.copy()
-            
-            for _ in range(flow_speed):
-                # Expand water to neighbors
-                water_state = binary_dilation(water_state, kernel)
-                # Water can only flow to areas below the threshold
-                water_state = water_state & (dem_smoothed <= st.session_state.threshold)
-            
-            st.session_state.water_state = water_state.astype(float)
-            
+            metrics = simulator.step()
+
             # Update figure with new water state
-            fig = update_figure(st.session_state.fig, dem_smoothed, st.session_state.water_state, st.session_state.threshold)
+            fig = update_figure(st.session_state.fig, dem_smoothed, simulator.water_surface(), flow_paths)
             plot_display.plotly_chart(fig, use_container_width=True)
-            
-            # Calculate metrics
-            # 1. Water coverage area
-            cell_area = downscale_factor**2  # Simplified cell area calculation
-            covered_area = np.sum(water_state) * cell_area
-            
-            # 2. Water volume calculation
-            water_depths = np.where(water_state > 0, 
-                                   st.session_state.threshold - dem_smoothed,
-                                   0)
-            water_depths = np.maximum(water_depths, 0)  # Ensure no negative depths
-            water_volume = np.sum(water_depths) * cell_area
-            
-            # 3. Maximum water depth
-            max_depth = np.max(water_depths) if np.any(water_state) else 0
-            
-            # 4. Approximate flow velocity based on change between frames
-            flow_changed = np.sum(np.abs(water_state - previous_water))
-            velocity_estimate = flow_changed * flow_speed / (np.sum(previous_water) + 1e-6)
-            
-            # Store metrics in session state
-            st.session_state.metrics_data["coverage"].append(covered_area)
-            st.session_state.metrics_data["volume"].append(water_volume)
-            st.session_state.metrics_data["max_depth"].append(max_depth)
-            st.session_state.metrics_data["velocity"].append(velocity_estimate)
-            
+
             # Display metrics
             metrics_text = f"""
             ### Simulation Metrics (Frame {st.session_state.frame_count}):
-            - Water Coverage: {covered_area:.1f} m²
-            - Water Volume: {water_volume:.1f} m³
-            - Maximum Water Depth: {max_depth:.2f} m
-            - Relative Flow Velocity: {velocity_estimate:.4f}
+            - Water Coverage: {metrics['coverage']:.1f} m²
+            - Water Volume: {metrics['volume']:.1f} m³
+            - Maximum Water Depth: {metrics['max_depth']:.2f} m
+            - Relative Flow Velocity: {metrics['velocity']:.4f}
+            """
+            if solver.startswith("Shallow"):
+                metrics_text = f"""
+            ### Simulation Metrics ({metrics['time'] / 60:.0f} min simulated):
+            - Flooded Area (> 0.1 m deep): {metrics['coverage']:.1f} m²
+            - Water Volume: {metrics['volume']:.1f} m³
+            - Maximum Water Depth: {metrics['max_depth']:.2f} m
+            - Maximum Flow Velocity: {metrics['velocity']:.2f} m/s
+            - Breach Discharge: {metrics['inflow']:.1f} m³/s
             """
             metrics_display.markdown(metrics_text)
-            
+
             # Increment frame counter
             st.session_state.frame_count += 1
             time.sleep(animation_speed)
-            
+
         status_text.text("Simulation Stopped")
     except Exception as e:
         st.error(f"An error occurred: {e}")
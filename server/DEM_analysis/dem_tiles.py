@@ -0,0 +1,178 @@
+import os
+
+import numpy as np
+from scipy.ndimage import gaussian_filter
+
+# Rows/columns per tile; a float32 tile (16 MB) plus its halo and temporaries stays under 100 MB
+TILE_SIZE = 2048
+
+# Bytes of full-resolution band read at once by read_band
+READ_CHUNK_BYTES = 16 * 2**20
+
+# Histogram bins per pass of tiled_percentile
+PERCENTILE_BINS = 1 << 16
+
+def tile_windows(shape, tile=TILE_SIZE, halo=0):
+    """
+    Cover a raster with tiles that overlap their neighbours by `halo` cells.
+
+    Args:
+        shape: (rows, cols) of the raster
+        tile: Rows/columns per tile (without the halo)
+        halo: Extra cells read on every side (clipped at the raster edge)
+
+    Yields:
+        outer: slices of the tile plus its halo (what to read)
+        inner: slices of the tile within `outer` (what is valid after filtering)
+        target: slices of the tile in the raster (where `inner` goes)
+    """
+    rows, cols = shape
+    for r0 in range(0, rows, tile):
+        r1 = min(r0 + tile, rows)
+        for c0 in range(0, cols, tile):
+            c1 = min(c0 + tile, cols)
+            o_r0, o_r1 = max(r0 - halo, 0), min(r1 + halo, rows)
+            o_c0, o_c1 = max(c0 - halo, 0), min(c1 + halo, cols)
+            yield (
+                (slice(o_r0, o_r1), slice(o_c0, o_c1)),
+                (slice(r0 - o_r0, r1 - o_r0), slice(c0 - o_c0, c1 - o_c0)),
+                (slice(r0, r1), slice(c0, c1)),
+            )
+
+def raster_memmap(path, shape, dtype=np.float32, fill=None):
+    """
+    Create a memory-mapped .npy raster (reopen it with np.load(path, mmap_mode='r')).
+
+    Args:
+        path: Output .npy file (its directory is created if missing)
+        shape: (rows, cols)
+        dtype: Element type
+        fill: Initial value of every cell (default: zeros)
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    raster = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+    if fill is not None:
+        for _, _, target in tile_windows(raster.shape):
+            raster[target] = fill
+    return raster
+
+def read_band(src, downscale_factor=1, out=None):
+    """
+    First band of an open rasterio dataset as float32, every n-th row and column.
+
+    The band is never read whole: rows are read in chunks of about
+    READ_CHUNK_BYTES and decimated as they arrive, so memory holds only the
+    output plus one chunk. When the file has an overview of exactly this
+    factor (gdaladdo), GDAL serves the reduced rows from it instead of
+    reading full resolution at all.
+
+    Args:
+        src: Open rasterio dataset
+        downscale_factor: Keep every n-th row and column
+        out: Array to fill (e.g. a raster_memmap), shaped like the result
+
+    Returns:
+        2D float32 array of ceil(height / n) x ceil(width / n), nodata as NaN
+    """
+    from rasterio.enums import Resampling
+    from rasterio.windows import Window
+
+    factor = downscale_factor
+    rows, cols = -(-src.height // factor), -(-src.width // factor)
+    data = np.empty((rows, cols), dtype=np.float32) if out is None else out
+    if data.shape != (rows, cols):
+        raise ValueError(f"Output shape {data.shape} does not match the decimated band ({rows}, {cols})")
+    use_overview = factor > 1 and factor in src.overviews(1)
+
+    chunk_rows = max(1, READ_CHUNK_BYTES // (4 * factor * src.width))
+    for row in range(0, rows, chunk_rows):
+        end = min(row + chunk_rows, rows)
+        window = Window(0, row * factor, src.width, min(end * factor, src.height) - row * factor)
+        if use_overview:
+            chunk = src.read(1, window=window, out_shape=(end - row, cols), out_dtype=np.float32,
+                             resampling=Resampling.nearest)
+        else:
+            chunk = src.read(1, window=window, out_dtype=np.float32)[::factor, ::factor]
+        if src.nodata is not None:
+            chunk[chunk == np.float32(src.nodata)] = np.nan
+        data[row:end] = chunk
+    return data
+
+def tiled_gaussian_filter(data, sigma, out=None, tile=TILE_SIZE, truncate=4.0):
+    """
+    gaussian_filter of a raster, one haloed tile at a time.
+
+    Each tile is read with a halo of the kernel radius, so its interior is
+    exactly what filtering the whole raster gives (both passes of the
+    separable filter only see cells inside the halo), while memory holds
+    one tile at a time. `data` and `out` may be memory-mapped.
+
+    Args:
+        data: 2D array
+        sigma: Standard deviation of the Gaussian kernel (cells)
+        out: Output array (default: a new float32 array)
+        tile: Rows/columns per tile
+        truncate: Kernel radius in standard deviations (as in gaussian_filter)
+
+    Returns:
+        The filtered raster (`out`)
+    """
+    out = np.empty(data.shape, dtype=np.float32) if out is None else out
+    halo = int(truncate * float(sigma) + 0.5)
+    for outer, inner, target in tile_windows(data.shape, tile, halo):
+        block = np.asarray(data[outer], dtype=np.float32)
+        out[target] = gaussian_filter(block, sigma=sigma, truncate=truncate)[inner]
+    return out
+
+def tiled_percentile(data, q, tile=TILE_SIZE):
+    """
+    np.nanpercentile(data, q) of a raster read one tile at a time.
+
+    Exact, not an estimate: a histogram pass finds the bins holding the
+    two order statistics the linear percentile interpolates between, and
+    a second pass collects only the values in those bins.
+    """
+    if data.size <= tile * tile:
+        return float(np.nanpercentile(data, q))
+
+    low, high, count = np.inf, -np.inf, 0
+    for _, _, target in tile_windows(data.shape, tile):
+        block = data[target]
+        valid = block[~np.isnan(block)]
+        if valid.size:
+            low, high, count = min(low, valid.min()), max(high, valid.max()), count + valid.size
+    if count == 0:
+        return float('nan')
+
+    # Ranks of the two neighbouring order statistics (as np.percentile's 'linear' method)
+    rank = q / 100 * (count - 1)
+    first = int(np.floor(rank))
+    second = min(first + 1, count - 1)
+
+    edges = np.linspace(low, high, PERCENTILE_BINS + 1)
+    counts = np.zeros(PERCENTILE_BINS, dtype=np.int64)
+    for _, _, target in tile_windows(data.shape, tile):
+        block = data[target]
+        counts += np.histogram(block[~np.isnan(block)], bins=edges)[0]
+    cumulative = np.cumsum(counts)
+    first_bin = int(np.searchsorted(cumulative, first, side='right'))
+    second_bin = int(np.searchsorted(cumulative, second, side='right'))
+    below = int(cumulative[first_bin - 1]) if first_bin else 0
+
+    # np.histogram puts a value equal to an edge in the upper bin (the last bin is closed)
+    lower_edge = edges[first_bin]
+    upper_edge = edges[second_bin + 1]
+    selected = []
+    for _, _, target in tile_windows(data.shape, tile):
+        block = data[target]
+        if second_bin + 1 == PERCENTILE_BINS:
+            chosen = (block >= lower_edge) & (block <= upper_edge)
+        else:
+            chosen = (block >= lower_edge) & (block < upper_edge)
+        selected.append(block[chosen])
+    selected = np.sort(np.concatenate(selected))
+    pair = selected[[first - below, second - below]]
+    # Interpolate exactly as np.nanpercentile does
+    return float(np.percentile(pair, (rank - first) * 100))
@@ -0,0 +1,421 @@
+import argparse
+import itertools
+import os
+import tempfile
+import time
+from functools import lru_cache
+from multiprocessing import Pool
+
+import numpy as np
+
+from dem_tiles import TILE_SIZE, raster_memmap, read_band, tile_windows, tiled_gaussian_filter, tiled_percentile
+
+# Metrics recorded after every frame
+METRICS = ["coverage", "volume", "max_depth", "velocity"]
+
+# Marks cells the water never reaches in an arrival-time raster
+NEVER = -1
+
+def load_dem(file, downscale_factor=1, out=None):
+    """
+    Read the first band of a DEM GeoTIFF.
+
+    The band is read in row chunks (or from a matching overview) and
+    decimated on the fly, see dem_tiles.read_band, so a downscaled load
+    never holds the full-resolution band.
+
+    Args:
+        file: Path or file-like object (e.g. a Streamlit upload)
+        downscale_factor: Keep every n-th row and column
+        out: Array to fill instead of a new one, e.g. a raster_memmap for
+            DEMs larger than memory
+
+    Returns:
+        2D float32 array, nodata cells as NaN
+    """
+    import rasterio
+
+    with rasterio.open(file) as src:
+        return read_band(src, downscale_factor, out)
+
+def prepare_dem(dem_data, sigma=1, out=None):
+    """Smooth the DEM to reduce terrain noise before simulating (tile by tile, into `out` if given)."""
+    return tiled_gaussian_filter(dem_data, sigma, out)
+
+def arrival_times(floodable, seeds, start=None):
+    """
+    Number of 8-connected spreading steps until water reaches each cell.
+
+    A multi-source breadth-first flood from the seed cells through the
+    floodable cells: every cell enters the frontier once, so the whole
+    raster costs O(cells) instead of one full-grid dilation per step.
+    Cell k steps away is exactly the cell k binary dilations (each masked
+    to the floodable cells) would first reach.
+
+    Args:
+        floodable: Boolean raster of cells water may enter
+        seeds: Boolean raster of the cells holding water at step 0
+        start: Optional int raster of the step each seed starts at (seeds
+            joining later, as tiled_arrival_times passes in from neighbouring tiles)
+
+    Returns:
+        int32 raster of arrival steps (0 for seeds, NEVER if unreachable)
+    """
+    rows, cols = floodable.shape
+    # Pad with a dry border so neighbour offsets of flat indices never wrap around
+    width = cols + 2
+    open_cells = np.zeros((rows + 2, width), dtype=bool)
+    open_cells[1:-1, 1:-1] = floodable
+    open_cells = open_cells.ravel()
+    offsets = np.array([-width - 1, -width, -width + 1, -1, 1, width - 1, width, width + 1])
+
+    arrival = np.full(open_cells.size, NEVER, dtype=np.int32)
+    padded_seeds = np.zeros((rows + 2, width), dtype=bool)
+    padded_seeds[1:-1, 1:-1] = seeds
+    seed_cells = np.flatnonzero(padded_seeds)
+    if start is None:
+        seed_steps = np.zeros(seed_cells.size, dtype=np.int64)
+    else:
+        padded_start = np.zeros((rows + 2, width), dtype=np.int64)
+        padded_start[1:-1, 1:-1] = start
+        seed_steps = padded_start.ravel()[seed_cells]
+        order = np.argsort(seed_steps, kind='stable')
+        seed_cells, seed_steps = seed_cells[order], seed_steps[order]
+
+    frontier = np.empty(0, dtype=np.int64)
+    step = int(seed_steps[0]) if seed_cells.size else 0
+    joined = 0  # seeds already started
+    while frontier.size or joined < seed_cells.size:
+        # Seeds starting at this step join the frontier (unless the water got there first)
+        due = int(np.searchsorted(seed_steps, step, side='right'))
+        joining = seed_cells[joined:due]
+        joining = joining[arrival[joining] == NEVER]
+        joined = due
+        arrival[joining] = step
+        open_cells[joining] = False
+        frontier = np.concatenate([frontier, joining])
+        if not frontier.size:
+            if joined == seed_cells.size:
+                break
+            step = int(seed_steps[joined])
+            continue
+
+        step += 1
+        neighbours = (frontier[:, None] + offsets).ravel()
+        frontier = np.unique(neighbours[open_cells[neighbours]])
+        open_cells[frontier] = False
+        arrival[frontier] = step
+
+    return arrival.reshape(rows + 2, width)[1:-1, 1:-1]
+
+def tiled_arrival_times(dem, threshold, out, tile=TILE_SIZE):
+    """
+    arrival_times of the cells at or above `threshold` spreading through
+    the cells at or below it, solved one tile at a time.
+
+    Each tile is solved with a one-cell halo: halo cells the water already
+    reached (from neighbouring tiles) join as seeds at their arrival step.
+    Whenever a tile improves an arrival on its border, its neighbours are
+    solved again, until nothing changes, so the result equals arrival_times
+    on the whole raster while memory holds one tile at a time.
+
+    Args:
+        dem: Smoothed DEM (may be memory-mapped)
+        threshold: Water level
+        out: int32 raster to fill (e.g. a raster_memmap)
+        tile: Rows/columns per tile
+
+    Returns:
+        `out`
+    """
+    windows = list(tile_windows(dem.shape, tile, halo=1))
+    tile_cols = -(-dem.shape[1] // tile)
+    for _, _, target in windows:
+        out[target] = np.where(dem[target] >= threshold, 0, NEVER)
+
+    pending = set(range(len(windows)))
+    while pending:
+        border_changed = set()
+        for index in sorted(pending):
+            outer, inner, target = windows[index]
+            known = np.array(out[outer])
+            solved = arrival_times(np.asarray(dem[outer]) <= threshold, known != NEVER, known)[inner]
+            current = known[inner]
+            improved = (solved != NEVER) & ((current == NEVER) | (solved < current))
+            if not improved.any():
+                continue
+            out[target] = np.where(improved, solved, current)
+            # Only border cells are in the neighbours' halos
+            improved[1:-1, 1:-1] = False
+            if improved.any():
+                border_changed.add(index)
+
+        pending = set()
+        for index in border_changed:
+            row, col = divmod(index, tile_cols)
+            for dr, dc in itertools.product((-1, 0, 1), repeat=2):
+                neighbour = (row + dr) * tile_cols + col + dc
+                if (dr or dc) and 0 <= col + dc < tile_cols and 0 <= neighbour < len(windows):
+                    pending.add(neighbour)
+    return out
+
+class FloodSimulator:
+    """
+    Frame-by-frame water spread over a DEM, independent of any UI.
+
+    The water level is a percentile of the terrain height. Water starts on
+    the cells at or above it and, every frame, spreads `flow_speed` cells
+    into the 8-connected neighbourhood, only onto terrain at or below the
+    level. step() advances one frame, run() many (or until nothing changes).
+
+    The arrival step of every cell is solved once up front (see
+    arrival_times), so a frame is a threshold of that raster rather than
+    flow_speed full-grid dilations.
+
+    With `tile` set, the DEM may be a memory-mapped raster larger than
+    memory: the arrival and water rasters are memory-mapped in `workdir`
+    and every frame is computed tile by tile.
+    """
+
+    def __init__(self, dem, water_level=90, flow_speed=5, cell_area=1.0, tile=None, workdir=None):
+        """
+        Args:
+            dem: Smoothed DEM (see prepare_dem)
+            water_level: Water level as a percentile of the terrain height (1-100)
+            flow_speed: Dilation steps per frame
+            cell_area: Ground area of one cell, for coverage and volume
+            tile: Rows/columns per tile for out-of-core runs (None keeps everything in memory)
+            workdir: Directory of the memory-mapped rasters of a tiled run (default: a new temporary one)
+        """
+        self.dem = dem
+        self.flow_speed = flow_speed
+        self.cell_area = cell_area
+        self.tile = tile
+        if tile is not None:
+            self.threshold = tiled_percentile(dem, water_level, tile)
+            self.workdir = workdir or tempfile.mkdtemp(prefix='flood_')
+            arrival = raster_memmap(os.path.join(self.workdir, 'arrival.npy'), dem.shape, np.int32)
+            self.arrival = tiled_arrival_times(dem, self.threshold, arrival, tile)
+            self.water_state = raster_memmap(os.path.join(self.workdir, 'water_state.npy'), dem.shape, bool)
+            self.reset()
+            return
+
+        self.threshold = np.nanpercentile(dem, water_level)
+        # Cells the water may reach, and the depth it would have there
+        self.floodable = dem <= self.threshold
+        self.depth_below_level = np.maximum(np.nan_to_num(self.threshold - dem, nan=0.0), 0)
+        # Start with water at high elevations (above threshold)
+        self.seeds = dem >= self.threshold
+        self.arrival = arrival_times(self.floodable, self.seeds)
+        # Final extent: every floodable cell the water can reach
+        self.extent = self.floodable & (self.arrival != NEVER)
+        self.reset()
+
+    def reset(self):
+        if self.tile is None:
+            self.water_state = self.seeds
+        else:
+            for _, _, target in tile_windows(self.dem.shape, self.tile):
+                self.water_state[target] = self.dem[target] >= self.threshold
+        self.steps = 0  # spreading steps taken so far (flow_speed per frame)
+        self.frame_count = 0
+        self.converged = False
+        self.metrics_data = {name: [] for name in METRICS}
+
+    def step(self):
+        """
+        Advance one frame.
+
+        Returns:
+            Dictionary of the frame's metrics
+        """
+        self.steps += self.flow_speed
+        self.frame_count += 1
+        if self.tile is not None:
+            metrics = self._step_tiles()
+        else:
+            previous_water = self.water_state
+            # Water has reached every floodable cell whose arrival step has passed
+            water_state = self.extent & (self.arrival <= self.steps)
+
+            self.water_state = water_state
+            self.converged = np.array_equal(water_state, previous_water)
+            metrics = self.frame_metrics(previous_water)
+
+        for name in METRICS:
+            self.metrics_data[name].append(metrics[name])
+        return metrics
+
+    def frame_metrics(self, previous_water):
+        """Coverage, volume, max depth and relative velocity of the current water state."""
+        water_depths = np.where(self.water_state, self.depth_below_level, 0)
+        # Approximate flow velocity based on change between frames
+        flow_changed = np.count_nonzero(self.water_state != previous_water)
+        return {
+            "coverage": float(np.count_nonzero(self.water_state) * self.cell_area),
+            "volume": float(water_depths.sum() * self.cell_area),
+            "max_depth": float(water_depths.max()) if self.water_state.any() else 0.0,
+            "velocity": flow_changed * self.flow_speed / (np.count_nonzero(previous_water) + 1e-6)
+        }
+
+    def _step_tiles(self):
+        """step() of a tiled run: update the water raster and sum the metrics tile by tile."""
+        covered = changed = previous = 0
+        volume, max_depth = 0.0, 0.0
+        for _, _, target in tile_windows(self.dem.shape, self.tile):
+            dem = np.asarray(self.dem[target])
+            arrival = np.asarray(self.arrival[target])
+            previous_water = np.array(self.water_state[target])
+            # Reached floodable cells whose arrival step has passed (dem <= threshold is False for NaN)
+            water = (dem <= self.threshold) & (arrival != NEVER) & (arrival <= self.steps)
+            self.water_state[target] = water
+
+            depths = self.threshold - dem[water]
+            covered += np.count_nonzero(water)
+            changed += np.count_nonzero(water != previous_water)
+            previous += np.count_nonzero(previous_water)
+            volume += float(depths.sum(dtype=np.float64))
+            max_depth = max(max_depth, float(depths.max())) if depths.size else max_depth
+
+        self.converged = changed == 0
+        return {
+            "coverage": float(covered * self.cell_area),
+            "volume": float(volume * self.cell_area),
+            "max_depth": max_depth,
+            "velocity": changed * self.flow_speed / (previous + 1e-6)
+        }
+
+    def water_surface(self):
+        """Water surface elevation (the water level) where there is water, NaN elsewhere."""
+        return np.where(self.water_state, self.threshold, np.nan)
+
+    def run(self, frames=None, max_frames=10000):
+        """
+        Advance without pausing between frames.
+
+        Args:
+            frames: Number of frames to run; None runs until the water stops spreading
+            max_frames: Safety limit for the run to convergence
+
+        Returns:
+            Metrics of the last frame
+        """
+        metrics = None
+        limit = frames if frames is not None else max_frames
+        for _ in range(limit):
+            metrics = self.step()
+            if frames is None and self.converged:
+                break
+        return metrics
+
+@lru_cache(maxsize=4)
+def _scenario_dem(path, downscale_factor, sigma):
+    # Scenarios of the same lake handled by one worker share the loaded DEM
+    return prepare_dem(load_dem(path, downscale_factor), sigma)
+
+def _tiled_dem_dir(workdir, path, downscale_factor, sigma):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(workdir, f"{name}_x{downscale_factor}_s{sigma:g}")
+
+def prepare_tiled_dem(path, downscale_factor, sigma, workdir, tile=TILE_SIZE):
+    """
+    Load and smooth a DEM into a memory-mapped raster, tile by tile.
+
+    The smoothed DEM is kept as <workdir>/<dem>_x<downscale>_s<sigma>/smoothed.npy
+    and reused by later runs; neither it nor the decimated band need fit in memory.
+
+    Returns:
+        Path of the smoothed raster (open it with np.load(path, mmap_mode='r'))
+    """
+    import rasterio
+
+    directory = _tiled_dem_dir(workdir, path, downscale_factor, sigma)
+    smoothed_path = os.path.join(directory, 'smoothed.npy')
+    if os.path.exists(smoothed_path):
+        return smoothed_path
+
+    raw_path = os.path.join(directory, 'dem.npy')
+    partial_path = os.path.join(directory, 'smoothed.partial.npy')
+    with rasterio.open(path) as src:
+        shape = (-(-src.height // downscale_factor), -(-src.width // downscale_factor))
+        dem = read_band(src, downscale_factor, raster_memmap(raw_path, shape))
+    smoothed = tiled_gaussian_filter(dem, sigma, raster_memmap(partial_path, shape), tile)
+    smoothed.flush()
+    del dem, smoothed
+    # Rename last, so a half-written raster is never picked up
+    os.replace(partial_path, smoothed_path)
+    os.remove(raw_path)
+    return smoothed_path
+
+def simulate_scenario(scenario):
+    """
+    Run one (dem path, water level, flow speed) scenario to convergence.
+
+    Returns:
+        Dictionary of the scenario, final metrics, frame count and wall time
+    """
+    path, water_level, flow_speed, downscale_factor, sigma, tile, workdir = scenario
+    start = time.perf_counter()
+    if tile is None:
+        dem = _scenario_dem(path, downscale_factor, sigma)
+        simulator = FloodSimulator(dem, water_level, flow_speed, cell_area=downscale_factor ** 2)
+    else:
+        # Out-of-core: the DEM was prepared by main(); the scenario's rasters go next to it
+        directory = _tiled_dem_dir(workdir, path, downscale_factor, sigma)
+        dem = np.load(os.path.join(directory, 'smoothed.npy'), mmap_mode='r')
+        simulator = FloodSimulator(dem, water_level, flow_speed, cell_area=downscale_factor ** 2, tile=tile,
+                                   workdir=os.path.join(directory, f"level{water_level:g}_speed{flow_speed}"))
+    metrics = simulator.run()
+    return {
+        'dem': path,
+        'water_level': water_level,
+        'flow_speed': flow_speed,
+        'frames': simulator.frame_count,
+        'converged': simulator.converged,
+        **(metrics or {}),
+        'wall_time_s': time.perf_counter() - start
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run flood scenarios on DEMs without the Streamlit viewer")
+    parser.add_argument('dems', nargs='+', help="DEM GeoTIFF files (one per lake)")
+    parser.add_argument('--water-level', type=float, nargs='+', default=[90], help="Water levels (% of max height)")
+    parser.add_argument('--flow-speed', type=int, nargs='+', default=[5], help="Flow speeds (dilation steps per frame)")
+    parser.add_argument('--downscale', type=int, default=1, help="Keep every n-th DEM row and column")
+    parser.add_argument('--sigma', type=float, default=1, help="Gaussian smoothing of the DEM")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--output', default='flood_scenarios.csv', help="CSV of the final metrics per scenario")
+    parser.add_argument('--tiled', action='store_true',
+                        help="Out-of-core: keep DEMs and results in memory-mapped rasters and process them in tiles")
+    parser.add_argument('--tile', type=int, default=TILE_SIZE, help="Rows/columns per tile of a tiled run")
+    parser.add_argument('--workdir', default='flood_rasters', help="Directory of the memory-mapped rasters of a tiled run")
+    args = parser.parse_args()
+
+    tile = args.tile if args.tiled else None
+    if tile is not None:
+        # Prepared once, before the workers start, so no two workers write the same raster
+        for path in args.dems:
+            print(f"Preparing {path} -> {prepare_tiled_dem(path, args.downscale, args.sigma, args.workdir, tile)}")
+
+    # Lake-major order, so each worker's chunk mostly reuses one cached DEM
+    scenarios = list(itertools.product(args.dems, args.water_level, args.flow_speed, [args.downscale], [args.sigma],
+                                       [tile], [args.workdir]))
+    workers = min(args.workers or os.cpu_count() or 1, len(scenarios))
+    print(f"Running {len(scenarios)} scenarios with {workers} workers")
+
+    results = []
+    if workers == 1:
+        results = [simulate_scenario(scenario) for scenario in scenarios]
+    else:
+        with Pool(workers) as pool:
+            results = pool.map(simulate_scenario, scenarios)
+
+    import pandas as pd
+
+    results = pd.DataFrame(results)
+    results.to_csv(args.output, index=False)
+    print(results.to_string(index=False))
+    print(f"Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,10 @@ import numpy as np
 import cv2
 import matplotlib.pyplot as plt
 from skimage import measure
-from oauthlib.oauth2 import BackendApplicationClient
-from requests_oauthlib import OAuth2Session
 import joblib
+from sentinel_downloader import SentinelHubClient, SENTINEL_HUB_URL
+from sar_raster import FLOAT32_TIFF_FORMAT, tiff_to_npy, open_scene, save_scene
+from acquisition_planner import load_lake_catalog, plan_requests, summarize_plan, extract_lake, lake_dir
 
 # Sentinel Hub credentials
 CLIENT_ID = "e2ad423b-45f6-43ce-bbba-82e16cdc7643"
@@ -17,121 +18,212 @@ INSTANCE_ID = "5c81bb48-6971-4aae-b9a0-5b8e15f1f1f5"
 # South Lhonak Lake region coordinates
 BBOX = [88.15, 27.95, 88.20, 28.00]  # [minLon, minLat, maxLon, maxLat]
 
+# Lake inventory (GeoJSON polygons with a `name` property) for multi-lake runs
+LAKE_CATALOG = "lakes.geojson"
+
 class SentinelDataManager:
-    def __init__(self, client_id, client_secret, instance_id, bbox):
+    def __init__(self, client_id, client_secret, instance_id, bbox, base_url=SENTINEL_HUB_URL, max_workers=8, raw=False):
         self.client_id = client_id
         self.client_secret = client_secret
         self.instance_id = instance_id
         self.bbox = bbox
-        self.token = None
+        # raw=True ingests float32 backscatter (.npy scenes) instead of 8-bit PNGs
+        self.raw = raw
+        self.extension = "npy" if raw else "png"
+        self.client = SentinelHubClient(client_id, client_secret, instance_id, base_url=base_url, max_workers=max_workers)
         self.output_dir = os.path.join(os.getcwd(), "glof_data")
         os.makedirs(self.output_dir, exist_ok=True)
     
+    @property
+    def token(self):
+        return self.client.token
+    
     def authenticate(self):
         """Authenticate with Sentinel Hub and get access token"""
-        auth_url = "https://services.sentinel-hub.com/oauth/token"
-        client = BackendApplicationClient(client_id=self.client_id)
-        oauth = OAuth2Session(client=client)
-        token = oauth.fetch_token(token_url=auth_url, client_secret=self.client_secret)
-        self.token = token['access_token']
-        return self.token
+        return self.client.authenticate()
+    
+    def search_catalog(self, bbox, start_date, end_date, limit=None):
+        """
+        Search the Catalog API across all pages, keeping at most `limit` items.
+        
+        One extra item is requested so a truncated result can be reported
+        instead of silently dropping the newest acquisitions.
+        
+        Args:
+            bbox: [minLon, minLat, maxLon, maxLat]
+            start_date: First day (YYYY-MM-DD)
+            end_date: Last day (YYYY-MM-DD)
+            limit: Maximum number of catalog items (None for all pages)
+        
+        Returns:
+            List of catalog features
+        """
+        features = self.client.search_catalog(bbox, start_date, end_date,
+                                              max_items=None if limit is None else limit + 1)
+        if limit is not None and len(features) > limit:
+            print(f"⚠️  Catalog results truncated to {limit} items; pass limit=None to fetch all pages")
+            features = features[:limit]
+        return features
     
-    def get_available_dates(self, start_date="2023-01-01", end_date=None, limit=30):
-        """Get available image dates from Sentinel Hub Catalog API"""
+    def get_available_dates(self, start_date="2023-01-01", end_date=None, limit=None):
+        """Get available image dates from Sentinel Hub Catalog API (all pages, or up to `limit` items)"""
         if not end_date:
             end_date = datetime.now().strftime("%Y-%m-%d")
         
-        if not self.token:
-            self.authenticate()
-        
-        catalog_url = "https://services.sentinel-hub.com/api/v1/catalog/search"
-        
-        payload = {
-            "bbox": self.bbox,
-            "datetime": f"{start_date}T00:00:00Z/{end_date}T23:59:59Z",
-            "collections": ["sentinel-1-grd"],
-            "limit": limit
-        }
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": f"Bearer {self.token}"
-        }
-        
-        response = requests.post(catalog_url, json=payload, headers=headers)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if "features" in data and len(data["features"]) > 0:
-                # Extract dates and sort chronologically
-                image_dates = [feature["properties"]["datetime"].split("T")[0] 
-                              for feature in data["features"]]
-                image_dates.sort()  # Sort dates chronologically
-                print(f"✅ Found {len(image_dates)} Sentinel-1 images.")
-                return image_dates
-            else:
-                print("❌ No Sentinel-1 images found in the given time range.")
-                return []
-        else:
-            print(f"❌ Failed to query Sentinel Hub Catalog API: {response.text}")
+        try:
+            features = self.search_catalog(self.bbox, start_date, end_date, limit)
+        except requests.RequestException as e:
+            print(f"❌ Failed to query Sentinel Hub Catalog API: {e}")
+            return []
+        
+        if not features:
+            print("❌ No Sentinel-1 images found in the given time range.")
             return []
+        
+        # Extract dates (several passes can share a day) and sort chronologically
+        image_dates = sorted({feature["properties"]["datetime"].split("T")[0] for feature in features})
+        print(f"✅ Found {len(image_dates)} Sentinel-1 image dates.")
+        return image_dates
+    
+    def image_path(self, date, layer="IW_VV"):
+        return os.path.join(self.output_dir, f"sentinel1_{date}_{layer}.{self.extension}")
+    
+    def _fetch(self, jobs):
+        """
+        Run download jobs concurrently.
+        
+        In raw mode each job fetches a float32 TIFF next to its target .npy
+        path and converts it, so downloaded scenes can be memory-mapped.
+        
+        Returns:
+            List of file paths (None for failures) in job order
+        """
+        if not self.raw:
+            return self.client.download_many(jobs)
+        
+        tiff_jobs = [
+            {**job, "file_path": job["file_path"][:-len(".npy")] + ".tif", "image_format": FLOAT32_TIFF_FORMAT}
+            for job in jobs if not os.path.exists(job["file_path"])
+        ]
+        self.client.download_many(tiff_jobs)
+        
+        paths = []
+        for job in jobs:
+            npy_path = job["file_path"]
+            tiff_path = npy_path[:-len(".npy")] + ".tif"
+            if not os.path.exists(npy_path) and os.path.exists(tiff_path):
+                tiff_to_npy(tiff_path, npy_path)
+            paths.append(npy_path if os.path.exists(npy_path) else None)
+        return paths
     
     def download_image(self, date, layer="IW_VV", resolution=1024):
         """Download Sentinel-1 image for a specific date"""
-        if not self.token:
-            self.authenticate()
-            
-        wms_url = f"https://services.sentinel-hub.com/ogc/wms/{self.instance_id}"
-        
-        params = {
-            "SERVICE": "WMS",
-            "VERSION": "1.1.1",
-            "REQUEST": "GetMap",
-            "LAYERS": layer,
-            "STYLES": "",
-            "FORMAT": "image/png",
-            "WIDTH": resolution,
-            "HEIGHT": resolution,
-            "BBOX": ",".join(map(str, self.bbox)),
-            "CRS": "EPSG:4326",
-            "TIME": date
-        }
-        
-        file_path = os.path.join(self.output_dir, f"sentinel1_{date}_{layer}.png")
+        file_path = self.image_path(date, layer)
         
         # If file already exists, skip download
         if os.path.exists(file_path):
             print(f"✅ Image already exists: {file_path}")
             return file_path
-            
-        image_response = requests.get(wms_url, params=params, stream=True)
         
-        if image_response.status_code == 200:
-            with open(file_path, "wb") as f:
-                for chunk in image_response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+        file_path = self._fetch([{"date": date, "bbox": self.bbox, "file_path": file_path,
+                                  "layer": layer, "width": resolution, "height": resolution}])[0]
+        if file_path:
             print(f"✅ Downloaded: {file_path}")
-            return file_path
-        else:
-            print(f"❌ Failed to download image for {date}: {image_response.text}")
-            return None
+        return file_path
     
-    def download_time_series(self, start_date="2023-01-01", end_date=None, layer="IW_VV", limit=100):
-        """Download a time series of Sentinel-1 images"""
+    def download_time_series(self, start_date="2023-01-01", end_date=None, layer="IW_VV", limit=None, resolution=1024):
+        """Download a time series of Sentinel-1 images concurrently (already downloaded dates are skipped)"""
         dates = self.get_available_dates(start_date, end_date, limit)
-        image_paths = []
         
-        for date in dates:
-            image_path = self.download_image(date, layer)
-            if image_path:
-                image_paths.append((date, image_path))
+        jobs = [
+            {"date": date, "bbox": self.bbox, "file_path": self.image_path(date, layer),
+             "layer": layer, "width": resolution, "height": resolution}
+            for date in dates
+        ]
+        pending = sum(not os.path.exists(job["file_path"]) for job in jobs)
+        print(f"⬇️  Downloading {pending} new images ({len(jobs) - pending} already present)...")
+        
+        paths = self._fetch(jobs)
+        return [(date, path) for date, path in zip(dates, paths) if path]
+    
+    def download_inventory(self, catalog_path=LAKE_CATALOG, start_date="2023-01-01", end_date=None,
+                           layer="IW_VV", limit=None, resolution_m=10):
+        """
+        Download a time series for every lake in a catalog.
+        
+        Lakes are grouped into shared, tiled requests by the planner; each
+        downloaded tile is stored once under glof_data/_tiles and every lake is
+        cut out into its own directory (glof_data/<lake>/sentinel1_<date>_<layer>.png,
+        or .npy in raw mode, where only the lake's window of each tile is read).
+        
+        Returns:
+            Dictionary of lake name -> list of (date, image_path)
+        """
+        if not end_date:
+            end_date = datetime.now().strftime("%Y-%m-%d")
+        
+        plan = plan_requests(load_lake_catalog(catalog_path), resolution_m=resolution_m)
+        summary = summarize_plan(plan)
+        print(f"🗺️  {summary['lakes']} lakes -> {summary['groups']} groups, "
+              f"{summary['requests']} requests ({summary['pixels'] / 1e6:.1f} MP) per date")
+        
+        results = {lake['name']: [] for group in plan for lake in group['lakes']}
+        
+        for group in plan:
+            try:
+                features = self.search_catalog(group['bbox'], start_date, end_date, limit)
+            except requests.RequestException as e:
+                print(f"❌ Failed to query Sentinel Hub Catalog API for {group['id']}: {e}")
+                continue
+            dates = sorted({feature["properties"]["datetime"].split("T")[0] for feature in features})
+            
+            # Only fetch tiles for dates where some lake in the group is still missing
+            def lake_path(lake, date):
+                return os.path.join(lake_dir(self.output_dir, lake['name']), f"sentinel1_{date}_{layer}.{self.extension}")
+            
+            missing_dates = [d for d in dates if any(not os.path.exists(lake_path(lake, d)) for lake in group['lakes'])]
+            tile_dir = os.path.join(self.output_dir, "_tiles", group['id'])
+            jobs = [
+                {"date": date, "bbox": tile['bbox'], "layer": layer,
+                 "file_path": os.path.join(tile_dir, f"{tile['id']}_{date}_{layer}.{self.extension}"),
+                 "width": tile['width'], "height": tile['height']}
+                for date in missing_dates for tile in group['tiles']
+            ]
+            print(f"⬇️  {group['id']}: {len(dates)} dates, {len(jobs)} tile requests")
+            self._fetch(jobs)
+            
+            for date in dates:
+                tile_images = {}
+                for tile in group['tiles']:
+                    tile_path = os.path.join(tile_dir, f"{tile['id']}_{date}_{layer}.{self.extension}")
+                    if os.path.exists(tile_path):
+                        # Raw tiles are memory-mapped, so cropping reads only the lake windows
+                        tile_images[tile['id']] = open_scene(tile_path) if self.raw else cv2.imread(tile_path, cv2.IMREAD_GRAYSCALE)
                 
-        return image_paths
+                for lake in group['lakes']:
+                    path = lake_path(lake, date)
+                    if not os.path.exists(path):
+                        if len(tile_images) < len(group['tiles']) or any(img is None for img in tile_images.values()):
+                            continue
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        lake_img = extract_lake(group, lake, tile_images)
+                        if self.raw:
+                            save_scene(path, lake_img)
+                        else:
+                            cv2.imwrite(path, lake_img)
+                    results[lake['name']].append((date, path))
+        
+        return results
 
 # Example usage:
 if __name__ == "__main__":
     manager = SentinelDataManager(CLIENT_ID, CLIENT_SECRET, INSTANCE_ID, BBOX)
-    # Download the last 10 available images
-    images = manager.download_time_series(limit=100)
-    print(f"Downloaded {len(images)} images")
\ No newline at end of file
+    if os.path.exists(LAKE_CATALOG):
+        # Cover the whole lake inventory with a planned set of tiled requests
+        lake_images = manager.download_inventory(LAKE_CATALOG, limit=None)
+        for name, images in lake_images.items():
+            print(f"{name}: {len(images)} images")
+    else:
+        # Download every available image (all catalog pages)
+        images = manager.download_time_series(limit=None)
+        print(f"Downloaded {len(images)} images")
\ No newline at end of file
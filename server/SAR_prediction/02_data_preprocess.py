@@ -1,106 +1,415 @@
 import os
+import csv
+import argparse
+from multiprocessing import Pool
 import cv2
 import numpy as np
-from skimage import filters, measure
 from pathlib import Path
+from feature_cache import FeatureCache, fingerprint
+from sar_raster import open_scene, to_db, otsu_threshold_float, save_mask
+
+# Preprocessing parameters; any change invalidates the feature cache
+PREPROCESS_PARAMS = {
+    'version': 1,
+    'blur_ksize': 5,
+    'morph_ksize': 3,
+    'open_iterations': 2,
+    'close_iterations': 2,
+}
+
+FEATURE_CACHE_PATH = 'features/feature_cache.sqlite'
 
 def create_directories():
     """Create necessary directories if they don't exist."""
     os.makedirs('preprocess_glof', exist_ok=True)
     os.makedirs('features', exist_ok=True)
 
-def preprocess_image(image_path):
+def read_image(image_path, window=None):
+    """
+    Read a scene as a 2D array.
+    
+    8-bit PNGs are read with OpenCV; float32 .npy scenes (see sar_raster) are
+    memory-mapped, so with a window only that part of the file is read.
+    
+    Args:
+        image_path: Path to a .png or .npy scene
+        window: Optional (col0, row0, col1, row1) pixel window
+        
+    Returns:
+        uint8 or float32 image, or None if it could not be read
+    """
+    if str(image_path).endswith('.npy'):
+        return open_scene(str(image_path), window)
+    
+    img = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+    if img is not None and window is not None:
+        col0, row0, col1, row1 = window
+        img = img[row0:row1, col0:col1]
+    return img
+
+def preprocess_image(image_path, window=None):
     """
     Preprocess SAR images for glacial lake detection.
     
     Args:
-        image_path: Path to the input image
+        image_path: Path to the input image (.png or float32 .npy)
+        window: Optional (col0, row0, col1, row1) pixel window to process
         
     Returns:
         processed_img: Processed binary image
         features: Dictionary containing area and perimeter
     """
     # Read image
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    img = read_image(image_path, window)
     
     if img is None:
         print(f"Error: Could not read image {image_path}")
         return None, None
     
-    # Apply Gaussian blur to reduce noise
-    blurred = cv2.GaussianBlur(img, (5, 5), 0)
+    return preprocess_array(img)
+
+def preprocess_array(img):
+    """
+    Segment the lake in an in-memory scene.
+    
+    Args:
+        img: uint8 grayscale image, or float32 linear backscatter
+        
+    Returns:
+        processed_img: Processed binary image
+        features: Dictionary containing area and perimeter
+    """
+    ksize = PREPROCESS_PARAMS['blur_ksize']
     
-    # Apply Otsu's thresholding to segment water bodies (lakes appear bright in SAR images)
-    _, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if img.dtype == np.uint8:
+        # Apply Gaussian blur to reduce noise
+        blurred = cv2.GaussianBlur(img, (ksize, ksize), 0)
+        
+        # Apply Otsu's thresholding to segment water bodies (lakes appear bright in SAR images)
+        _, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    else:
+        # Float backscatter: threshold in dB at full dynamic range, no 8-bit quantization
+        blurred = cv2.GaussianBlur(to_db(img), (ksize, ksize), 0)
+        binary = cv2.compare(blurred, otsu_threshold_float(blurred), cv2.CMP_GT)
     
     # Apply morphological operations to clean up the binary image
-    kernel = np.ones((3, 3), np.uint8)
-    opening = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel, iterations=2)
+    kernel = np.ones((PREPROCESS_PARAMS['morph_ksize'], PREPROCESS_PARAMS['morph_ksize']), np.uint8)
+    opening = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel, iterations=PREPROCESS_PARAMS['open_iterations'])
     
     # Fill small holes
-    closing = cv2.morphologyEx(opening, cv2.MORPH_CLOSE, kernel, iterations=2)
+    closing = cv2.morphologyEx(opening, cv2.MORPH_CLOSE, kernel, iterations=PREPROCESS_PARAMS['close_iterations'])
+    
+    return extract_lake_mask(closing)
+
+# 4-neighbour perimeter weights, indexed by the border-pixel neighbourhood code
+# (same scheme as skimage.measure.perimeter)
+_CROSS_KERNEL = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+_PERIMETER_CODES = np.array([[10, 2, 10], [2, 1, 2], [10, 2, 10]], dtype=np.float32)
+_PERIMETER_WEIGHTS = np.zeros(50, dtype=np.float64)
+_PERIMETER_WEIGHTS[[5, 7, 15, 17, 25, 27]] = 1
+_PERIMETER_WEIGHTS[[21, 33]] = np.sqrt(2)
+_PERIMETER_WEIGHTS[[13, 23]] = (1 + np.sqrt(2)) / 2
+
+def lake_perimeter(mask):
+    """
+    Perimeter of a binary region, equal to skimage.measure.perimeter(mask, 4).
     
-    # Label connected components
-    labeled_img = measure.label(closing)
-    props = measure.regionprops(labeled_img)
+    Args:
+        mask: uint8 mask (0/255 or 0/1), ideally cropped to the region's bounding box
+    """
+    binary = (mask > 0).view(np.uint8)
+    eroded = cv2.erode(binary, _CROSS_KERNEL, borderType=cv2.BORDER_CONSTANT, borderValue=0)
+    border = cv2.subtract(binary, eroded)
+    codes = cv2.filter2D(border, -1, _PERIMETER_CODES, borderType=cv2.BORDER_CONSTANT)
+    return float(np.bincount(codes.ravel(), minlength=50)[:50] @ _PERIMETER_WEIGHTS)
+
+def extract_lake_mask(binary):
+    """
+    Keep the largest connected component of a binary mask (assumed to be the lake).
     
-    # Sort regions by area (descending) and keep only the largest one (assuming it's the lake)
-    if props:
-        props.sort(key=lambda x: x.area, reverse=True)
-        lake_label = props[0].label
-        
-        # Create a mask for the lake
-        lake_mask = np.zeros_like(labeled_img)
-        lake_mask[labeled_img == lake_label] = 255
+    Uses OpenCV's connected-component stats for areas, so only the chosen
+    component's perimeter is computed, on its bounding-box crop. Results match
+    skimage's label/regionprops (8-connectivity, 4-neighbour perimeter).
+    
+    Args:
+        binary: uint8 binary image (0/255)
         
-        # Calculate features
-        area = props[0].area
-        perimeter = props[0].perimeter
+    Returns:
+        lake_mask: uint8 mask (0/255) of the largest component
+        features: Dictionary containing area and perimeter
+    """
+    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8, ltype=cv2.CV_32S)
+    
+    # Label 0 is the background
+    if num_labels < 2:
+        return binary, {'area': 0, 'perimeter': 0, 'area_perimeter_ratio': 0}
+    
+    lake_label = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+    x, y, w, h, area = stats[lake_label]
+    
+    # Create a mask for the lake (uint8 0/255 directly, no intermediate label-sized copies)
+    lake_mask = cv2.compare(labels, lake_label, cv2.CMP_EQ)
+    
+    # Calculate features; perimeter only on the lake's bounding box
+    area = float(area)
+    perimeter = lake_perimeter(lake_mask[y:y + h, x:x + w])
+    
+    features = {
+        'area': area,
+        'perimeter': perimeter,
+        'area_perimeter_ratio': area / perimeter if perimeter > 0 else 0,
+    }
+    
+    return lake_mask, features
+
+FEATURE_COLUMNS = ['area', 'perimeter', 'area_perimeter_ratio', 'filename', 'lake']
+
+# Folder 01_data_acquistion downloads into: scenes at the top level, or one subdirectory per lake
+IMAGE_FOLDER = 'glof_data'
+
+# `lake` value of top-level scenes (the single-lake layout); 03_SAR_prediction uses the same name
+DEFAULT_LAKE = 'lake'
+
+def scene_lake(img_path, folder=IMAGE_FOLDER):
+    """Lake directory a scene was found in, or None for a scene at the top level of `folder`."""
+    parent = Path(img_path).parent
+    return None if parent == Path(folder) else parent.name
+
+def mask_path(img_path, folder=IMAGE_FOLDER):
+    """
+    Where the lake mask of a scene is saved.
+    
+    Masks mirror the image layout: preprocess_glof/<stem>_mask.npz for a
+    top-level scene, preprocess_glof/<lake>/<stem>_mask.npz for a scene in a
+    lake directory (so same-date scenes of different lakes don't collide).
+    """
+    lake = scene_lake(img_path, folder)
+    directory = 'preprocess_glof' if lake is None else os.path.join('preprocess_glof', lake)
+    return os.path.join(directory, f"{Path(img_path).stem}_mask.npz")
+
+def process_image_file(img_path):
+    """
+    Preprocess one image and save its mask (worker entry point).
+    
+    Returns:
+        Features dictionary including 'filename' and 'lake', or None if the image could not be read
+    """
+    img_name = Path(img_path).stem
+    processed_img, features = preprocess_image(str(img_path))
+    
+    if processed_img is None:
+        return None
+    
+    # Save processed mask bit-packed (1 bit per pixel)
+    path = mask_path(img_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    save_mask(path, processed_img)
+    
+    # Add filename and lake to features
+    features['filename'] = img_name
+    features['lake'] = scene_lake(img_path) or DEFAULT_LAKE
+    return features
+
+def _init_worker():
+    # Each worker handles one image at a time; avoid oversubscribing cores with OpenCV threads
+    cv2.setNumThreads(1)
+
+class FeatureWriter:
+    """
+    Append feature rows to a CSV or Parquet file as they are produced.
+    
+    CSV rows are written and flushed one at a time (optionally appended to
+    an existing file); Parquet rows are buffered into row groups of
+    `row_group_size`.
+    """
+    
+    def __init__(self, path, columns=FEATURE_COLUMNS, row_group_size=256, append=False):
+        self.path = path
+        self.columns = columns
+        self.row_group_size = row_group_size
+        self.parquet = path.endswith('.parquet')
+        self.rows_written = 0
+        self._buffer = []
         
-        features = {
-            'area': area,
-            'perimeter': perimeter,
-            'area_perimeter_ratio': area / perimeter if perimeter > 0 else 0,
-        }
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            
+            self._schema = pa.schema([
+                ('area', pa.float64()),
+                ('perimeter', pa.float64()),
+                ('area_perimeter_ratio', pa.float64()),
+                ('filename', pa.string()),
+                ('lake', pa.string()),
+            ] + [(col, pa.string()) for col in columns if col not in FEATURE_COLUMNS])
+            self._writer = pq.ParquetWriter(path, self._schema)
+        else:
+            self._file = open(path, 'a' if append else 'w', newline='')
+            self._writer = csv.DictWriter(self._file, fieldnames=columns, extrasaction='ignore', lineterminator='\n')
+            if not append:
+                self._writer.writeheader()
+    
+    def write(self, features):
+        self.rows_written += 1
+        if self.parquet:
+            self._buffer.append(features)
+            if len(self._buffer) >= self.row_group_size:
+                self._flush_parquet()
+        else:
+            self._writer.writerow(features)
+            self._file.flush()
+    
+    def _flush_parquet(self):
+        import pyarrow as pa
         
-        return lake_mask.astype(np.uint8), features
+        if self._buffer:
+            table = pa.Table.from_pylist(self._buffer, schema=self._schema)
+            self._writer.write_table(table)
+            self._buffer = []
     
-    return closing, {'area': 0, 'perimeter': 0, 'area_perimeter_ratio': 0}
+    def close(self):
+        if self.parquet:
+            self._flush_parquet()
+            self._writer.close()
+        else:
+            self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
 
-def process_all_images():
-    """Process all images in the glof_data folder and extract features."""
+def iter_features(image_paths, workers=None, chunksize=None):
+    """
+    Yield features for each image, in input order.
+    
+    Args:
+        image_paths: Sorted list of image paths
+        workers: Number of worker processes (None for all cores, 1 for serial)
+        chunksize: Images handed to a worker at a time (None picks one from the workload)
+    """
+    workers = workers or os.cpu_count() or 1
+    
+    if workers == 1 or len(image_paths) == 1:
+        for img_path in image_paths:
+            yield img_path, process_image_file(img_path)
+        return
+    
+    if chunksize is None:
+        # A few chunks per worker balances load without excessive IPC
+        chunksize = max(1, len(image_paths) // (workers * 4))
+    
+    with Pool(processes=workers, initializer=_init_worker) as pool:
+        # imap keeps results in input order while still streaming them back
+        yield from zip(image_paths, pool.imap(process_image_file, image_paths, chunksize=chunksize))
+
+def list_images(folder=IMAGE_FOLDER):
+    """
+    Sorted 8-bit PNG and float32 .npy scenes in a folder.
+    
+    Scenes are taken from the top level (single-lake layout) and from each
+    lake directory one level down (multi-lake layout of download_inventory).
+    Directories starting with '_' (e.g. the shared `_tiles`) are skipped.
+    """
+    root = Path(folder)
+    if not root.is_dir():
+        return []
+    directories = [root] + sorted(d for d in root.iterdir() if d.is_dir() and not d.name.startswith('_'))
+    return sorted(
+        path for directory in directories
+        for pattern in ('*.png', '*.npy')
+        for path in directory.glob(pattern)
+    )
+
+def _read_scene_keys(path):
+    """(lake, filename) of the rows already present in a features CSV (None if it doesn't exist)."""
+    if not os.path.exists(path):
+        return None
+    with open(path, newline='') as f:
+        return [(row.get('lake'), row['filename']) for row in csv.DictReader(f)]
+
+def process_all_images(workers=None, chunksize=None, output_path='features/lake_features.csv', cache_path=FEATURE_CACHE_PATH):
+    """
+    Process all images in the glof_data folder (and its lake directories) and extract features.
+    
+    Images whose content hash and preprocessing parameters are already in the
+    feature cache are not reprocessed. New or changed images are processed by
+    a pool of worker processes and each feature row is written to
+    `output_path` (.csv or .parquet) as soon as it is ready. If the existing
+    CSV already holds exactly the cached rows, new rows are appended to it;
+    otherwise it is rewritten from the cache first.
+    
+    Args:
+        workers: Number of worker processes (None for all cores, 1 for serial)
+        chunksize: Images handed to a worker at a time
+        output_path: Features file to write
+        cache_path: SQLite feature cache (None to disable caching)
+    """
     create_directories()
-    image_paths = sorted(Path('glof_data').glob('*.png'))
+    image_paths = list_images(IMAGE_FOLDER)
     
     if not image_paths:
-        print("No images found in glof_data folder")
+        print(f"No images found in {IMAGE_FOLDER} folder")
         return
     
-    all_features = []
+    cache = FeatureCache(cache_path, fingerprint(PREPROCESS_PARAMS)) if cache_path else None
+    cached_rows, new_paths, hashes = [], [], {}
     
-    for i, img_path in enumerate(image_paths):
-        print(f"Processing image {i+1}/{len(image_paths)}: {img_path}")
-        
-        # Get image name without extension
-        img_name = img_path.stem
-        
-        # Preprocess the image
-        processed_img, features = preprocess_image(str(img_path))
-        
-        if processed_img is not None:
-            # Save processed image
-            output_path = f"preprocess_glof/{img_name}_processed.png"
-            cv2.imwrite(output_path, processed_img)
+    for img_path in image_paths:
+        if cache is None:
+            new_paths.append(img_path)
+            continue
+        hashes[img_path] = cache.file_hash(img_path)
+        features = cache.get(hashes[img_path])
+        if features is None:
+            new_paths.append(img_path)
+        else:
+            cached_rows.append({**features, 'filename': img_path.stem, 'lake': scene_lake(img_path) or DEFAULT_LAKE})
+    
+    print(f"{len(cached_rows)} images cached, {len(new_paths)} to process")
+    
+    append = (
+        not output_path.endswith('.parquet')
+        and _read_scene_keys(output_path) == [(row['lake'], row['filename']) for row in cached_rows]
+    )
+    
+    try:
+        with FeatureWriter(output_path, append=append) as writer:
+            if not append:
+                for row in cached_rows:
+                    writer.write(row)
             
-            # Add filename to features
-            features['filename'] = img_name
-            all_features.append(features)
+            for i, (img_path, features) in enumerate(iter_features(new_paths, workers, chunksize)):
+                print(f"Processed image {i+1}/{len(new_paths)}: {img_path}")
+                if features is not None:
+                    writer.write(features)
+                    if cache is not None:
+                        cache.put(hashes[img_path], {k: v for k, v in features.items() if k not in ('filename', 'lake')})
+    finally:
+        if cache is not None:
+            cache.close()
     
-    # Save features to a CSV file
-    import pandas as pd
-    features_df = pd.DataFrame(all_features)
-    features_df.to_csv('features/lake_features.csv', index=False)
-    print(f"Processed {len(image_paths)} images. Features saved to features/lake_features.csv")
+    print(f"Processed {len(new_paths)} new images ({len(image_paths)} total). Features saved to {output_path}")
 
 if __name__ == "__main__":
-    process_all_images()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract lake features from SAR images in glof_data")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores, 1 for serial)")
+    parser.add_argument('--chunksize', type=int, default=None, help="Images per worker task")
+    parser.add_argument('--output', default='features/lake_features.csv', help="Output features file (.csv or .parquet)")
+    parser.add_argument('--no-cache', action='store_true', help="Reprocess every image instead of using the feature cache")
+    parser.add_argument('--stack', action='store_true', help="Process co-registered scenes together as one (N, H, W) stack")
+    parser.add_argument('--batch-size', type=int, default=32, help="Scenes per batch in stack mode")
+    args = parser.parse_args()
+    
+    if args.stack:
+        from stack_preprocess import process_stack_folder
+        
+        process_stack_folder(output_path=args.output, batch_size=args.batch_size)
+    else:
+        process_all_images(
+            workers=args.workers,
+            chunksize=args.chunksize,
+            output_path=args.output,
+            cache_path=None if args.no_cache else FEATURE_CACHE_PATH
+        )
@@ -1,16 +1,20 @@
+import argparse
 import os
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score, accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout
-import joblib
+import sys
 from datetime import datetime, timedelta
-import seaborn as sns
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from model_registry import ModelRegistry
+from lstm_runtime import export_model
+from lstm_report import REPORTS_DIR, save_artifact, render_report, render_in_background
 
 def load_features():
     """Load features from the CSV file."""
@@ -18,39 +22,146 @@ def load_features():
     if not os.path.exists(features_path):
         raise FileNotFoundError(f"Features file not found at {features_path}. Run preprocessing first.")
     
-    return pd.read_csv(features_path)
+    # Lake names stay strings even when they look numeric
+    return pd.read_csv(features_path, dtype={LAKE_COLUMN: str})
+
+# Lake characteristics modelled by the LSTM
+FEATURES = ['area', 'perimeter', 'area_perimeter_ratio']
+
+# Column naming the lake of each row (written by 02_data_preprocess and stack_preprocess)
+LAKE_COLUMN = 'lake'
+
+# Lake name for feature files written before the lake column existed (all rows are one lake)
+DEFAULT_LAKE = 'lake'
+
+# Margin (as a fraction of the observed range) added on both sides of the
+# scaler bounds, so later scenes still fall inside the persisted scaling
+SCALER_HEADROOM = 0.25
+
+# Registry name of the trained LSTM
+MODEL_NAME = 'glof_lstm_model'
+
+def sliding_windows(series, sequence_length=3, horizon=1):
+    """
+    Input windows and targets of a time series, as zero-copy strided views.
+    
+    Args:
+        series: (T, features) array, in time order
+        sequence_length: Time steps in each input window
+        horizon: How many steps after the window the target lies (1 = next step)
+        
+    Returns:
+        X: (n, sequence_length, features) view, n = T - sequence_length - horizon + 1
+        y: (n, features) view; y[i] is the value `horizon` steps after X[i]
+    """
+    n = len(series) - sequence_length - horizon + 1
+    if n <= 0:
+        return np.empty((0, sequence_length, series.shape[1]), series.dtype), np.empty((0, series.shape[1]), series.dtype)
+    
+    # sliding_window_view puts the window axis last: (T - sequence_length + 1, features, sequence_length)
+    windows = np.lib.stride_tricks.sliding_window_view(series, sequence_length, axis=0)
+    X = windows[:n].transpose(0, 2, 1)
+    y = series[sequence_length + horizon - 1:]
+    return X, y
+
+def fit_scaler(data, headroom=SCALER_HEADROOM):
+    """
+    Fit a MinMaxScaler whose bounds extend `headroom` x range past the data.
+    
+    The scaler is persisted with the model and reused by incremental
+    updates, so the margin keeps new (e.g. larger) lakes close to [0, 1]
+    without ever refitting and shifting earlier predictions.
+    """
+    data_min, data_max = data.min(axis=0), data.max(axis=0)
+    margin = (data_max - data_min) * headroom
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    scaler.fit(np.vstack([data_min - margin, data_max + margin]))
+    return scaler
 
-def prepare_time_series(df):
+def prepare_time_series(df, sequence_length=3, horizon=1, scaler=None):
     """
     Prepare the time series data for LSTM model.
     
+    All lakes are scaled together and stored back to back in one contiguous
+    series; windows are never materialized. Instead the valid window start
+    indices (windows that don't cross from one lake into the next) are kept,
+    and windows are gathered batch by batch (see make_dataset).
+    
     Args:
-        df: DataFrame containing lake features
+        df: DataFrame containing lake features and their `lake` (all one lake if the column is missing)
+        sequence_length: Time steps used to predict the target
+        horizon: Steps ahead of the window that is predicted
+        scaler: Previously fitted scaler to reuse (a new one is fitted if None)
         
     Returns:
-        X: Input sequences
-        y: Target values
+        sequences: Dictionary with the scaled `series`, the `filenames` of its
+            rows, window `starts`, per-lake `lakes` {name: {'X', 'y', 'last_seen'}}
+            views, `sequence_length` and `horizon`
         scaler: Fitted scaler for inverse transformation
     """
-    # Sort by filename (assuming filenames contain date information)
-    df = df.sort_values('filename')
+    # Sort by lake, then filename (assuming filenames contain date information)
+    if LAKE_COLUMN in df.columns:
+        df = df.sort_values([LAKE_COLUMN, 'filename'])
+        lake_names = df[LAKE_COLUMN].astype(str).values
+    else:
+        df = df.sort_values('filename')
+        lake_names = np.full(len(df), DEFAULT_LAKE)
     
     # Extract features
-    data = df[['area', 'perimeter', 'area_perimeter_ratio']].values
+    data = df[FEATURES].values
     
     # Normalize the data
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    scaled_data = scaler.fit_transform(data)
+    if scaler is None:
+        scaler = fit_scaler(data)
+    series = np.ascontiguousarray(scaler.transform(data), dtype=np.float32)
+    filenames = df['filename'].astype(str).values
+    
+    # Per-lake windows are views into the shared series
+    lakes = {}
+    starts = []
+    boundaries = np.flatnonzero(lake_names[1:] != lake_names[:-1]) + 1
+    for begin, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(series)]):
+        X, y = sliding_windows(series[begin:end], sequence_length, horizon)
+        lakes[lake_names[begin]] = {'X': X, 'y': y, 'last_seen': filenames[end - 1]}
+        starts.append(np.arange(begin, begin + len(X)))
+    
+    sequences = {
+        'series': series,
+        'filenames': filenames,
+        'starts': np.concatenate(starts) if starts else np.empty(0, dtype=np.int64),
+        'lakes': lakes,
+        'sequence_length': sequence_length,
+        'horizon': horizon
+    }
+    return sequences, scaler
+
+def gather_windows(sequences, starts):
+    """Materialize the windows (and targets) beginning at the given start indices."""
+    starts = np.asarray(starts)
+    target = sequences['sequence_length'] + sequences['horizon'] - 1
+    X = sequences['series'][starts[:, None] + np.arange(sequences['sequence_length'])]
+    return X, sequences['series'][starts + target]
+
+def make_dataset(sequences, starts, batch_size=4, shuffle=False, seed=42):
+    """
+    tf.data pipeline of (window, target) batches.
+    
+    Only the start indices are sliced and shuffled; each batch gathers its
+    windows from the shared series, so memory stays O(series length)
+    whatever the sequence length.
+    """
+    series = tf.constant(sequences['series'])
+    offsets = tf.range(sequences['sequence_length'])
+    target = sequences['sequence_length'] + sequences['horizon'] - 1
     
-    # Create sequences for LSTM
-    X, y = [], []
-    sequence_length = 3  # Use 3 time steps to predict the next
+    dataset = tf.data.Dataset.from_tensor_slices(np.asarray(starts, dtype=np.int32))
+    if shuffle:
+        dataset = dataset.shuffle(len(starts), seed=seed, reshuffle_each_iteration=True)
     
-    for i in range(len(scaled_data) - sequence_length):
-        X.append(scaled_data[i:i + sequence_length])
-        y.append(scaled_data[i + sequence_length])
+    def gather(batch_starts):
+        return tf.gather(series, batch_starts[:, None] + offsets), tf.gather(series, batch_starts + target)
     
-    return np.array(X), np.array(y), scaler
+    return dataset.batch(batch_size).map(gather, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
 
 def build_lstm_model(input_shape):
     """Build and compile the LSTM model."""
@@ -124,13 +235,14 @@ def calculate_classification_metrics(y_true, y_pred, threshold=0.05):
         'f1_score': None    # Not applicable for this approach
     }
 
-def train_model(X, y):
+def train_model(sequences, batch_size=4):
     """Train the LSTM model."""
-    # Split the data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Split the window start indices; windows are gathered per batch
+    train_starts, test_starts = train_test_split(sequences['starts'], test_size=0.2, random_state=42)
+    X_test, y_test = gather_windows(sequences, test_starts)
     
     # Build the model
-    model = build_lstm_model((X.shape[1], X.shape[2]))
+    model = build_lstm_model((sequences['sequence_length'], len(FEATURES)))
     
     # Early stopping to prevent overfitting
     early_stopping = tf.keras.callbacks.EarlyStopping(
@@ -141,16 +253,15 @@ def train_model(X, y):
     
     # Train the model
     history = model.fit(
-        X_train, y_train,
+        make_dataset(sequences, train_starts, batch_size, shuffle=True),
         epochs=100,
-        batch_size=4,
-        validation_data=(X_test, y_test),
+        validation_data=make_dataset(sequences, test_starts, batch_size),
         callbacks=[early_stopping],
         verbose=1
     )
     
     # Evaluate the model
-    y_pred = model.predict(X_test)
+    y_pred = model.predict(X_test, batch_size=batch_size)
     
     # Calculate regression metrics
     mse = mean_squared_error(y_test, y_pred)
@@ -180,41 +291,6 @@ def train_model(X, y):
         print(f"  Recall: {classification_metrics.get('recall', 'N/A'):.4f}")
         print(f"  F1 Score: {classification_metrics.get('f1_score', 'N/A'):.4f}")
     
-    # Plot training history
-    plt.figure(figsize=(12, 6))
-    plt.subplot(1, 2, 1)
-    plt.plot(history.history['loss'], label='Training Loss')
-    plt.plot(history.history['val_loss'], label='Validation Loss')
-    plt.title('Model Loss')
-    plt.ylabel('Loss')
-    plt.xlabel('Epoch')
-    plt.legend()
-    
-    # Plot predictions vs actual
-    plt.subplot(1, 2, 2)
-    plt.scatter(y_test[:, 0], y_pred[:, 0])
-    plt.plot([min(y_test[:, 0]), max(y_test[:, 0])], [min(y_test[:, 0]), max(y_test[:, 0])], 'r--')
-    plt.xlabel('Actual')
-    plt.ylabel('Predicted')
-    plt.title('Actual vs Predicted Values (Area)')
-    plt.savefig('model_evaluation.png')
-    
-    # Plot confusion matrix if available
-    if 'confusion_matrix' in classification_metrics and classification_metrics['confusion_matrix'] is not None:
-        plt.figure(figsize=(8, 6))
-        sns.heatmap(
-            classification_metrics['confusion_matrix'], 
-            annot=True, 
-            fmt='d',
-            cmap='Blues',
-            xticklabels=['No Change', 'Significant Change'],
-            yticklabels=['No Change', 'Significant Change']
-        )
-        plt.xlabel('Predicted')
-        plt.ylabel('Actual')
-        plt.title('Confusion Matrix - Significant Area Changes')
-        plt.savefig('confusion_matrix.png')
-    
     # Combine all metrics
     all_metrics = {
         'mse': mse,
@@ -226,6 +302,68 @@ def train_model(X, y):
     
     return model, all_metrics, y_test, y_pred, history
 
+class Forecaster:
+    """
+    Autoregressive multi-step forecasts for a batch of windows.
+    
+    The whole rollout (predict, drop the oldest step, append the prediction)
+    runs as one compiled tf.function calling the model directly, instead of
+    one model.predict per step and per sequence. The function is traced once
+    per model: any number of windows and steps reuse the same graph.
+    """
+    
+    def __init__(self, model, batch_size=4096):
+        self.model = model
+        self.batch_size = batch_size
+        sequence_length, n_features = model.input_shape[1:]
+        self._rollout = tf.function(self._rollout_steps, input_signature=[
+            tf.TensorSpec([None, sequence_length, n_features], tf.float32),
+            tf.TensorSpec([], tf.int32)
+        ])
+    
+    def _rollout_steps(self, windows, steps):
+        predictions = tf.TensorArray(tf.float32, size=steps)
+        for step in tf.range(steps):
+            next_pred = self.model(windows, training=False)
+            predictions = predictions.write(step, next_pred)
+            windows = tf.concat([windows[:, 1:], next_pred[:, None, :]], axis=1)
+        # (steps, N, features) -> (N, steps, features)
+        return tf.transpose(predictions.stack(), [1, 0, 2])
+    
+    def __call__(self, windows, steps=5):
+        """
+        Forecast `steps` values after each window.
+        
+        Args:
+            windows: (N, sequence_length, features) scaled input windows
+            steps: Number of future steps to predict
+            
+        Returns:
+            (N, steps, features) array of scaled forecasts
+        """
+        windows = np.asarray(windows, dtype=np.float32)
+        steps = tf.constant(steps, tf.int32)
+        return np.concatenate([
+            self._rollout(tf.constant(windows[i:i + self.batch_size]), steps).numpy()
+            for i in range(0, max(len(windows), 1), self.batch_size)
+        ])
+    
+    def forecast_lakes(self, sequences, scaler, steps=5):
+        """
+        Forecast every lake from its latest window, in a single batch.
+        
+        Returns:
+            Dictionary of lake name -> (steps, features) unscaled forecasts
+        """
+        lakes = [lake for lake, windows in sequences['lakes'].items() if len(windows['X'])]
+        if not lakes:
+            return {}
+        last_windows = np.stack([sequences['lakes'][lake]['X'][-1] for lake in lakes])
+        forecasts = self(last_windows, steps)
+        n_features = forecasts.shape[2]
+        forecasts = scaler.inverse_transform(forecasts.reshape(-1, n_features)).reshape(forecasts.shape)
+        return dict(zip(lakes, forecasts))
+
 def predict_future(model, X, scaler, steps=5):
     """
     Predict future lake characteristics.
@@ -239,30 +377,9 @@ def predict_future(model, X, scaler, steps=5):
     Returns:
         future_predictions: Array of predicted future values
     """
-    # Get the last sequence from the input data
-    last_sequence = X[-1:].copy()  # Shape: (1, sequence_length, features)
-    
-    future_predictions = []
-    
-    for _ in range(steps):
-        # Predict the next time step
-        next_pred = model.predict(last_sequence)  # Shape: (1, features)
-        
-        # Store the prediction
-        future_predictions.append(next_pred[0])
-        
-        # Update the sequence by removing the first element and adding the prediction
-        # First, reshape the prediction to match the expected format
-        pred_reshaped = next_pred.reshape(1, 1, X.shape[2])
-        
-        # Then, update the sequence by dropping the first timestep and adding the new prediction
-        last_sequence = np.concatenate([last_sequence[:, 1:, :], pred_reshaped], axis=1)
-    
-    # Convert predictions to numpy array and inverse transform
-    future_predictions = np.array(future_predictions)
-    future_predictions = scaler.inverse_transform(future_predictions)
-    
-    return future_predictions
+    # Roll out from the last sequence of the input data
+    future_predictions = Forecaster(model)(X[-1:], steps)[0]
+    return scaler.inverse_transform(future_predictions)
 
 def assess_glof_risk(predictions, threshold=0.1):
     """
@@ -300,24 +417,37 @@ def assess_glof_risk(predictions, threshold=0.1):
     
     return future_dates, risk_levels
 
-def save_model(model, scaler, metrics):
-    """Save the model and related components."""
+def register_model(model, scaler, metrics, sequences, extra=None):
+    """
+    Register a new model version (plus its NumPy export).
+    
+    The last scene seen for each lake is stored with the model, so the next
+    incremental update knows which windows are new.
+    
+    Returns:
+        (keras version, NumPy runtime version)
+    """
     # Create models directory if it doesn't exist
     os.makedirs('models', exist_ok=True)
     
-    # Save the keras model
-    model.save('models/glof_lstm_model.h5')
+    extra = {
+        'features': FEATURES,
+        'sequence_length': sequences['sequence_length'],
+        'horizon': sequences['horizon'],
+        'last_seen': {lake: windows['last_seen'] for lake, windows in sequences['lakes'].items()},
+        **(extra or {})
+    }
     
-    # Save the scaler
-    joblib.dump(scaler, 'models/glof_scaler.joblib')
+    # Save the keras model once, with the scaler and metrics as metadata
+    version = ModelRegistry('models').save(MODEL_NAME, model, 'keras', scaler=scaler, metrics=metrics, extra=extra)
     
-    # Save the model using joblib as well
-    model_wrapper = {
-        'keras_model': model,
-        'scaler': scaler,
-        'metrics': metrics
-    }
-    joblib.dump(model_wrapper, 'models/glof_model.joblib')
+    # Export a NumPy copy for TensorFlow-free inference (see lstm_runtime.py)
+    numpy_version = export_model(model, scaler, metrics, extra={**extra, 'keras_version': version})
+    return version, numpy_version
+
+def save_model(model, scaler, metrics, sequences):
+    """Save the model and related components."""
+    version, numpy_version = register_model(model, scaler, metrics, sequences)
     
     # Save evaluation metrics
     with open('models/evaluation_metrics.txt', 'w') as f:
@@ -335,7 +465,8 @@ def save_model(model, scaler, metrics):
             f.write(f"Recall: {metrics.get('recall', 'N/A'):.4f}\n")
             f.write(f"F1 Score: {metrics.get('f1_score', 'N/A'):.4f}\n")
     
-    print("Model saved successfully in 'models' directory")
+    print(f"Model saved successfully in 'models' directory (version {version}, NumPy runtime version {numpy_version})")
+    return version
 
 def generate_classification_report(y_test, y_pred, threshold=0.1):
     """
@@ -390,7 +521,75 @@ def generate_classification_report(y_test, y_pred, threshold=0.1):
     
     return report
 
-def main():
+def update_model(df, epochs=20, learning_rate=1e-4, batch_size=4):
+    """
+    Fold new scenes into the latest model instead of retraining from scratch.
+    
+    Warm-starts from the latest registered model and reuses its persisted
+    scaler unchanged, so earlier predictions don't shift. Only the windows
+    whose target scene is newer than the last scene the model has seen are
+    used for fine-tuning, at a lower learning rate. The result is saved as a
+    new version that records its parent version.
+    
+    Args:
+        df: DataFrame containing all lake features (old and new scenes)
+        epochs: Fine-tuning epochs
+        learning_rate: Adam learning rate for fine-tuning
+        batch_size: Windows per batch
+        
+    Returns:
+        The new model version, or None if there was nothing new to learn
+    """
+    handle = ModelRegistry('models').load(MODEL_NAME)
+    extra = handle.extra
+    sequences, scaler = prepare_time_series(
+        df,
+        sequence_length=extra.get('sequence_length', 3),
+        horizon=extra.get('horizon', 1),
+        scaler=handle.scaler
+    )
+    
+    # Windows whose target scene the model hasn't seen yet
+    last_seen = extra.get('last_seen', {})
+    target = sequences['sequence_length'] + sequences['horizon'] - 1
+    target_files = sequences['filenames'][sequences['starts'] + target]
+    lake_of_start = np.concatenate([np.full(len(w['X']), lake, dtype=object) for lake, w in sequences['lakes'].items()])
+    seen = np.array([last_seen.get(lake, '') for lake in lake_of_start], dtype=object)
+    new_starts = sequences['starts'][target_files > seen] if len(seen) else sequences['starts']
+    
+    if len(new_starts) == 0:
+        print(f"No new scenes since version {handle.version}; model unchanged.")
+        return None
+    
+    model = handle.model
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate), loss='mse')
+    X_new, y_new = gather_windows(sequences, new_starts)
+    loss_before = float(model.evaluate(X_new, y_new, batch_size=batch_size, verbose=0))
+    model.fit(make_dataset(sequences, new_starts, batch_size, shuffle=True), epochs=epochs, verbose=0)
+    loss_after = float(model.evaluate(X_new, y_new, batch_size=batch_size, verbose=0))
+    
+    metrics = {
+        **handle.metrics,
+        'update_windows': len(new_starts),
+        'update_loss_before': loss_before,
+        'update_loss_after': loss_after
+    }
+    version, numpy_version = register_model(model, scaler, metrics, sequences, extra={'parent_version': handle.version})
+    
+    print(f"Fine-tuned version {handle.version} on {len(new_starts)} new windows "
+          f"(loss {loss_before:.6f} -> {loss_after:.6f}); saved as version {version} "
+          f"(NumPy runtime version {numpy_version})")
+    return version
+
+def main(report='background'):
+    """
+    Train the LSTM, forecast every lake and register the model.
+    
+    Args:
+        report: 'background' renders plots and the summary in a detached
+            worker, 'inline' renders them before returning, 'none' skips the
+            report artifact and matplotlib entirely
+    """
     # Load features extracted from images
     df = load_features()
     
@@ -399,10 +598,10 @@ def main():
         return
     
     # Prepare data for LSTM
-    X, y, scaler = prepare_time_series(df)
+    sequences, scaler = prepare_time_series(df)
     
     # Train the model
-    model, metrics, y_test, y_pred, history = train_model(X, y)
+    model, metrics, y_test, y_pred, history = train_model(sequences)
     
     # Generate classification report
     class_report = generate_classification_report(y_test, y_pred)
@@ -413,102 +612,57 @@ def main():
     with open('models/classification_report.txt', 'w') as f:
         f.write(class_report)
     
-    # Predict future lake characteristics
-    future_predictions = predict_future(model, X, scaler, steps=5)
-    
-    # Assess GLOF risk
-    future_dates, risk_levels = assess_glof_risk(future_predictions)
+    # Predict future lake characteristics (all lakes in one batch) and assess GLOF risk
+    forecasts = {}
+    for lake, future_predictions in Forecaster(model).forecast_lakes(sequences, scaler, steps=5).items():
+        future_dates, risk_levels = assess_glof_risk(future_predictions)
+        forecasts[lake] = (future_predictions, future_dates, risk_levels)
     
     # Display results
     print("\nPredicted Future Lake Characteristics:")
-    for i, (date, pred, risk) in enumerate(zip(future_dates, future_predictions[1:], risk_levels)):
-        print(f"Date: {date}")
-        print(f"  - Area: {pred[0]:.2f} pixels")
-        print(f"  - Perimeter: {pred[1]:.2f} pixels")
-        print(f"  - Area/Perimeter Ratio: {pred[2]:.4f}")
-        print(f"  - GLOF Risk Level: {risk:.4f}")
-    
-    # Plot predictions and metrics
-    plt.figure(figsize=(15, 10))
-    
-    # Test set predictions
-    plt.subplot(2, 2, 1)
-    plt.scatter(range(len(y_test)), y_test[:, 0], label='Actual')
-    plt.scatter(range(len(y_pred)), y_pred[:, 0], label='Predicted')
-    plt.title('Test Set Predictions (Area)')
-    plt.legend()
-    
-    # Future predictions
-    plt.subplot(2, 2, 2)
-    plt.plot(range(len(future_predictions)), future_predictions[:, 0], marker='o', label='Area')
-    plt.plot(range(len(risk_levels)), [r * np.max(future_predictions[:, 0]) for r in risk_levels], 
-             'r--', label='Risk Level')
-    plt.title('Future Predictions and Risk Levels')
-    plt.legend()
-    
-    # Add residual plot
-    plt.subplot(2, 2, 3)
-    residuals = y_test[:, 0] - y_pred[:, 0]
-    plt.scatter(y_pred[:, 0], residuals)
-    plt.axhline(y=0, color='r', linestyle='-')
-    plt.title('Residual Plot')
-    plt.xlabel('Predicted Values')
-    plt.ylabel('Residuals')
-    
-    # Add histogram of errors
-    plt.subplot(2, 2, 4)
-    plt.hist(residuals, bins=10)
-    plt.title('Distribution of Errors')
-    plt.xlabel('Error')
-    plt.ylabel('Frequency')
-    
-    plt.tight_layout()
-    plt.savefig('enhanced_prediction_results.png')
+    for lake, (future_predictions, future_dates, risk_levels) in forecasts.items():
+        if len(forecasts) > 1:
+            print(f"Lake: {lake}")
+        for i, (date, pred, risk) in enumerate(zip(future_dates, future_predictions[1:], risk_levels)):
+            print(f"Date: {date}")
+            print(f"  - Area: {pred[0]:.2f} pixels")
+            print(f"  - Perimeter: {pred[1]:.2f} pixels")
+            print(f"  - Area/Perimeter Ratio: {pred[2]:.4f}")
+            print(f"  - GLOF Risk Level: {risk:.4f}")
     
     # Save model and metrics
-    save_model(model, scaler, metrics)
+    version = save_model(model, scaler, metrics, sequences)
     
-    # Create a summary report of all analysis
-    with open('analysis_summary.txt', 'w') as f:
-        f.write("GLOF Risk Assessment - Analysis Summary\n")
-        f.write("======================================\n\n")
-        
-        f.write("1. Model Performance Metrics\n")
-        f.write("---------------------------\n")
-        f.write(f"Mean Squared Error: {metrics['mse']:.6f}\n")
-        f.write(f"Root Mean Squared Error: {metrics['rmse']:.6f}\n")
-        f.write(f"R² Score: {metrics['r2']:.6f}\n")
-        f.write(f"Mean Absolute Percentage Error: {metrics['mape']:.2f}%\n\n")
-        
-        f.write("2. Classification Performance\n")
-        f.write("----------------------------\n")
-        f.write(f"Accuracy: {metrics.get('accuracy', 'N/A')}\n")
-        if metrics.get('precision') is not None:
-            f.write(f"Precision: {metrics.get('precision', 'N/A'):.4f}\n")
-            f.write(f"Recall: {metrics.get('recall', 'N/A'):.4f}\n")
-            f.write(f"F1 Score: {metrics.get('f1_score', 'N/A'):.4f}\n\n")
-        
-        f.write("3. Future Predictions\n")
-        f.write("-------------------\n")
-        for i, (date, pred, risk) in enumerate(zip(future_dates, future_predictions[1:], risk_levels)):
-            f.write(f"Date: {date}\n")
-            f.write(f"  - Area: {pred[0]:.2f} pixels\n")
-            f.write(f"  - Perimeter: {pred[1]:.2f} pixels\n")
-            f.write(f"  - Area/Perimeter Ratio: {pred[2]:.4f}\n")
-            f.write(f"  - GLOF Risk Level: {risk:.4f}\n\n")
-        
-        f.write("4. Risk Assessment Summary\n")
-        f.write("-------------------------\n")
-        max_risk = max(risk_levels) if risk_levels else 0
-        max_risk_date = future_dates[risk_levels.index(max_risk)] if max_risk > 0 else "None"
-        
-        f.write(f"Maximum Risk Level: {max_risk:.4f}\n")
-        f.write(f"Date of Maximum Risk: {max_risk_date}\n")
-        f.write(f"Risk Threshold Used: {0.1}\n\n")
-        
-        f.write("5. Model Architecture\n")
-        f.write("-------------------\n")
-        model.summary(print_fn=lambda x: f.write(x + '\n'))
+    # Everything the plots and summary need goes into one artifact; rendering
+    # happens outside the training path
+    if report == 'none':
+        return
+    summary = []
+    model.summary(print_fn=lambda line, **kwargs: summary.append(line))
+    artifact = save_artifact(
+        os.path.join(REPORTS_DIR, f"{MODEL_NAME}_v{version}.npz"),
+        y_test, y_pred, history, metrics, forecasts, '\n'.join(summary) + '\n'
+    )
+    if report == 'background':
+        render_in_background(artifact)
+        print(f"Rendering report from {artifact} in the background")
+    else:
+        render_report(artifact)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the lake-area LSTM and forecast GLOF risk")
+    parser.add_argument('--update', action='store_true',
+                        help="Fine-tune the latest model on new scenes only, instead of retraining")
+    parser.add_argument('--epochs', type=int, default=20, help="Fine-tuning epochs for --update")
+    parser.add_argument('--report', choices=['background', 'inline', 'none'], default='background',
+                        help="How to render plots and the analysis summary (default: in a background worker)")
+    parser.add_argument('--no-report', dest='report', action='store_const', const='none',
+                        help="Headless run: skip the report artifact and matplotlib entirely")
+    args = parser.parse_args()
+    
+    if args.update and ModelRegistry('models').latest_version(MODEL_NAME) is not None:
+        update_model(load_features(), epochs=args.epochs)
+    else:
+        if args.update:
+            print("No saved model to update; training from scratch.")
+        main(report=args.report)
\ No newline at end of file
@@ -0,0 +1,197 @@
+import json
+import math
+import os
+
+import numpy as np
+
+# Metres per degree of latitude (and of longitude at the equator)
+METERS_PER_DEGREE = 111320.0
+
+# Sentinel Hub WMS caps GetMap output at 2500 x 2500 pixels
+MAX_TILE_PX = 2500
+
+def load_lake_catalog(path):
+    """
+    Load a lake inventory from a GeoJSON FeatureCollection.
+
+    Each feature needs a Polygon/MultiPolygon geometry in EPSG:4326 and a
+    `name` property, which is also used as the lake's output directory.
+
+    Returns:
+        List of {'name': str, 'bbox': [minLon, minLat, maxLon, maxLat]}
+    """
+    with open(path) as f:
+        collection = json.load(f)
+
+    lakes = []
+    for feature in collection['features']:
+        geometry = feature['geometry']
+        polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+        points = np.array([pt[:2] for polygon in polygons for ring in polygon for pt in ring], dtype=float)
+        lakes.append({
+            'name': feature['properties']['name'],
+            'bbox': [float(points[:, 0].min()), float(points[:, 1].min()), float(points[:, 0].max()), float(points[:, 1].max())]
+        })
+    return lakes
+
+def _degrees_per_pixel(lat, resolution_m):
+    """Pixel size in degrees (lon, lat) for a ground resolution at a given latitude."""
+    return (
+        resolution_m / (METERS_PER_DEGREE * math.cos(math.radians(lat))),
+        resolution_m / METERS_PER_DEGREE
+    )
+
+def _pad_bbox(bbox, buffer_m):
+    lat = (bbox[1] + bbox[3]) / 2
+    dlon, dlat = _degrees_per_pixel(lat, buffer_m)
+    return [bbox[0] - dlon, bbox[1] - dlat, bbox[2] + dlon, bbox[3] + dlat]
+
+def _union(a, b):
+    return [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+
+def _pixel_size(bbox, resolution_m):
+    dlon, dlat = _degrees_per_pixel((bbox[1] + bbox[3]) / 2, resolution_m)
+    return max(1, math.ceil((bbox[2] - bbox[0]) / dlon)), max(1, math.ceil((bbox[3] - bbox[1]) / dlat))
+
+def _cost(bbox, resolution_m, max_tile_px, request_cost_px):
+    """Cost of acquiring a box: pixels fetched plus a fixed pixel-equivalent cost per API call."""
+    width, height = _pixel_size(bbox, resolution_m)
+    n_requests = math.ceil(width / max_tile_px) * math.ceil(height / max_tile_px)
+    return width * height + n_requests * request_cost_px
+
+def _merge_groups(groups, resolution_m, max_tile_px, request_cost_px):
+    """
+    Greedily merge the pair of groups whose union saves the most cost,
+    until no merge saves anything. Overlapping boxes always merge, because
+    their union never fetches more pixels than the two boxes separately.
+    """
+    costs = [_cost(g['bbox'], resolution_m, max_tile_px, request_cost_px) for g in groups]
+    while True:
+        best = None
+        for i in range(len(groups)):
+            for j in range(i + 1, len(groups)):
+                union = _union(groups[i]['bbox'], groups[j]['bbox'])
+                saving = costs[i] + costs[j] - _cost(union, resolution_m, max_tile_px, request_cost_px)
+                if saving > 0 and (best is None or saving > best[0]):
+                    best = (saving, i, j, union)
+        if best is None:
+            return groups
+
+        _, i, j, union = best
+        groups[i] = {'bbox': union, 'lakes': groups[i]['lakes'] + groups[j]['lakes']}
+        costs[i] = _cost(union, resolution_m, max_tile_px, request_cost_px)
+        del groups[j], costs[j]
+
+def plan_requests(lakes, resolution_m=10, buffer_m=200, max_tile_px=MAX_TILE_PX, request_cost_px=250000):
+    """
+    Plan the WMS requests needed to cover a lake inventory.
+
+    Nearby lakes are merged into shared requests when that is cheaper than
+    fetching them separately, groups larger than `max_tile_px` are split into
+    a grid of tiles at the target resolution, and lakes listed more than once
+    are only requested once.
+
+    Args:
+        lakes: List of {'name', 'bbox'} (see load_lake_catalog)
+        resolution_m: Target ground resolution in metres per pixel
+        buffer_m: Margin added around each lake
+        max_tile_px: Maximum width/height of a single request in pixels
+        request_cost_px: Pixel-equivalent cost of one extra API call, used to
+            decide whether merging two lakes is worth the extra pixels
+
+    Returns:
+        List of groups, each {'id', 'bbox', 'width', 'height', 'tiles', 'lakes'}:
+        tiles are {'id', 'bbox', 'width', 'height', 'window'} and lakes are
+        {'name', 'window'}, with windows as (col0, row0, col1, row1) pixel
+        ranges in the group's grid
+    """
+    # Dedupe lakes that appear more than once in the catalog
+    unique = {}
+    for lake in lakes:
+        bbox = _pad_bbox(lake['bbox'], buffer_m)
+        unique[lake['name']] = _union(unique[lake['name']], bbox) if lake['name'] in unique else bbox
+
+    groups = [{'bbox': bbox, 'lakes': [name]} for name, bbox in unique.items()]
+    groups = _merge_groups(groups, resolution_m, max_tile_px, request_cost_px)
+
+    plan = []
+    for group_index, group in enumerate(sorted(groups, key=lambda g: (g['bbox'][0], g['bbox'][1]))):
+        min_lon, min_lat = group['bbox'][0], group['bbox'][1]
+        dlon, dlat = _degrees_per_pixel((group['bbox'][1] + group['bbox'][3]) / 2, resolution_m)
+        width, height = _pixel_size(group['bbox'], resolution_m)
+
+        # Pixel grid anchored at the group's south-west corner; rows count down from the north edge
+        max_lat = min_lat + height * dlat
+
+        def to_bbox(col0, row0, col1, row1):
+            return [min_lon + col0 * dlon, max_lat - row1 * dlat, min_lon + col1 * dlon, max_lat - row0 * dlat]
+
+        tiles = []
+        for row0 in range(0, height, max_tile_px):
+            for col0 in range(0, width, max_tile_px):
+                col1, row1 = min(col0 + max_tile_px, width), min(row0 + max_tile_px, height)
+                tiles.append({
+                    'id': f"r{row0 // max_tile_px}c{col0 // max_tile_px}",
+                    'bbox': to_bbox(col0, row0, col1, row1),
+                    'width': col1 - col0,
+                    'height': row1 - row0,
+                    'window': (col0, row0, col1, row1)
+                })
+
+        lake_windows = []
+        for name in sorted(group['lakes']):
+            bbox = unique[name]
+            col0 = max(0, int(math.floor((bbox[0] - min_lon) / dlon)))
+            col1 = min(width, int(math.ceil((bbox[2] - min_lon) / dlon)))
+            row0 = max(0, int(math.floor((max_lat - bbox[3]) / dlat)))
+            row1 = min(height, int(math.ceil((max_lat - bbox[1]) / dlat)))
+            lake_windows.append({'name': name, 'window': (col0, row0, col1, row1)})
+
+        plan.append({
+            'id': f"group{group_index:03d}",
+            'bbox': to_bbox(0, 0, width, height),
+            'width': width,
+            'height': height,
+            'tiles': tiles,
+            'lakes': lake_windows
+        })
+
+    return plan
+
+def summarize_plan(plan):
+    """Count requests and pixels per acquisition date for a plan."""
+    return {
+        'groups': len(plan),
+        'lakes': sum(len(group['lakes']) for group in plan),
+        'requests': sum(len(group['tiles']) for group in plan),
+        'pixels': sum(tile['width'] * tile['height'] for group in plan for tile in group['tiles'])
+    }
+
+def extract_lake(group, lake, tile_images):
+    """
+    Cut one lake out of a group's downloaded tiles, mosaicking across tile edges.
+
+    Args:
+        group: Group from plan_requests
+        lake: One of group['lakes']
+        tile_images: Dictionary of tile id -> 2D image array
+
+    Returns:
+        Image array covering the lake window
+    """
+    col0, row0, col1, row1 = lake['window']
+    first = next(iter(tile_images.values()))
+    lake_img = np.zeros((row1 - row0, col1 - col0) + first.shape[2:], dtype=first.dtype)
+
+    for tile in group['tiles']:
+        tc0, tr0, tc1, tr1 = tile['window']
+        c0, r0, c1, r1 = max(col0, tc0), max(row0, tr0), min(col1, tc1), min(row1, tr1)
+        if c0 >= c1 or r0 >= r1:
+            continue
+        lake_img[r0 - row0:r1 - row0, c0 - col0:c1 - col0] = tile_images[tile['id']][r0 - tr0:r1 - tr0, c0 - tc0:c1 - tc0]
+
+    return lake_img
+
+def lake_dir(output_dir, name):
+    """Per-lake output directory."""
+    return os.path.join(output_dir, name.replace(os.sep, "_").replace(" ", "_"))
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+def fingerprint(params):
+    """Stable short hash of a preprocessing-parameter dictionary."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+class FeatureCache:
+    """
+    Persistent SQLite cache of per-image features.
+
+    Features are keyed by the image's content hash plus the preprocessing
+    fingerprint, so renamed files are still hits and a parameter change
+    invalidates everything. Content hashes are themselves cached by
+    (path, size, mtime), so unchanged files are never re-read.
+    """
+
+    def __init__(self, path, params_fingerprint):
+        self.path = path
+        self.fingerprint = params_fingerprint
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS features (
+                sha256 TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                features TEXT NOT NULL,
+                PRIMARY KEY (sha256, fingerprint)
+            );
+        """)
+
+    def file_hash(self, path):
+        """SHA-256 of a file's contents, reusing the stored hash if the file is unchanged."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.conn.execute(
+            "SELECT sha256 FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        if row:
+            return row[0]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime_ns, sha256)
+        )
+        self.conn.commit()
+        return sha256
+
+    def get(self, sha256):
+        """Cached features for an image hash, or None."""
+        row = self.conn.execute(
+            "SELECT features FROM features WHERE sha256 = ? AND fingerprint = ?",
+            (sha256, self.fingerprint)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, sha256, features):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO features (sha256, fingerprint, features) VALUES (?, ?, ?)",
+            (sha256, self.fingerprint, json.dumps(features))
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+# Directory where training runs drop their report artifacts
+REPORTS_DIR = 'reports'
+
+def _json_default(value):
+    """JSON fallback for numpy arrays and scalars (e.g. the confusion matrix)."""
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def save_artifact(path, y_test, y_pred, history, metrics, forecasts, model_summary=''):
+    """
+    Save everything the report needs as a single .npz file.
+
+    Args:
+        path: Output .npz path
+        y_test: Ground truth of the test windows
+        y_pred: Model predictions for the test windows
+        history: Keras History (or a dict of per-epoch loss lists)
+        metrics: Dictionary of evaluation metrics
+        forecasts: Dictionary of lake -> (future_predictions, future_dates, risk_levels)
+        model_summary: Text of model.summary()
+
+    Returns:
+        The artifact path
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    history = getattr(history, 'history', history)
+    lakes = list(forecasts)
+    meta = {
+        'metrics': metrics,
+        'lakes': lakes,
+        'future_dates': {lake: forecasts[lake][1] for lake in lakes},
+        'risk_levels': {lake: [float(r) for r in forecasts[lake][2]] for lake in lakes},
+        'model_summary': model_summary
+    }
+    np.savez(
+        path,
+        y_test=y_test,
+        y_pred=y_pred,
+        loss=np.asarray(history.get('loss', [])),
+        val_loss=np.asarray(history.get('val_loss', [])),
+        forecasts=np.stack([forecasts[lake][0] for lake in lakes]) if lakes else np.empty((0, 0, 3)),
+        meta=json.dumps(meta, default=_json_default)
+    )
+    return path
+
+def load_artifact(path):
+    """Load a report artifact written by save_artifact as a dictionary."""
+    with np.load(path) as data:
+        report = {key: data[key] for key in data.files if key != 'meta'}
+        meta = json.loads(str(data['meta']))
+    report.update(meta)
+    report['forecasts'] = {
+        lake: (report['forecasts'][i], meta['future_dates'][lake], meta['risk_levels'][lake])
+        for i, lake in enumerate(meta['lakes'])
+    }
+    return report
+
+def plot_training(report, output_dir='.'):
+    """Loss curves, actual vs predicted, and the significant-change confusion matrix."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    y_test, y_pred = report['y_test'], report['y_pred']
+
+    # Plot training history
+    plt.figure(figsize=(12, 6))
+    plt.subplot(1, 2, 1)
+    plt.plot(report['loss'], label='Training Loss')
+    plt.plot(report['val_loss'], label='Validation Loss')
+    plt.title('Model Loss')
+    plt.ylabel('Loss')
+    plt.xlabel('Epoch')
+    plt.legend()
+
+    # Plot predictions vs actual
+    plt.subplot(1, 2, 2)
+    plt.scatter(y_test[:, 0], y_pred[:, 0])
+    plt.plot([min(y_test[:, 0]), max(y_test[:, 0])], [min(y_test[:, 0]), max(y_test[:, 0])], 'r--')
+    plt.xlabel('Actual')
+    plt.ylabel('Predicted')
+    plt.title('Actual vs Predicted Values (Area)')
+    plt.savefig(os.path.join(output_dir, 'model_evaluation.png'))
+    plt.close()
+
+    # Plot confusion matrix if available
+    confusion = report['metrics'].get('confusion_matrix')
+    if confusion is not None:
+        plt.figure(figsize=(8, 6))
+        sns.heatmap(
+            np.asarray(confusion),
+            annot=True,
+            fmt='d',
+            cmap='Blues',
+            xticklabels=['No Change', 'Significant Change'],
+            yticklabels=['No Change', 'Significant Change']
+        )
+        plt.xlabel('Predicted')
+        plt.ylabel('Actual')
+        plt.title('Confusion Matrix - Significant Area Changes')
+        plt.savefig(os.path.join(output_dir, 'confusion_matrix.png'))
+        plt.close()
+
+def plot_predictions(report, output_dir='.'):
+    """Test-set predictions, forecasts with risk levels, residuals and error histogram."""
+    import matplotlib.pyplot as plt
+
+    y_test, y_pred, forecasts = report['y_test'], report['y_pred'], report['forecasts']
+
+    # Plot predictions and metrics
+    plt.figure(figsize=(15, 10))
+
+    # Test set predictions
+    plt.subplot(2, 2, 1)
+    plt.scatter(range(len(y_test)), y_test[:, 0], label='Actual')
+    plt.scatter(range(len(y_pred)), y_pred[:, 0], label='Predicted')
+    plt.title('Test Set Predictions (Area)')
+    plt.legend()
+
+    # Future predictions
+    plt.subplot(2, 2, 2)
+    for lake, (future_predictions, future_dates, risk_levels) in forecasts.items():
+        prefix = f"{lake} " if len(forecasts) > 1 else ""
+        plt.plot(range(len(future_predictions)), future_predictions[:, 0], marker='o', label=f'{prefix}Area')
+        plt.plot(range(len(risk_levels)), [r * np.max(future_predictions[:, 0]) for r in risk_levels],
+                 '--', label=f'{prefix}Risk Level')
+    plt.title('Future Predictions and Risk Levels')
+    plt.legend()
+
+    # Add residual plot
+    plt.subplot(2, 2, 3)
+    residuals = y_test[:, 0] - y_pred[:, 0]
+    plt.scatter(y_pred[:, 0], residuals)
+    plt.axhline(y=0, color='r', linestyle='-')
+    plt.title('Residual Plot')
+    plt.xlabel('Predicted Values')
+    plt.ylabel('Residuals')
+
+    # Add histogram of errors
+    plt.subplot(2, 2, 4)
+    plt.hist(residuals, bins=10)
+    plt.title('Distribution of Errors')
+    plt.xlabel('Error')
+    plt.ylabel('Frequency')
+
+    plt.tight_layout()
+    plt.savefig(os.path.join(output_dir, 'enhanced_prediction_results.png'))
+    plt.close()
+
+def write_summary(report, output_dir='.'):
+    """Write analysis_summary.txt (metrics, forecasts, risk summary, architecture)."""
+    metrics, forecasts = report['metrics'], report['forecasts']
+
+    with open(os.path.join(output_dir, 'analysis_summary.txt'), 'w') as f:
+        f.write("GLOF Risk Assessment - Analysis Summary\n")
+        f.write("======================================\n\n")
+
+        f.write("1. Model Performance Metrics\n")
+        f.write("---------------------------\n")
+        f.write(f"Mean Squared Error: {metrics['mse']:.6f}\n")
+        f.write(f"Root Mean Squared Error: {metrics['rmse']:.6f}\n")
+        f.write(f"R² Score: {metrics['r2']:.6f}\n")
+        f.write(f"Mean Absolute Percentage Error: {metrics['mape']:.2f}%\n\n")
+
+        f.write("2. Classification Performance\n")
+        f.write("----------------------------\n")
+        f.write(f"Accuracy: {metrics.get('accuracy', 'N/A')}\n")
+        if metrics.get('precision') is not None:
+            f.write(f"Precision: {metrics.get('precision', 'N/A'):.4f}\n")
+            f.write(f"Recall: {metrics.get('recall', 'N/A'):.4f}\n")
+            f.write(f"F1 Score: {metrics.get('f1_score', 'N/A'):.4f}\n\n")
+
+        f.write("3. Future Predictions\n")
+        f.write("-------------------\n")
+        for lake, (future_predictions, future_dates, risk_levels) in forecasts.items():
+            if len(forecasts) > 1:
+                f.write(f"Lake: {lake}\n")
+            for i, (date, pred, risk) in enumerate(zip(future_dates, future_predictions[1:], risk_levels)):
+                f.write(f"Date: {date}\n")
+                f.write(f"  - Area: {pred[0]:.2f} pixels\n")
+                f.write(f"  - Perimeter: {pred[1]:.2f} pixels\n")
+                f.write(f"  - Area/Perimeter Ratio: {pred[2]:.4f}\n")
+                f.write(f"  - GLOF Risk Level: {risk:.4f}\n\n")
+
+        f.write("4. Risk Assessment Summary\n")
+        f.write("-------------------------\n")
+        for lake, (future_predictions, future_dates, risk_levels) in forecasts.items():
+            max_risk = max(risk_levels) if risk_levels else 0
+            max_risk_date = future_dates[risk_levels.index(max_risk)] if max_risk > 0 else "None"
+
+            if len(forecasts) > 1:
+                f.write(f"Lake: {lake}\n")
+            f.write(f"Maximum Risk Level: {max_risk:.4f}\n")
+            f.write(f"Date of Maximum Risk: {max_risk_date}\n")
+        f.write(f"Risk Threshold Used: {0.1}\n\n")
+
+        f.write("5. Model Architecture\n")
+        f.write("-------------------\n")
+        f.write(report['model_summary'])
+
+def render_report(path, output_dir='.'):
+    """Render all plots and the summary of a report artifact."""
+    # Headless backend: reports are rendered from scripts and workers, never shown
+    import matplotlib
+    matplotlib.use('Agg')
+
+    report = load_artifact(path)
+    os.makedirs(output_dir, exist_ok=True)
+    plot_training(report, output_dir)
+    plot_predictions(report, output_dir)
+    write_summary(report, output_dir)
+    print(f"Report for {path} rendered to {output_dir}")
+
+def render_in_background(path, output_dir='.'):
+    """
+    Render a report in a detached worker process and return immediately.
+
+    The training process doesn't wait for (or even import) matplotlib; the
+    worker's output goes to <artifact>.log.
+
+    Returns:
+        The worker's Popen handle
+    """
+    with open(f"{os.path.splitext(path)[0]}.log", 'w') as log:
+        return subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), path, '--output-dir', output_dir],
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the plots and summary of a saved LSTM training report")
+    parser.add_argument('artifact', help="Report artifact (.npz) written by 03_SAR_prediction.py")
+    parser.add_argument('--output-dir', default='.', help="Directory for the rendered figures and summary")
+    args = parser.parse_args()
+    render_report(args.artifact, args.output_dir)
+
+if __name__ == "__main__":
+    main()
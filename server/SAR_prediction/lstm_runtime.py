@@ -0,0 +1,217 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from model_registry import ModelRegistry
+
+# Registry names of the trained Keras model and of its NumPy export
+KERAS_MODEL_NAME = 'glof_lstm_model'
+NUMPY_MODEL_NAME = 'glof_lstm_numpy'
+
+# Largest absolute difference from the Keras model accepted on export
+PARITY_TOLERANCE = 1e-4
+
+def _sigmoid(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1)
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'sigmoid': _sigmoid,
+    'tanh': np.tanh,
+}
+
+def weights_from_keras(model):
+    """
+    Extract the LSTM/Dense stack of a Keras model as plain arrays.
+
+    Dropout layers are skipped (they are a no-op at inference). Only uses the
+    model object, so TensorFlow is never imported here.
+
+    Args:
+        model: Keras Sequential model of LSTM, Dropout and Dense layers
+
+    Returns:
+        weights: Dictionary of array name -> array
+        layers: List of layer specs ({'type', 'prefix', ...}) in order
+
+    Raises:
+        ValueError: For layers or activations the runtime doesn't implement
+    """
+    weights, layers = {}, []
+    for index, layer in enumerate(model.layers):
+        kind = type(layer).__name__
+        if kind == 'Dropout':
+            continue
+        config = layer.get_config()
+        prefix = f"layer{index}"
+
+        if kind == 'LSTM':
+            if config['activation'] != 'tanh' or config['recurrent_activation'] != 'sigmoid':
+                raise ValueError(f"Layer {layer.name}: only tanh/sigmoid LSTM activations are supported")
+            kernel, recurrent_kernel, bias = layer.get_weights()
+            weights.update({f"{prefix}_kernel": kernel, f"{prefix}_recurrent_kernel": recurrent_kernel, f"{prefix}_bias": bias})
+            layers.append({'type': 'lstm', 'prefix': prefix, 'units': config['units'], 'return_sequences': config['return_sequences']})
+        elif kind == 'Dense':
+            if config['activation'] not in ACTIVATIONS:
+                raise ValueError(f"Layer {layer.name}: unsupported activation '{config['activation']}'")
+            kernel, bias = layer.get_weights()
+            weights.update({f"{prefix}_kernel": kernel, f"{prefix}_bias": bias})
+            layers.append({'type': 'dense', 'prefix': prefix, 'activation': config['activation']})
+        else:
+            raise ValueError(f"Layer {layer.name}: unsupported layer type {kind}")
+
+    return weights, layers
+
+class NumpyLSTM:
+    """
+    Inference-only LSTM stack in pure NumPy.
+
+    Mirrors Keras' LSTM (gate order i, f, c, o; tanh/sigmoid) and Dense
+    layers. The input projection of every time step is one matrix product;
+    only the recurrent part runs step by step.
+    """
+
+    def __init__(self, weights, layers):
+        self.weights = {key: np.asarray(value, dtype=np.float32) for key, value in weights.items()}
+        self.layers = layers
+        first = layers[0]['prefix']
+        self.input_features = self.weights[f"{first}_kernel"].shape[0]
+
+    def _lstm(self, x, layer):
+        kernel = self.weights[f"{layer['prefix']}_kernel"]
+        recurrent_kernel = self.weights[f"{layer['prefix']}_recurrent_kernel"]
+        units = layer['units']
+
+        # Input contributions of all time steps at once: (N, T, 4 * units)
+        projected = x @ kernel + self.weights[f"{layer['prefix']}_bias"]
+        h = np.zeros((x.shape[0], units), dtype=np.float32)
+        c = np.zeros_like(h)
+        outputs = []
+        for t in range(x.shape[1]):
+            z = projected[:, t] + h @ recurrent_kernel
+            i = _sigmoid(z[:, :units])
+            f = _sigmoid(z[:, units:2 * units])
+            g = np.tanh(z[:, 2 * units:3 * units])
+            o = _sigmoid(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+            if layer['return_sequences']:
+                outputs.append(h)
+        return np.stack(outputs, axis=1) if layer['return_sequences'] else h
+
+    def predict(self, X):
+        """
+        Predict the next step for each window.
+
+        Args:
+            X: (N, sequence_length, features) scaled windows
+
+        Returns:
+            (N, outputs) array
+        """
+        x = np.asarray(X, dtype=np.float32)
+        for layer in self.layers:
+            if layer['type'] == 'lstm':
+                x = self._lstm(x, layer)
+            else:
+                x = ACTIVATIONS[layer['activation']](x @ self.weights[f"{layer['prefix']}_kernel"] + self.weights[f"{layer['prefix']}_bias"])
+        return x
+
+    def forecast(self, windows, steps=5):
+        """Autoregressive (N, steps, features) forecasts after each window (see Forecaster)."""
+        windows = np.array(windows, dtype=np.float32)
+        predictions = np.empty((len(windows), steps, windows.shape[2]), dtype=np.float32)
+        for step in range(steps):
+            predictions[:, step] = self.predict(windows)
+            windows = np.concatenate([windows[:, 1:], predictions[:, step, None]], axis=1)
+        return predictions
+
+class MinMaxScaling:
+    """
+    transform/inverse_transform of a fitted MinMaxScaler, from registry metadata.
+
+    Drop-in for the scikit-learn scaler at inference time, without importing
+    scikit-learn (which alone takes over a second).
+    """
+
+    def __init__(self, meta):
+        if meta['type'] != 'MinMaxScaler':
+            raise ValueError(f"Unsupported scaler type {meta['type']}")
+        self.scale = np.asarray(meta['attributes']['scale_'], dtype=np.float32)
+        self.min = np.asarray(meta['attributes']['min_'], dtype=np.float32)
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float32) * self.scale + self.min
+
+    def inverse_transform(self, X):
+        return (np.asarray(X, dtype=np.float32) - self.min) / self.scale
+
+def export_model(model, scaler=None, metrics=None, extra=None, registry_root='models', check_windows=None):
+    """
+    Register a NumPy copy of a trained Keras LSTM, after checking parity.
+
+    Args:
+        model: Trained Keras model
+        scaler: Fitted scaler stored alongside (as in the Keras version)
+        metrics: Evaluation metrics of the Keras model
+        extra: Extra metadata (e.g. the feature names)
+        registry_root: Model registry directory
+        check_windows: Windows compared between Keras and NumPy (random if None)
+
+    Returns:
+        The new version number of NUMPY_MODEL_NAME
+
+    Raises:
+        ValueError: If the NumPy predictions differ by more than PARITY_TOLERANCE
+    """
+    weights, layers = weights_from_keras(model)
+    runtime = NumpyLSTM(weights, layers)
+
+    if check_windows is None:
+        sequence_length, n_features = model.input_shape[1:]
+        check_windows = np.random.default_rng(0).random((256, sequence_length, n_features), dtype=np.float32)
+    check_windows = np.asarray(check_windows, dtype=np.float32)
+    expected = np.asarray(model(check_windows, training=False))
+    max_error = float(np.max(np.abs(runtime.predict(check_windows) - expected)))
+    if max_error > PARITY_TOLERANCE:
+        raise ValueError(f"NumPy LSTM differs from Keras by {max_error:.2e} (tolerance {PARITY_TOLERANCE:.0e})")
+
+    return ModelRegistry(registry_root).save(
+        NUMPY_MODEL_NAME,
+        weights,
+        'numpy',
+        scaler=scaler,
+        metrics=metrics,
+        extra={**(extra or {}), 'layers': layers, 'parity_max_abs_error': max_error}
+    )
+
+def load_runtime(registry_root='models', version=None):
+    """
+    Load the exported NumPy LSTM (latest version by default).
+
+    Weights are memory-mapped, so startup takes milliseconds and needs
+    neither TensorFlow nor scikit-learn.
+
+    Returns:
+        runtime: NumpyLSTM
+        scaler: MinMaxScaling equivalent of the scaler the model was trained with
+    """
+    handle = ModelRegistry(registry_root).load(NUMPY_MODEL_NAME, version)
+    return NumpyLSTM(handle.model, handle.extra['layers']), MinMaxScaling(handle.metadata['scaler'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the trained Keras LSTM to the NumPy inference runtime")
+    parser.add_argument('--registry', default='models', help="Model registry directory")
+    parser.add_argument('--version', type=int, default=None, help="Keras model version to export (latest by default)")
+    args = parser.parse_args()
+
+    handle = ModelRegistry(args.registry).load(KERAS_MODEL_NAME, args.version)
+    version = export_model(handle.model, handle.scaler, handle.metrics, {**handle.extra, 'keras_version': handle.version}, args.registry)
+    print(f"Exported {KERAS_MODEL_NAME} v{handle.version} to {NUMPY_MODEL_NAME} v{version}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+
+import cv2
+import numpy as np
+
+# WMS output format for native float32 backscatter (instead of 8-bit PNG)
+FLOAT32_TIFF_FORMAT = "image/tiff;depth=32f"
+
+def read_float_tiff(path):
+    """Read a single-band float32 GeoTIFF as returned by the WMS."""
+    img = cv2.imread(path, cv2.IMREAD_UNCHANGED | cv2.IMREAD_ANYDEPTH)
+    if img is None:
+        raise ValueError(f"Could not read TIFF {path}")
+    if img.ndim == 3:
+        img = img[:, :, 0]
+    return img.astype(np.float32, copy=False)
+
+def save_scene(path, array):
+    """Save a scene as a .npy file (written to a temp file, then renamed into place)."""
+    tmp_path = f"{path}.part"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array, dtype=np.float32))
+    os.replace(tmp_path, path)
+    return path
+
+def tiff_to_npy(tiff_path, npy_path, remove_tiff=True):
+    """Convert a downloaded float32 TIFF to a memory-mappable .npy scene."""
+    save_scene(npy_path, read_float_tiff(tiff_path))
+    if remove_tiff:
+        os.remove(tiff_path)
+    return npy_path
+
+def open_scene(path, window=None):
+    """
+    Open a .npy scene memory-mapped, optionally restricted to a window.
+
+    The returned array is a read-only view on the file: only the pages of
+    the requested window are read from disk.
+
+    Args:
+        path: Path to a .npy scene
+        window: Optional (col0, row0, col1, row1) pixel window
+
+    Returns:
+        2D float32 array (memmap view)
+    """
+    scene = np.load(path, mmap_mode='r')
+    if window is not None:
+        col0, row0, col1, row1 = window
+        scene = scene[row0:row1, col0:col1]
+    return scene
+
+def to_db(backscatter, floor=1e-6):
+    """Linear backscatter to decibels (non-positive and NaN values are clamped to `floor`)."""
+    linear = np.nan_to_num(np.asarray(backscatter, dtype=np.float32), nan=floor)
+    return 10 * np.log10(np.maximum(linear, floor))
+
+def otsu_from_histograms(hist):
+    """
+    Otsu threshold bin for each row of a (N, bins) histogram array.
+
+    Evaluates the between-class variance for every scene and every bin in
+    one pass; ties resolve to the first bin, like cv2.THRESH_OTSU.
+
+    Returns:
+        Array of N bin indices; values in bins > index are foreground
+    """
+    hist = np.asarray(hist, dtype=np.float64)
+    p = hist / hist.sum(axis=1, keepdims=True)
+    q1 = np.cumsum(p, axis=1)
+    mu1_sum = np.cumsum(p * np.arange(hist.shape[1]), axis=1)
+    mu = mu1_sum[:, -1:]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mu1 = mu1_sum / q1
+        mu2 = (mu - mu1_sum) / (1 - q1)
+        sigma = q1 * (1 - q1) * (mu1 - mu2) ** 2
+
+    eps = np.finfo(np.float32).eps
+    sigma[(q1 < eps) | (q1 > 1 - eps) | ~np.isfinite(sigma)] = -1
+    return np.argmax(sigma, axis=1)
+
+def otsu_threshold_float(img, bins=256):
+    """Otsu threshold of a float image, over `bins` bins spanning its finite range."""
+    values = img[np.isfinite(img)]
+    if values.size == 0:
+        return 0.0
+    hist, edges = np.histogram(values, bins=bins)
+    return float(edges[otsu_from_histograms(hist[None])[0] + 1])
+
+def save_mask(path, mask):
+    """Store a binary mask bit-packed (1 bit per pixel) in a compressed .npz."""
+    mask = np.asarray(mask) > 0
+    np.savez_compressed(path, bits=np.packbits(mask, axis=-1), shape=np.array(mask.shape))
+    return path
+
+def load_mask(path):
+    """Load a mask written by save_mask as a uint8 (0/255) array."""
+    with np.load(path) as data:
+        shape = tuple(data['shape'])
+        mask = np.unpackbits(data['bits'], axis=-1, count=shape[-1])
+    return mask.reshape(shape) * np.uint8(255)
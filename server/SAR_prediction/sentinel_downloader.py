@@ -0,0 +1,233 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SENTINEL_HUB_URL = "https://services.sentinel-hub.com"
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class SentinelHubClient:
+    """
+    Thread-safe Sentinel Hub client used for bulk downloads.
+
+    All requests share one pooled `requests.Session`. Transient failures are
+    retried with exponential backoff, an expired token is refreshed once per
+    request, and images are written to a `.part` file that is renamed into
+    place only when complete, so an interrupted run can simply be restarted.
+    """
+
+    def __init__(self, client_id, client_secret, instance_id, base_url=SENTINEL_HUB_URL,
+                 max_workers=8, max_retries=5, backoff=1.0, timeout=60):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.instance_id = instance_id
+        self.base_url = base_url.rstrip("/")
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.token = None
+        self.token_expires_at = 0
+        self._token_lock = threading.Lock()
+
+    @property
+    def token_url(self):
+        return f"{self.base_url}/oauth/token"
+
+    @property
+    def catalog_url(self):
+        return f"{self.base_url}/api/v1/catalog/search"
+
+    @property
+    def wms_url(self):
+        return f"{self.base_url}/ogc/wms/{self.instance_id}"
+
+    def authenticate(self, stale_token=None):
+        """
+        Fetch a new access token using the client credentials grant.
+
+        Args:
+            stale_token: Token the caller saw rejected or expire. If another
+                thread has already replaced it with a valid one, that is reused.
+
+        Returns:
+            The access token
+        """
+        with self._token_lock:
+            if self.token and self.token != stale_token and time.time() < self.token_expires_at:
+                return self.token
+
+            response = self._send("POST", self.token_url, auth=False, data={
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+            })
+            response.raise_for_status()
+            token = response.json()
+            self.token = token["access_token"]
+            # Refresh a minute early so long downloads don't hit expiry mid-request
+            self.token_expires_at = time.time() + token.get("expires_in", 3600) - 60
+            return self.token
+
+    def _current_token(self):
+        if not self.token or time.time() >= self.token_expires_at:
+            return self.authenticate(stale_token=self.token)
+        return self.token
+
+    def _sleep(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = self.backoff * (2 ** attempt)
+        # Jitter keeps parallel workers from retrying in lockstep
+        time.sleep(delay * (0.5 + random.random() / 2))
+
+    def _send(self, method, url, auth=True, **kwargs):
+        """Send a request with retries, backoff and one token refresh on 401."""
+        kwargs.setdefault("timeout", self.timeout)
+        base_headers = kwargs.pop("headers", None) or {}
+        refreshed = False
+        attempt = 0
+
+        while True:
+            headers = dict(base_headers)
+            token = None
+            if auth:
+                token = self._current_token()
+                headers["Authorization"] = f"Bearer {token}"
+
+            try:
+                response = self.session.request(method, url, headers=headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                self._sleep(attempt)
+                attempt += 1
+                continue
+
+            if auth and response.status_code == 401 and not refreshed:
+                response.close()
+                self.authenticate(stale_token=token)
+                refreshed = True
+                continue
+
+            if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                response.close()
+                self._sleep(attempt, response)
+                attempt += 1
+                continue
+
+            return response
+
+    def search_catalog(self, bbox, start_date, end_date, collection="sentinel-1-grd", page_size=100, max_items=None):
+        """
+        Search the Catalog API, following `next` tokens across pages.
+
+        Args:
+            bbox: [minLon, minLat, maxLon, maxLat]
+            start_date: First day (YYYY-MM-DD)
+            end_date: Last day (YYYY-MM-DD)
+            collection: Catalog collection id
+            page_size: Items requested per page (the API caps this at 100)
+            max_items: Stop after this many items (None for all)
+
+        Returns:
+            List of catalog features
+        """
+        payload = {
+            "bbox": bbox,
+            "datetime": f"{start_date}T00:00:00Z/{end_date}T23:59:59Z",
+            "collections": [collection],
+            "limit": page_size
+        }
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        features = []
+
+        while True:
+            response = self._send("POST", self.catalog_url, json=payload, headers=headers)
+            response.raise_for_status()
+            data = response.json()
+            features.extend(data.get("features", []))
+
+            next_token = data.get("context", {}).get("next")
+            if next_token is None or (max_items is not None and len(features) >= max_items):
+                break
+            payload["next"] = next_token
+
+        return features[:max_items] if max_items is not None else features
+
+    def download_image(self, date, bbox, file_path, layer="IW_VV", width=1024, height=1024, image_format="image/png"):
+        """
+        Download one WMS image atomically.
+
+        Returns:
+            file_path on success (or if the file already exists), None on failure
+        """
+        if os.path.exists(file_path):
+            return file_path
+
+        params = {
+            "SERVICE": "WMS",
+            "VERSION": "1.1.1",
+            "REQUEST": "GetMap",
+            "LAYERS": layer,
+            "STYLES": "",
+            "FORMAT": image_format,
+            "WIDTH": width,
+            "HEIGHT": height,
+            "BBOX": ",".join(map(str, bbox)),
+            "CRS": "EPSG:4326",
+            "TIME": date
+        }
+
+        response = self._send("GET", self.wms_url, params=params, stream=True)
+        if response.status_code != 200:
+            print(f"❌ Failed to download image for {date}: {response.text}")
+            return None
+
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        tmp_path = f"{file_path}.part"
+        try:
+            with response, open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=65536):
+                    f.write(chunk)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return file_path
+
+    def download_many(self, jobs):
+        """
+        Download many images with bounded parallelism.
+
+        Args:
+            jobs: List of keyword-argument dicts for `download_image`
+
+        Returns:
+            List of file paths (None for failures) in the same order as jobs
+        """
+        def run(job):
+            try:
+                return self.download_image(**job)
+            except requests.RequestException as e:
+                print(f"❌ Failed to download image for {job.get('date')}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(run, jobs))
@@ -0,0 +1,228 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from functools import cached_property
+
+import numpy as np
+
+# Registry layout:
+#   <root>/<name>/v<N>/metadata.json   name, version, format, metrics, scaler, extra
+#   <root>/<name>/v<N>/<artifact>      model in its native format (see FORMATS)
+DEFAULT_ROOT = os.environ.get("GLOF_MODEL_REGISTRY", "models")
+
+# Native artifact written for each supported model format
+FORMATS = {
+    'xgboost': 'model.ubj',     # XGBoost universal binary JSON
+    'keras': 'model.keras',     # Keras v3 zip archive
+    'onnx': 'model.onnx',       # Serialized ONNX graph
+    'numpy': 'weights',         # Directory of .npy arrays, memory-mapped on load
+}
+
+def _to_jsonable(value):
+    """Convert numpy scalars/arrays (e.g. in metrics dicts) to plain JSON types."""
+    if isinstance(value, dict):
+        return {str(k): _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def scaler_to_metadata(scaler):
+    """
+    Describe a fitted scikit-learn scaler as plain JSON.
+
+    Args:
+        scaler: Fitted scaler from sklearn.preprocessing (e.g. MinMaxScaler)
+
+    Returns:
+        Dictionary with the scaler class, constructor params and fitted attributes
+    """
+    fitted = {k: v for k, v in vars(scaler).items() if k.endswith('_') and not k.startswith('_')}
+    return {
+        'type': type(scaler).__name__,
+        'params': _to_jsonable(scaler.get_params()),
+        'attributes': _to_jsonable(fitted),
+    }
+
+def scaler_from_metadata(meta):
+    """Rebuild a fitted scikit-learn scaler from `scaler_to_metadata` output."""
+    from sklearn import preprocessing
+
+    params = dict(meta['params'])
+    if 'feature_range' in params:
+        params['feature_range'] = tuple(params['feature_range'])
+    scaler = getattr(preprocessing, meta['type'])(**params)
+    for key, value in meta['attributes'].items():
+        setattr(scaler, key, np.asarray(value) if isinstance(value, list) else value)
+    return scaler
+
+def _save_artifact(model, fmt, path):
+    if fmt == 'xgboost':
+        model.save_model(path)
+    elif fmt == 'keras':
+        model.save(path)
+    elif fmt == 'onnx':
+        data = model if isinstance(model, bytes) else model.SerializeToString()
+        with open(path, 'wb') as f:
+            f.write(data)
+    elif fmt == 'numpy':
+        os.makedirs(path)
+        for key, array in model.items():
+            np.save(os.path.join(path, f"{key}.npy"), np.ascontiguousarray(array))
+    else:
+        raise ValueError(f"Unsupported model format '{fmt}'. Choose from {sorted(FORMATS)}")
+
+def _load_artifact(fmt, path):
+    if fmt == 'xgboost':
+        import xgboost as xgb
+
+        booster = xgb.Booster()
+        booster.load_model(path)
+        return booster
+    if fmt == 'keras':
+        import tensorflow as tf
+
+        return tf.keras.models.load_model(path, compile=False)
+    if fmt == 'onnx':
+        import onnxruntime as ort
+
+        return ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+    if fmt == 'numpy':
+        # Arrays stay on disk and are shared between forked workers via the page cache
+        return {
+            name[:-len('.npy')]: np.load(os.path.join(path, name), mmap_mode='r')
+            for name in sorted(os.listdir(path)) if name.endswith('.npy')
+        }
+    raise ValueError(f"Unsupported model format '{fmt}'. Choose from {sorted(FORMATS)}")
+
+class ModelHandle:
+    """
+    A registered model version.
+
+    Only metadata.json is read up front; the model and scaler are
+    deserialized on first access and then cached on the handle.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'metadata.json')) as f:
+            self.metadata = json.load(f)
+
+    @property
+    def name(self):
+        return self.metadata['name']
+
+    @property
+    def version(self):
+        return self.metadata['version']
+
+    @property
+    def metrics(self):
+        return self.metadata.get('metrics', {})
+
+    @property
+    def extra(self):
+        return self.metadata.get('extra', {})
+
+    @cached_property
+    def model(self):
+        fmt = self.metadata['format']
+        return _load_artifact(fmt, os.path.join(self.path, FORMATS[fmt]))
+
+    @cached_property
+    def scaler(self):
+        meta = self.metadata.get('scaler')
+        return scaler_from_metadata(meta) if meta else None
+
+    def __repr__(self):
+        return f"ModelHandle({self.name!r}, version={self.version}, format={self.metadata['format']!r})"
+
+class ModelRegistry:
+    """Versioned on-disk store that keeps one native-format copy of each model."""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    def versions(self, name):
+        """List the saved versions of a model in ascending order."""
+        model_dir = os.path.join(self.root, name)
+        if not os.path.isdir(model_dir):
+            return []
+        return sorted(
+            int(entry[1:]) for entry in os.listdir(model_dir)
+            if entry.startswith('v') and entry[1:].isdigit()
+        )
+
+    def latest_version(self, name):
+        versions = self.versions(name)
+        return versions[-1] if versions else None
+
+    def save(self, name, model, fmt, scaler=None, metrics=None, extra=None):
+        """
+        Save a new version of a model.
+
+        Args:
+            name: Model name (one directory per model)
+            model: Model object in the given format (XGBoost Booster, Keras model,
+                ONNX ModelProto/bytes, or a dict of numpy arrays)
+            fmt: One of FORMATS
+            scaler: Optional fitted scikit-learn scaler, stored as metadata
+            metrics: Optional dictionary of evaluation metrics
+            extra: Optional dictionary of extra JSON metadata (feature names, labels...)
+
+        Returns:
+            The new version number
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported model format '{fmt}'. Choose from {sorted(FORMATS)}")
+
+        model_dir = os.path.join(self.root, name)
+        os.makedirs(model_dir, exist_ok=True)
+        version = (self.latest_version(name) or 0) + 1
+
+        metadata = {
+            'name': name,
+            'version': version,
+            'format': fmt,
+            'artifact': FORMATS[fmt],
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'metrics': _to_jsonable(metrics or {}),
+            'scaler': scaler_to_metadata(scaler) if scaler is not None else None,
+            'extra': _to_jsonable(extra or {}),
+        }
+
+        # Build the version in a temp directory and rename it into place, so
+        # readers never see a half-written version
+        tmp_dir = tempfile.mkdtemp(prefix=f".v{version}-", dir=model_dir)
+        os.chmod(tmp_dir, 0o755)
+        try:
+            _save_artifact(model, fmt, os.path.join(tmp_dir, FORMATS[fmt]))
+            with open(os.path.join(tmp_dir, 'metadata.json'), 'w') as f:
+                json.dump(metadata, f, indent=2)
+            os.rename(tmp_dir, os.path.join(model_dir, f"v{version}"))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        return version
+
+    def load(self, name, version=None):
+        """
+        Get a lazily loaded handle to a model version (latest by default).
+
+        Raises:
+            FileNotFoundError: If the model or version does not exist
+        """
+        if version is None:
+            version = self.latest_version(name)
+            if version is None:
+                raise FileNotFoundError(f"No versions of model '{name}' found in {self.root}")
+        path = os.path.join(self.root, name, f"v{version}")
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"Model '{name}' version {version} not found in {self.root}")
+        return ModelHandle(path)
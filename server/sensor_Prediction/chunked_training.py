@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+# Sensor columns in model order, and the label column with its class encoding
+FEATURES = [
+    'air_temp_C', 'air_humidity_%', 'water_temp_C', 'altitude_change_m',
+    'tilt_x_deg', 'tilt_y_deg', 'tilt_z_deg', 'ground_temp_C',
+    'seismic_activity_Hz', 'flow_velocity_mps'
+]
+LABEL = 'glof_risk'
+LABELS = {'Low': 0, 'Medium': 1, 'High': 2}
+
+def read_chunks(path, chunk_rows=65536):
+    """
+    Stream (X, y) chunks from a CSV file or a Parquet file/directory.
+
+    Only the feature and label columns are read. Features come out as
+    float32 (CSV columns are parsed straight to float32), labels as int32
+    class ids, so at most one chunk of rows is in memory at a time.
+
+    Args:
+        path: .csv file, .parquet file, or directory of Parquet files
+        chunk_rows: Rows per chunk
+
+    Yields:
+        X: (n, len(FEATURES)) float32 array
+        y: (n,) int32 array
+    """
+    if os.path.isdir(path) or path.endswith('.parquet'):
+        import pyarrow.dataset as ds
+
+        frames = (
+            batch.to_pandas()
+            for batch in ds.dataset(path, format='parquet').to_batches(columns=FEATURES + [LABEL], batch_size=chunk_rows)
+        )
+    else:
+        frames = pd.read_csv(path, usecols=FEATURES + [LABEL], dtype={f: np.float32 for f in FEATURES}, chunksize=chunk_rows)
+
+    for frame in frames:
+        # Live telemetry rows have no label yet
+        frame = frame[frame[LABEL].notna()]
+        labels = frame[LABEL]
+        if not pd.api.types.is_numeric_dtype(labels):
+            labels = labels.map(LABELS)
+        yield frame[FEATURES].to_numpy(np.float32), labels.to_numpy(np.int32)
+
+def holdout_mask(chunk_index, n, valid_fraction=0.2, seed=42):
+    """Deterministic validation rows of a chunk (the same on every pass over the data)."""
+    return np.random.default_rng([seed, chunk_index]).random(n) < valid_fraction
+
+class ChunkIter(xgb.DataIter):
+    """
+    XGBoost external-memory iterator over the training or validation rows of an archive.
+
+    XGBoost calls next() once per chunk and reset() between passes; each
+    chunk is quantized and paged to the cache on disk, so the archive is
+    never loaded whole.
+    """
+
+    def __init__(self, path, subset='train', chunk_rows=65536, valid_fraction=0.2, seed=42, cache_prefix=None):
+        self.path = path
+        self.subset = subset
+        self.chunk_rows = chunk_rows
+        self.valid_fraction = valid_fraction
+        self.seed = seed
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._chunks = None
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = enumerate(read_chunks(self.path, self.chunk_rows))
+        for chunk_index, (X, y) in self._chunks:
+            mask = holdout_mask(chunk_index, len(y), self.valid_fraction, self.seed)
+            if self.subset == 'train':
+                mask = ~mask
+            if mask.any():
+                input_data(data=X[mask], label=y[mask])
+                return True
+        return False
+
+def metrics_from_confusion(confusion):
+    """Accuracy and support-weighted precision/recall/F1 (as sklearn's average='weighted')."""
+    confusion = confusion.astype(np.float64)
+    true_positives = np.diag(confusion)
+    support = confusion.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.nan_to_num(true_positives / confusion.sum(axis=0))
+        recall = np.nan_to_num(true_positives / support)
+        f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+    weights = support / support.sum()
+    return {
+        'accuracy': true_positives.sum() / support.sum(),
+        'precision': float(precision @ weights),
+        'recall': float(recall @ weights),
+        'f1_score': float(f1 @ weights),
+        'confusion_matrix': confusion.astype(np.int64)
+    }
+
+def train_out_of_core(path, params, num_round, chunk_rows=65536, valid_fraction=0.2, seed=42, max_bin=256, cache_dir=None):
+    """
+    Train on an archive of any size through external memory.
+
+    Training rows are streamed into an ExtMemQuantileDMatrix (hist method,
+    quantized pages cached on disk); validation rows are then streamed
+    through the booster chunk by chunk, accumulating only a confusion
+    matrix. Peak memory is bounded by chunk_rows, not by the archive size.
+
+    Args:
+        path: CSV file, Parquet file or directory of Parquet files
+        params: XGBoost parameters (tree_method/max_bin are set here)
+        num_round: Boosting rounds
+        chunk_rows: Rows read per chunk
+        valid_fraction: Fraction of rows held out for evaluation
+        seed: Seed of the train/validation split
+        max_bin: Quantile bins
+        cache_dir: Directory for the external-memory cache (temporary if None)
+
+    Returns:
+        model: Trained Booster
+        metrics: Validation metrics (see metrics_from_confusion)
+    """
+    own_cache = cache_dir is None
+    cache_dir = cache_dir or tempfile.mkdtemp(prefix='glof-xgb-cache-')
+    try:
+        train_iter = ChunkIter(path, 'train', chunk_rows, valid_fraction, seed, cache_prefix=os.path.join(cache_dir, 'train'))
+        dtrain = xgb.ExtMemQuantileDMatrix(train_iter, max_bin=max_bin)
+        model = xgb.train({**params, 'tree_method': 'hist', 'max_bin': max_bin}, dtrain, num_round)
+        del dtrain
+    finally:
+        if own_cache:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    n_classes = params.get('num_class', len(LABELS))
+    confusion = np.zeros((n_classes, n_classes), dtype=np.int64)
+    for chunk_index, (X, y) in enumerate(read_chunks(path, chunk_rows)):
+        mask = holdout_mask(chunk_index, len(y), valid_fraction, seed)
+        if mask.any():
+            y_pred = np.argmax(model.inplace_predict(X[mask]), axis=1)
+            np.add.at(confusion, (y[mask], y_pred), 1)
+
+    return model, metrics_from_confusion(confusion)
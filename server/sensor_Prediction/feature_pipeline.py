@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+# Raw sensor columns in model order (the model's inputs when no pipeline is used)
+FEATURES = [
+    'air_temp_C', 'air_humidity_%', 'water_temp_C', 'altitude_change_m',
+    'tilt_x_deg', 'tilt_y_deg', 'tilt_z_deg', 'ground_temp_C',
+    'seismic_activity_Hz', 'flow_velocity_mps'
+]
+
+# Defaults: readings per window, and lags (in readings) kept as features
+WINDOW = 8
+LAGS = (1, 4)
+
+def window_features(values, times, lags=LAGS):
+    """
+    Features of the newest reading of each window.
+
+    Training and serving both call this one function on (..., window, C)
+    arrays, so the two paths cannot drift apart. Per channel, in order:
+    current value, lagged values, first difference, rate of change and
+    least-squares slope (per minute), window mean and standard deviation.
+
+    Args:
+        values: (..., window, C) float32 readings, oldest first
+        times: (..., window) epoch seconds
+        lags: Lags in readings (each < window)
+
+    Returns:
+        (..., C * (5 + len(lags))) float32 array
+    """
+    values = values.astype(np.float64)
+    times = times.astype(np.float64)
+    current = values[..., -1, :]
+
+    delta = current - values[..., -2, :]
+    dt = (times[..., -1] - times[..., -2])[..., None]
+    rate = np.divide(delta * 60, dt, out=np.zeros_like(delta), where=dt > 0)
+
+    # Least-squares slope of value over time; 0 while the window has no time spread
+    t = times - times.mean(axis=-1, keepdims=True)
+    t_var = (t ** 2).sum(axis=-1)[..., None]
+    covariance = np.einsum('...w,...wc->...c', t, values - values.mean(axis=-2, keepdims=True))
+    slope = np.divide(covariance * 60, t_var, out=np.zeros_like(covariance), where=t_var > 0)
+
+    parts = [current] + [values[..., -1 - lag, :] for lag in lags]
+    parts += [delta, rate, slope, values.mean(axis=-2), values.std(axis=-2)]
+    return np.concatenate(parts, axis=-1).astype(np.float32)
+
+def feature_names(channels=FEATURES, lags=LAGS):
+    """Column names of window_features output."""
+    names = list(channels)
+    for lag in lags:
+        names += [f"{channel}_lag{lag}" for channel in channels]
+    for suffix in ('delta', 'rate_per_min', 'slope_per_min', 'mean', 'std'):
+        names += [f"{channel}_{suffix}" for channel in channels]
+    return names
+
+class FeaturePipeline:
+    """
+    Windowed features over each sensor's recent readings.
+
+    transform() computes them for a whole archive (training); update()
+    keeps per-sensor ring buffers and computes them for one new reading
+    per sensor at a constant cost (serving). Both handle gaps the same way:
+    a missing reading repeats the sensor's previous one (0 before any), and
+    a sensor's first reading fills its whole window.
+    """
+
+    def __init__(self, window=WINDOW, lags=LAGS, channels=FEATURES, capacity=1024):
+        if max(lags) >= window:
+            raise ValueError(f"Lags {lags} must be shorter than the window ({window})")
+        self.window = window
+        self.lags = tuple(lags)
+        self.channels = list(channels)
+        self.names = feature_names(self.channels, self.lags)
+        self.index = {}  # sensor id -> ring row
+        self._allocate(capacity)
+
+    def config(self):
+        """Settings stored with a trained model (see from_config)."""
+        return {'window': self.window, 'lags': list(self.lags), 'channels': self.channels}
+
+    @classmethod
+    def from_config(cls, config, capacity=1024):
+        return cls(config['window'], config['lags'], config['channels'], capacity)
+
+    def _allocate(self, capacity):
+        self.values = np.zeros((capacity, self.window, len(self.channels)), dtype=np.float32)
+        self.times = np.zeros((capacity, self.window), dtype=np.float64)
+        self.pos = np.zeros(capacity, dtype=np.int64)  # slot of the next reading
+
+    def transform(self, frame, sensor_column='sensor', time_column='timestamp', chunk_rows=65536):
+        """
+        Features of every reading of an archive.
+
+        Args:
+            frame: DataFrame with the sensor, timestamp and channel columns
+            sensor_column: Column of sensor ids (one series if missing)
+            time_column: Column of epoch-second timestamps
+            chunk_rows: Windows computed at once (bounds the temporary memory)
+
+        Returns:
+            (len(frame), len(names)) float32 array, in the row order of `frame`
+        """
+        sensors = frame[sensor_column].to_numpy() if sensor_column in frame else np.zeros(len(frame))
+        order = np.lexsort((frame[time_column].to_numpy(), sensors))
+        features = np.empty((len(frame), len(self.names)), dtype=np.float32)
+
+        sorted_sensors = sensors[order]
+        starts = np.flatnonzero(np.r_[True, sorted_sensors[1:] != sorted_sensors[:-1]])
+        for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+            rows = order[start:end]
+            series = frame.iloc[rows]
+            values = series[self.channels].ffill().fillna(0).to_numpy(np.float32)
+            times = series[time_column].to_numpy(np.float64)
+
+            # Front padding with the first reading, as update() does for a new sensor
+            pad = self.window - 1
+            values = np.concatenate([np.repeat(values[:1], pad, axis=0), values])
+            times = np.concatenate([np.repeat(times[:1], pad), times])
+            # Zero-copy (n, window, C) and (n, window) views over the series
+            value_windows = np.lib.stride_tricks.sliding_window_view(values, self.window, axis=0).swapaxes(1, 2)
+            time_windows = np.lib.stride_tricks.sliding_window_view(times, self.window)
+
+            for i in range(0, len(rows), chunk_rows):
+                features[rows[i:i + chunk_rows]] = window_features(
+                    value_windows[i:i + chunk_rows], time_windows[i:i + chunk_rows], self.lags
+                )
+        return features
+
+    def update(self, sensors, timestamps, X):
+        """
+        Push one reading per sensor and return its features.
+
+        Args:
+            sensors: Sensor ids (unique within the batch)
+            timestamps: Epoch seconds
+            X: (n, len(channels)) readings (NaN = missing)
+
+        Returns:
+            (n, len(names)) float32 array
+        """
+        rows = np.empty(len(sensors), dtype=np.int64)
+        new = np.zeros(len(sensors), dtype=bool)
+        for i, sensor in enumerate(sensors):
+            row = self.index.get(sensor)
+            if row is None:
+                row = self.index[sensor] = len(self.index)
+                new[i] = True
+            rows[i] = row
+        if len(self.index) > len(self.pos):
+            old = (self.values, self.times, self.pos)
+            self._allocate(max(2 * len(self.pos), len(self.index)))
+            self.values[:len(old[0])], self.times[:len(old[1])], self.pos[:len(old[2])] = old
+
+        X = np.array(X, dtype=np.float32)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        previous = self.values[rows, (self.pos[rows] - 1) % self.window]
+        X = np.where(np.isnan(X), np.where(new[:, None], 0, previous), X)
+
+        # A new sensor's window starts filled with its first reading
+        self.values[rows[new]] = X[new, None, :]
+        self.times[rows[new]] = timestamps[new, None]
+        slots = self.pos[rows]
+        self.values[rows, slots] = X
+        self.times[rows, slots] = timestamps
+        self.pos[rows] = (slots + 1) % self.window
+
+        # Gather each ring oldest-first: (n, window) indices, constant work per reading
+        order = (self.pos[rows, None] + np.arange(self.window)) % self.window
+        return window_features(self.values[rows[:, None], order], self.times[rows[:, None], order], self.lags)
+
+def training_matrix(frame, pipeline=None, label='glof_risk'):
+    """
+    Feature matrix and labels for training.
+
+    Without a pipeline the raw FEATURES are used as-is (one independent
+    sample per row, as in south_lhonak_glof_samples.csv). With one, the
+    frame must be time-ordered telemetry (sensor/timestamp columns);
+    features are computed over every reading, then unlabeled rows are dropped.
+
+    Returns:
+        X: DataFrame of features
+        y: Series of integer class ids
+    """
+    labels = frame[label]
+    if not pd.api.types.is_numeric_dtype(labels):
+        labels = labels.map({'Low': 0, 'Medium': 1, 'High': 2})
+    if pipeline is None:
+        X = frame[FEATURES]
+    else:
+        X = pd.DataFrame(pipeline.transform(frame), columns=pipeline.names, index=frame.index)
+    labeled = labels.notna().to_numpy()
+    return X[labeled], labels[labeled].astype(int)
@@ -0,0 +1,275 @@
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from model_registry import ModelRegistry
+from feature_pipeline import FeaturePipeline
+from stream_detector import StreamDetector
+
+# Feature order expected by the model (same columns as south_lhonak_glof_samples.csv)
+FEATURES = [
+    'air_temp_C', 'air_humidity_%', 'water_temp_C', 'altitude_change_m',
+    'tilt_x_deg', 'tilt_y_deg', 'tilt_z_deg', 'ground_temp_C',
+    'seismic_activity_Hz', 'flow_velocity_mps'
+]
+RISK_LABELS = ['low', 'medium', 'high']
+
+MODEL_DIR = os.environ.get("GLOF_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+MODEL_NAME = "glof_risk_model"
+MODEL_VERSION = int(os.environ["GLOF_MODEL_VERSION"]) if os.environ.get("GLOF_MODEL_VERSION") else None
+
+# Micro-batching settings: a batch is flushed when it is full or when the
+# oldest queued request has waited MAX_WAIT_MS milliseconds
+MAX_BATCH_SIZE = int(os.environ.get("GLOF_MAX_BATCH_SIZE", 256))
+MAX_WAIT_MS = float(os.environ.get("GLOF_MAX_WAIT_MS", 5))
+
+def load_booster(model_dir=MODEL_DIR, version=MODEL_VERSION):
+    """
+    Load the trained XGBoost booster once (latest registered version by default).
+
+    Returns:
+        booster: The Booster
+        pipeline: FeaturePipeline if the model was trained on windowed features, else None
+    """
+    handle = ModelRegistry(model_dir).load(MODEL_NAME, version)
+    booster = handle.model
+    # One thread per predict call; concurrency comes from batching instead
+    booster.set_param({'nthread': 1})
+    config = handle.extra.get('feature_pipeline')
+    return booster, FeaturePipeline.from_config(config) if config else None
+
+class MicroBatcher:
+    """
+    Collect concurrent prediction requests into micro-batches.
+
+    Each request is an (n, len(FEATURES)) float32 array. Queued requests are
+    stacked into a single array and scored with one `inplace_predict` call,
+    so no per-request DMatrix is ever built.
+    """
+
+    def __init__(self, booster, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.booster = booster
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = None
+        self.worker = None
+        self.batches_run = 0
+        self.rows_scored = 0
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+
+    async def predict(self, rows):
+        """
+        Queue rows for scoring and wait for their probabilities.
+
+        Args:
+            rows: Array of shape (n, len(FEATURES))
+
+        Returns:
+            Array of shape (n, len(RISK_LABELS)) with class probabilities
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+    async def _collect(self):
+        """Wait for the first request, then gather more until the batch is full or the deadline passes."""
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[0])
+
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            stacked = np.concatenate([rows for rows, _ in batch])
+
+            try:
+                # Score outside the event loop so new requests keep queueing
+                probabilities = await loop.run_in_executor(None, self.booster.inplace_predict, stacked)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.rows_scored += len(stacked)
+
+            # Hand each caller back its own slice of the batch result
+            offset = 0
+            for rows, future in batch:
+                if not future.done():
+                    future.set_result(probabilities[offset:offset + len(rows)])
+                offset += len(rows)
+
+def to_rows(features, missing=0.0):
+    """Validate raw feature vectors and convert them to a float32 array (NaN replaced by `missing`)."""
+    try:
+        rows = np.asarray(features, dtype=np.float32)
+    except ValueError:
+        rows = None
+    if rows is None or rows.ndim != 2 or rows.shape[1] != len(FEATURES):
+        raise HTTPException(
+            status_code=422,
+            detail=f"Expected vectors of {len(FEATURES)} features ({', '.join(FEATURES)})"
+        )
+    # The dashboard sends 0 for missing readings; treat NaN the same way
+    return rows if np.isnan(missing) else np.nan_to_num(rows, nan=missing)
+
+class PredictRequest(BaseModel):
+    features: list[float]
+
+def require_raw_model():
+    # A windowed-feature model needs each sensor's history, which only /stream keeps
+    if app.state.pipeline is not None:
+        raise HTTPException(status_code=409, detail="The loaded model uses windowed features; send readings to /stream")
+
+class PredictBatchRequest(BaseModel):
+    instances: list[list[float]]
+
+class StreamReading(BaseModel):
+    sensor: str
+    timestamp: float
+    features: list[float | None]  # null for a missing reading
+
+class StreamRequest(BaseModel):
+    readings: list[StreamReading]
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load the booster once per process and keep it for the server's lifetime
+    booster, app.state.pipeline = load_booster()
+    app.state.batcher = MicroBatcher(booster)
+    app.state.batcher.start()
+    app.state.detector = StreamDetector()
+    app.state.stream_lock = asyncio.Lock()
+    yield
+    await app.state.batcher.stop()
+
+app = FastAPI(title="GLOF Sensor Risk Model", lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+@app.post("/predict")
+async def predict(request: PredictRequest):
+    """Score a single sensor reading."""
+    require_raw_model()
+    probabilities = await app.state.batcher.predict(to_rows([request.features]))
+    probabilities = probabilities[0].tolist()
+    return {
+        'probabilities': probabilities,
+        'risk_level': RISK_LABELS[int(np.argmax(probabilities))]
+    }
+
+@app.post("/predict_batch")
+async def predict_batch(request: PredictBatchRequest):
+    """Score many sensor readings in one request."""
+    require_raw_model()
+    if not request.instances:
+        return {'probabilities': [], 'risk_levels': []}
+    probabilities = await app.state.batcher.predict(to_rows(request.instances))
+    return {
+        'probabilities': probabilities.tolist(),
+        'risk_levels': [RISK_LABELS[i] for i in np.argmax(probabilities, axis=1)]
+    }
+
+def stream_rounds(sensors):
+    """
+    Split a request into rounds of reading indices with one reading per sensor.
+
+    The detector takes one reading per sensor at a time, so the n-th reading
+    of each sensor goes to round n (request order is kept within a round).
+    """
+    rounds, seen = [], {}
+    for i, sensor in enumerate(sensors):
+        n = seen.get(sensor, 0)
+        seen[sensor] = n + 1
+        if n == len(rounds):
+            rounds.append([])
+        rounds[n].append(i)
+    return rounds
+
+@app.post("/stream")
+async def stream(request: StreamRequest):
+    """
+    Feed live readings to the streaming detector.
+
+    Rolling statistics are updated for every reading; only readings that
+    changed materially (or raised a CUSUM alarm) are scored by the model.
+    Returns the CUSUM alarms and risk-level changes.
+    """
+    if not request.readings:
+        return {'alerts': [], 'readings': 0, 'scored': 0}
+
+    # Validate every reading before the detector sees any, so a bad one can't leave its state half-updated
+    sensors = [reading.sensor for reading in request.readings]
+    timestamps = np.array([reading.timestamp for reading in request.readings], dtype=np.float64)
+    X = to_rows([[np.nan if v is None else v for v in reading.features] for reading in request.readings], missing=np.nan)
+
+    loop = asyncio.get_running_loop()
+    batcher = app.state.batcher
+
+    def score(rows):
+        # process() runs in a worker thread; its rows join the micro-batches on the event loop
+        return asyncio.run_coroutine_threadsafe(batcher.predict(rows), loop).result()
+
+    def run():
+        alerts, scored = [], 0
+        for rows in stream_rounds(sensors):
+            round_alerts, round_scored = app.state.detector.process(
+                [sensors[i] for i in rows], timestamps[rows], X[rows], score, app.state.pipeline
+            )
+            alerts += round_alerts
+            scored += round_scored
+        return alerts, scored
+
+    # The detector and feature pipeline are not thread-safe; one request updates them at a time
+    async with app.state.stream_lock:
+        alerts, scored = await loop.run_in_executor(None, run)
+    return {'alerts': alerts, 'readings': len(request.readings), 'scored': scored}
+
+@app.get("/health")
+async def health():
+    batcher = app.state.batcher
+    return {
+        'status': 'ok',
+        'batches_run': batcher.batches_run,
+        'rows_scored': batcher.rows_scored,
+        'stream_sensors': len(app.state.detector.sensor_ids)
+    }
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
@@ -3,24 +3,32 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import confusion_matrix, classification_report, accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
-import pickle
-
-# Load dataset
-df = pd.read_csv("south_lhonak_glof_samples.csv")
-
-# Preprocess dataset (encode categorical labels)
-df['glof_risk'] = df['glof_risk'].map({'Low': 0, 'Medium': 1, 'High': 2})
-
-# Features and target
-X = df.drop(columns=['glof_risk'])
-y = df['glof_risk']
-
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Convert to DMatrix format
-dtrain = xgb.DMatrix(X_train, label=y_train)
-dtest = xgb.DMatrix(X_test, label=y_test)
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from model_registry import ModelRegistry
+
+parser = argparse.ArgumentParser(description="Train the sensor-based GLOF risk classifier")
+parser.add_argument('command', nargs='?', choices=['train', 'tune'], default='train',
+                    help="'train' (default) fits and registers the model; 'tune' runs a cross-validated parameter sweep")
+parser.add_argument('--no-report', action='store_true', help="Headless run: only train and register the model")
+parser.add_argument('--data', default="south_lhonak_glof_samples.csv", help="Training data: CSV file, Parquet file or directory of Parquet files")
+parser.add_argument('--out-of-core', action='store_true',
+                    help="train: stream the data in chunks through XGBoost external memory instead of loading it")
+parser.add_argument('--chunk-rows', type=int, default=65536, help="--out-of-core: rows read per chunk")
+parser.add_argument('--features', choices=['raw', 'windowed'], default='raw',
+                    help="'raw' (default) uses the 10 instantaneous readings; 'windowed' adds lags, rates and "
+                         "window statistics per sensor (needs telemetry with sensor and timestamp columns)")
+parser.add_argument('--window', type=int, default=8, help="--features windowed: readings per window")
+parser.add_argument('--folds', type=int, default=5, help="tune: cross-validation folds")
+parser.add_argument('--workers', type=int, default=None, help="tune: worker processes (default: all cores)")
+parser.add_argument('--max-trials', type=int, default=None, help="tune: random sample of the grid (default: full grid)")
+parser.add_argument('--output', default='tuning_results.csv', help="tune: CSV of all trials")
+args = parser.parse_args()
+if args.out_of_core and args.features == 'windowed':
+    parser.error("--features windowed needs each sensor's full series in memory; drop --out-of-core")
 
 # Define model parameters
 params = {
@@ -30,45 +38,91 @@ params = {
     'eta': 0.1,
     'eval_metric': 'merror'
 }
-
-# Train the XGBoost model
 num_round = 100
-model = xgb.train(params, dtrain, num_round)
-
-# Predict on test data
-y_pred_prob = model.predict(dtest)  # Now gets probabilities
-y_pred = np.argmax(y_pred_prob, axis=1)  # Convert probabilities to class labels
-
-# Calculate Accuracy
-accuracy = accuracy_score(y_test, y_pred)
-print(f'Accuracy: {accuracy * 100:.2f}%')
-
-# Confusion Matrix
-conf_matrix = confusion_matrix(y_test, y_pred)
-print("Confusion Matrix:\n", conf_matrix)
-
-# Classification Report (Precision, Recall, F1 Score)
-class_report = classification_report(y_test, y_pred, target_names=['Low', 'Medium', 'High'])
-print("Classification Report:\n", class_report)
-
-# F1 Score
-f1 = f1_score(y_test, y_pred, average='weighted')
-print(f'F1 Score: {f1:.2f}')
-
-# Precision
-precision = precision_score(y_test, y_pred, average='weighted')
-print(f'Precision: {precision:.2f}')
-
-# Recall
-recall = recall_score(y_test, y_pred, average='weighted')
-print(f'Recall: {recall:.2f}')
-
-# AUC (Area Under Curve) - multi-class probabilities
-auc = roc_auc_score(y_test, y_pred_prob, multi_class='ovr', average='macro')
-print(f'AUC (Area Under Curve): {auc:.2f}')
-
-# Save model to a pickle file
-with open("glof_risk_model.pkl", "wb") as model_file:
-    pickle.dump(model, model_file)
 
-print("Model saved as 'glof_risk_model.pkl'.")
\ No newline at end of file
+if args.out_of_core and args.command == 'train':
+    # Stream the archive through an external-memory DataIter; peak memory is bounded by --chunk-rows
+    from chunked_training import FEATURES, train_out_of_core
+
+    model, metrics = train_out_of_core(args.data, params, num_round, chunk_rows=args.chunk_rows)
+    features = FEATURES
+    pipeline = None
+    y_test = y_pred = y_pred_prob = None
+else:
+    from feature_pipeline import FeaturePipeline, training_matrix
+
+    # Load dataset (CSV, or Parquet telemetry such as the telemetry store's directory)
+    if os.path.isdir(args.data) or args.data.endswith('.parquet'):
+        df = pd.read_parquet(args.data)
+    else:
+        df = pd.read_csv(args.data)
+
+    # Features and target (labels encoded as 0/1/2; the same pipeline runs when serving)
+    pipeline = FeaturePipeline(window=args.window) if args.features == 'windowed' else None
+    X, y = training_matrix(df, pipeline)
+    features = list(X.columns)
+
+    if args.command == 'tune':
+        from sensor_tuning import tune
+
+        tune(X.to_numpy(np.float32), y.to_numpy(), n_folds=args.folds, workers=args.workers,
+             max_trials=args.max_trials, output_path=args.output)
+        sys.exit(0)
+
+    # Train-test split
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Convert to DMatrix format
+    dtrain = xgb.DMatrix(X_train, label=y_train)
+    dtest = xgb.DMatrix(X_test, label=y_test)
+
+    # Train the XGBoost model
+    model = xgb.train(params, dtrain, num_round)
+
+    # Predict on test data
+    y_pred_prob = model.predict(dtest)  # Now gets probabilities
+    y_pred = np.argmax(y_pred_prob, axis=1)  # Convert probabilities to class labels
+
+    # Evaluation metrics (kept with the model in the registry)
+    metrics = {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'f1_score': f1_score(y_test, y_pred, average='weighted'),
+        'precision': precision_score(y_test, y_pred, average='weighted'),
+        'recall': recall_score(y_test, y_pred, average='weighted'),
+        'auc': roc_auc_score(y_test, y_pred_prob, multi_class='ovr', average='macro'),  # multi-class probabilities
+        'confusion_matrix': confusion_matrix(y_test, y_pred)
+    }
+
+# Console report (skipped in headless runs)
+if not args.no_report:
+    print(f"Accuracy: {metrics['accuracy'] * 100:.2f}%")
+    print("Confusion Matrix:\n", metrics['confusion_matrix'])
+
+    # Classification Report (Precision, Recall, F1 Score)
+    if y_pred is not None:
+        class_report = classification_report(y_test, y_pred, target_names=['Low', 'Medium', 'High'])
+        print("Classification Report:\n", class_report)
+
+    print(f"F1 Score: {metrics['f1_score']:.2f}")
+    print(f"Precision: {metrics['precision']:.2f}")
+    print(f"Recall: {metrics['recall']:.2f}")
+    if 'auc' in metrics:
+        print(f"AUC (Area Under Curve): {metrics['auc']:.2f}")
+
+# Save model to the registry (native UBJSON, metrics kept as metadata)
+registry = ModelRegistry(os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+version = registry.save(
+    "glof_risk_model",
+    model,
+    "xgboost",
+    metrics=metrics,
+    extra={
+        'features': features,
+        'labels': ['Low', 'Medium', 'High'],
+        'params': params,
+        'num_round': num_round,
+        'feature_pipeline': pipeline.config() if pipeline is not None else None
+    }
+)
+
+print(f"Model saved as 'glof_risk_model' version {version} in 'models'.")
\ No newline at end of file
@@ -0,0 +1,172 @@
+import itertools
+import os
+import random
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.model_selection import StratifiedKFold
+
+# Fixed settings shared by every trial. The last eval metric drives early stopping.
+BASE_PARAMS = {
+    'objective': 'multi:softprob',
+    'num_class': 3,
+    'tree_method': 'hist',
+    'eval_metric': ['merror', 'mlogloss']
+}
+
+# Search space (full grid, or a random sample of it with max_trials)
+PARAM_GRID = {
+    'max_depth': [4, 6, 8],
+    'eta': [0.05, 0.1, 0.3],
+    'subsample': [0.8, 1.0],
+    'colsample_bytree': [0.8, 1.0],
+    'min_child_weight': [1, 5]
+}
+
+# Quantile bins; fixed for the sweep because the quantized matrices are shared by all trials
+MAX_BIN = 256
+
+# Per-worker cross-validation folds: list of (train, valid) QuantileDMatrix pairs
+_folds = None
+
+def build_folds(X, y, n_folds=5, seed=42, max_bin=MAX_BIN):
+    """
+    Quantize each cross-validation fold once.
+
+    Validation matrices reuse their training fold's bin edges (`ref`), as
+    XGBoost requires for hist-based evaluation.
+    """
+    folds = []
+    for train_idx, valid_idx in StratifiedKFold(n_folds, shuffle=True, random_state=seed).split(X, y):
+        dtrain = xgb.QuantileDMatrix(X[train_idx], label=y[train_idx], max_bin=max_bin)
+        dvalid = xgb.QuantileDMatrix(X[valid_idx], label=y[valid_idx], ref=dtrain)
+        folds.append((dtrain, dvalid))
+    return folds
+
+def _init_worker(X, y, n_folds, seed, max_bin):
+    # Each worker builds the fold matrices once and reuses them for all its trials
+    global _folds
+    _folds = build_folds(X, y, n_folds, seed, max_bin)
+
+def run_trial(trial):
+    """
+    Cross-validate one parameter set on the worker's folds.
+
+    Args:
+        trial: (trial id, params, settings) with settings holding
+            num_boost_round, early_stopping_rounds, nthread and max_bin
+
+    Returns:
+        Dictionary of the params, mean/std validation metrics at the best
+        iteration, mean best round count and wall time
+    """
+    trial_id, params, settings = trial
+    train_params = {**BASE_PARAMS, **params, 'nthread': settings['nthread'], 'max_bin': settings['max_bin']}
+
+    start = time.perf_counter()
+    mlogloss, merror, rounds = [], [], []
+    for dtrain, dvalid in _folds:
+        evals_result = {}
+        booster = xgb.train(
+            train_params,
+            dtrain,
+            num_boost_round=settings['num_boost_round'],
+            evals=[(dvalid, 'valid')],
+            early_stopping_rounds=settings['early_stopping_rounds'],
+            evals_result=evals_result,
+            verbose_eval=False
+        )
+        best = booster.best_iteration
+        mlogloss.append(evals_result['valid']['mlogloss'][best])
+        merror.append(evals_result['valid']['merror'][best])
+        rounds.append(best + 1)
+
+    return {
+        'trial': trial_id,
+        **params,
+        'mlogloss': float(np.mean(mlogloss)),
+        'mlogloss_std': float(np.std(mlogloss)),
+        'accuracy': 1 - float(np.mean(merror)),
+        'best_rounds': int(np.mean(rounds)),
+        'wall_time_s': time.perf_counter() - start
+    }
+
+def candidate_params(grid=PARAM_GRID, max_trials=None, seed=42):
+    """Every combination of the grid, or a random sample of max_trials of them."""
+    keys = list(grid)
+    candidates = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    if max_trials is not None and max_trials < len(candidates):
+        candidates = random.Random(seed).sample(candidates, max_trials)
+    return candidates
+
+def tune(X, y, n_folds=5, workers=None, max_trials=None, num_boost_round=1000,
+         early_stopping_rounds=20, max_bin=MAX_BIN, seed=42, output_path='tuning_results.csv'):
+    """
+    Parallel k-fold cross-validated parameter sweep.
+
+    Trials are spread over a process pool; each worker quantizes the folds
+    once and gets an equal share of the cores for XGBoost's own threads.
+
+    Args:
+        X: (n, features) float32 array
+        y: (n,) integer class labels
+        n_folds: Cross-validation folds
+        workers: Worker processes (defaults to the number of cores)
+        max_trials: Randomly sample this many grid points (full grid if None)
+        num_boost_round: Upper bound on boosting rounds
+        early_stopping_rounds: Stop when validation mlogloss hasn't improved for this many rounds
+        max_bin: Quantile bins of the shared matrices
+        seed: Seed for the folds and the trial sample
+        output_path: CSV of all trials, best first
+
+    Returns:
+        DataFrame of trial results sorted by mean validation mlogloss
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    cores = os.cpu_count() or 1
+    workers = workers or cores
+    settings = {
+        'num_boost_round': num_boost_round,
+        'early_stopping_rounds': early_stopping_rounds,
+        'nthread': max(1, cores // workers),
+        'max_bin': max_bin
+    }
+    trials = [(i, params, settings) for i, params in enumerate(candidate_params(max_trials=max_trials, seed=seed))]
+    print(f"Tuning {len(trials)} parameter sets with {n_folds}-fold CV on {len(X)} rows "
+          f"({workers} workers x {settings['nthread']} threads)")
+
+    init_args = (X, y, n_folds, seed, max_bin)
+    start = time.perf_counter()
+    results = []
+
+    def log(result):
+        results.append(result)
+        params = ", ".join(f"{k}={result[k]}" for k in PARAM_GRID)
+        print(f"[{len(results)}/{len(trials)}] trial {result['trial']}: {params} -> "
+              f"mlogloss {result['mlogloss']:.4f} ± {result['mlogloss_std']:.4f}, "
+              f"accuracy {result['accuracy']:.4f}, {result['best_rounds']} rounds, {result['wall_time_s']:.2f}s")
+
+    if workers == 1:
+        _init_worker(*init_args)
+        for trial in trials:
+            log(run_trial(trial))
+    else:
+        with Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+            for result in pool.imap_unordered(run_trial, trials):
+                log(result)
+
+    results = pd.DataFrame(results).sort_values('mlogloss').reset_index(drop=True)
+    if output_path:
+        results.to_csv(output_path, index=False)
+
+    best = results.iloc[0]
+    params = ", ".join(f"{k}={results.loc[0, k]}" for k in PARAM_GRID)
+    print(f"Sweep finished in {time.perf_counter() - start:.1f}s. Best parameters: {params}, "
+          f"{int(best['best_rounds'])} rounds (mlogloss {best['mlogloss']:.4f}, accuracy {best['accuracy']:.4f})")
+    if output_path:
+        print(f"All trials saved to {output_path}")
+    return results
@@ -0,0 +1,287 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Model features (same order as south_lhonak_glof_samples.csv and the inference server)
+FEATURES = [
+    'air_temp_C', 'air_humidity_%', 'water_temp_C', 'altitude_change_m',
+    'tilt_x_deg', 'tilt_y_deg', 'tilt_z_deg', 'ground_temp_C',
+    'seismic_activity_Hz', 'flow_velocity_mps'
+]
+RISK_LABELS = ['low', 'medium', 'high']
+
+# Channels watched for anomalies (EWMA, rolling variance and two-sided CUSUM)
+STREAM_CHANNELS = [
+    'seismic_activity_Hz', 'tilt_x_deg', 'tilt_y_deg', 'tilt_z_deg',
+    'flow_velocity_mps', 'altitude_change_m'
+]
+
+# Detector defaults
+WINDOW = 32            # Readings in each channel's rolling-variance ring buffer
+EWMA_ALPHA = 0.05      # Weight of the newest reading in the EWMA mean/variance
+CUSUM_DRIFT = 0.5      # Allowed drift (k) per reading, in standard deviations
+CUSUM_THRESHOLD = 8.0  # Alarm level (h) of the cumulative sums, in standard deviations
+WARMUP = 16            # Readings before a channel can raise alarms
+MATERIAL_Z = 1.0       # Rescore once a channel's EWMA moved this many rolling std since the last score
+MAX_SCORE_AGE_S = 300  # ...or when the last score is older than this
+
+class StreamDetector:
+    """
+    Per-sensor streaming statistics over live readings, O(1) per update.
+
+    State for all sensors lives in preallocated arrays (one row per
+    sensor, one column per channel), so a batch of readings from many
+    sensors is a handful of vectorized NumPy operations:
+
+    - EWMA mean/variance, which standardize each new reading (z-score)
+    - rolling mean/variance over the last WINDOW readings, kept as running
+      sums over a float32 ring buffer (the outgoing reading is subtracted)
+    - two-sided CUSUM of the z-scores, alarming on sustained shifts
+
+    The risk model is only asked for readings that changed materially
+    since the sensor was last scored (see needs_score), not for every sample.
+    """
+
+    def __init__(self, window=WINDOW, alpha=EWMA_ALPHA, drift=CUSUM_DRIFT, threshold=CUSUM_THRESHOLD,
+                 warmup=WARMUP, material_z=MATERIAL_Z, max_score_age=MAX_SCORE_AGE_S, capacity=1024):
+        self.window = window
+        self.alpha = alpha
+        self.drift = drift
+        self.threshold = threshold
+        self.warmup = warmup
+        self.material_z = material_z
+        self.max_score_age = max_score_age
+        self.channels = [FEATURES.index(channel) for channel in STREAM_CHANNELS]
+        self.index = {}  # sensor id -> state row
+        self.sensor_ids = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        c = len(self.channels)
+        self.count = np.zeros((capacity, c), dtype=np.int64)
+        self.ewma = np.zeros((capacity, c), dtype=np.float64)
+        self.ewvar = np.zeros((capacity, c), dtype=np.float64)
+        self.cusum_pos = np.zeros((capacity, c), dtype=np.float64)
+        self.cusum_neg = np.zeros((capacity, c), dtype=np.float64)
+        self.ring = np.zeros((capacity, self.window, c), dtype=np.float32)
+        self.ring_pos = np.zeros((capacity, c), dtype=np.int64)
+        self.ring_sum = np.zeros((capacity, c), dtype=np.float64)
+        self.ring_sumsq = np.zeros((capacity, c), dtype=np.float64)
+        self.scored_level = np.zeros((capacity, c), dtype=np.float64)
+        self.scored_at = np.full(capacity, -np.inf)
+        self.risk = np.full(capacity, -1, dtype=np.int8)
+
+    def _grow(self, capacity):
+        # Double the state arrays, keeping the rows of known sensors
+        old = {name: getattr(self, name) for name in (
+            'count', 'ewma', 'ewvar', 'cusum_pos', 'cusum_neg', 'ring', 'ring_pos',
+            'ring_sum', 'ring_sumsq', 'scored_level', 'scored_at', 'risk'
+        )}
+        self._allocate(capacity)
+        for name, values in old.items():
+            getattr(self, name)[:len(values)] = values
+
+    def rows(self, sensors):
+        """State rows of sensor ids, registering new sensors."""
+        rows = np.empty(len(sensors), dtype=np.int64)
+        for i, sensor in enumerate(sensors):
+            row = self.index.get(sensor)
+            if row is None:
+                row = self.index[sensor] = len(self.sensor_ids)
+                self.sensor_ids.append(sensor)
+            rows[i] = row
+        if len(self.sensor_ids) > len(self.risk):
+            self._grow(max(2 * len(self.risk), len(self.sensor_ids)))
+        return rows
+
+    def rolling_std(self, rows):
+        """Standard deviation of the watched channels over the ring buffers of the given rows."""
+        n = np.minimum(self.count[rows], self.window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = self.ring_sum[rows] / n
+            variance = self.ring_sumsq[rows] / n - mean ** 2
+        return np.sqrt(np.maximum(np.nan_to_num(variance), 0))
+
+    def observe(self, sensors, timestamps, X):
+        """
+        Update the statistics with one reading per sensor.
+
+        Args:
+            sensors: Sensor ids (unique within the batch)
+            timestamps: Reading times, epoch seconds
+            X: (n, len(FEATURES)) raw readings (NaN = missing, which leaves a channel's state as is)
+
+        Returns:
+            alerts: List of CUSUM alarm dictionaries (sensor, timestamp, channel, direction, z)
+            needs_score: Boolean mask of the readings the risk model should score
+        """
+        rows = self.rows(sensors)
+        if len(np.unique(rows)) != len(rows):
+            raise ValueError("observe() takes at most one reading per sensor; split the batch")
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        X = np.asarray(X, dtype=np.float32)
+        x = X[:, self.channels].astype(np.float64)
+        valid = ~np.isnan(x)
+        first = valid & (self.count[rows] == 0)
+
+        # Standardize against the EWMA state *before* this reading. The variance starts at 0,
+        # so it is bias-corrected by the weight it has accumulated so far (as in Adam).
+        mean, var = self.ewma[rows], self.ewvar[rows]
+        count = self.count[rows]
+        weight = 1 - (1 - self.alpha) ** np.maximum(count - 1, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.where(valid & (count > 1), (x - mean) / np.sqrt(var / weight + 1e-12), 0.0)
+
+        # EWMA mean/variance (first reading initializes the mean)
+        delta = np.where(valid, x - mean, 0.0)
+        self.ewma[rows] = np.where(first, x, mean + self.alpha * delta)
+        self.ewvar[rows] = np.where(first, 0.0, np.where(valid, (1 - self.alpha) * (var + self.alpha * delta ** 2), var))
+
+        # Rolling window: replace the oldest ring entry and correct the running sums
+        slots = self.ring_pos[rows]
+        channel_idx = np.arange(len(self.channels))
+        outgoing = self.ring[rows[:, None], slots, channel_idx].astype(np.float64)
+        outgoing = np.where(self.count[rows] >= self.window, outgoing, 0.0)
+        incoming = np.where(valid, x, 0.0)
+        self.ring_sum[rows] += np.where(valid, incoming - outgoing, 0.0)
+        self.ring_sumsq[rows] += np.where(valid, incoming ** 2 - outgoing ** 2, 0.0)
+        self.ring[rows[:, None], slots, channel_idx] = np.where(valid, incoming, self.ring[rows[:, None], slots, channel_idx])
+        self.ring_pos[rows] = np.where(valid, (slots + 1) % self.window, slots)
+        self.count[rows] += valid
+
+        # Two-sided CUSUM of the z-scores; an alarm resets its sum
+        warm = self.count[rows] > self.warmup
+        pos = np.maximum(0.0, self.cusum_pos[rows] + z - self.drift)
+        neg = np.maximum(0.0, self.cusum_neg[rows] - z - self.drift)
+        up = warm & (pos > self.threshold)
+        down = warm & (neg > self.threshold)
+        self.cusum_pos[rows] = np.where(up | ~warm, 0.0, pos)
+        self.cusum_neg[rows] = np.where(down | ~warm, 0.0, neg)
+
+        alerts = []
+        for i, c in zip(*np.nonzero(up | down)):
+            alerts.append({
+                'sensor': sensors[i],
+                'timestamp': float(timestamps[i]),
+                'type': 'cusum',
+                'channel': STREAM_CHANNELS[c],
+                'direction': 'up' if up[i, c] else 'down',
+                'z': round(float(z[i, c]), 3)
+            })
+
+        # Rescore on alarms, when a smoothed channel level moved materially, or when the score is stale.
+        # Comparing EWMA levels rather than raw readings keeps sensor noise from triggering the model.
+        moved = np.abs(self.ewma[rows] - self.scored_level[rows]) > self.material_z * self.rolling_std(rows)
+        needs_score = (
+            (self.risk[rows] < 0)
+            | (timestamps - self.scored_at[rows] > self.max_score_age)
+            | (moved & valid).any(axis=1)
+            | (up | down).any(axis=1)
+        )
+        return alerts, needs_score
+
+    def record_scores(self, sensors, timestamps, probabilities):
+        """
+        Remember the scored readings and their risk.
+
+        Returns:
+            List of alert dictionaries for sensors whose risk level changed
+        """
+        rows = self.rows(sensors)
+        levels = np.argmax(probabilities, axis=1).astype(np.int8)
+        previous = self.risk[rows]
+        self.scored_level[rows] = self.ewma[rows]
+        self.scored_at[rows] = timestamps
+        self.risk[rows] = levels
+        return [
+            {
+                'sensor': sensors[i],
+                'timestamp': float(timestamps[i]),
+                'type': 'risk',
+                'risk_level': RISK_LABELS[levels[i]],
+                'previous': RISK_LABELS[previous[i]] if previous[i] >= 0 else None,
+                'probabilities': [float(p) for p in probabilities[i]]
+            }
+            for i in np.flatnonzero(levels != previous)
+        ]
+
+    def process(self, sensors, timestamps, X, score, pipeline=None):
+        """
+        observe() a batch, score the readings that need it and record the result.
+
+        Args:
+            score: Callable mapping model input rows to class probabilities
+            pipeline: FeaturePipeline of the model, if it was trained on windowed
+                features (updated with every reading, so its state stays current)
+
+        Returns:
+            alerts: CUSUM and risk-change alerts
+            scored: Number of readings sent to the model
+        """
+        X = np.asarray(X, dtype=np.float32)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        alerts, needs_score = self.observe(sensors, timestamps, X)
+        # The raw model sees missing readings as 0, like the dashboard and the inference server
+        inputs = np.nan_to_num(X, nan=0.0) if pipeline is None else pipeline.update(sensors, timestamps, X)
+        selected = np.flatnonzero(needs_score)
+        if len(selected):
+            probabilities = score(inputs[selected])
+            alerts += self.record_scores([sensors[i] for i in selected], timestamps[selected], probabilities)
+        return alerts, len(selected)
+
+def simulate(detector, booster, n_sensors, steps, seed=0, pipeline=None):
+    """
+    Replay synthetic streams through the detector (throughput check).
+
+    Every sensor starts from a sample row of the training CSV and drifts as
+    a small random walk; a tenth of the sensors get a step change in
+    seismic activity halfway through.
+    """
+    rng = np.random.default_rng(seed)
+    samples = np.loadtxt('south_lhonak_glof_samples.csv', delimiter=',', skiprows=1, usecols=range(len(FEATURES)), dtype=np.float32)
+    base = samples[rng.integers(len(samples), size=n_sensors)]
+    sensors = [f"sensor-{i}" for i in range(n_sensors)]
+    shifted = rng.random(n_sensors) < 0.1
+    seismic = FEATURES.index('seismic_activity_Hz')
+
+    readings = scored = 0
+    cusum_alerts = risk_alerts = 0
+    elapsed = 0.0
+    for step in range(steps):
+        base += rng.normal(scale=0.01, size=base.shape).astype(np.float32)
+        X = base + rng.normal(scale=0.1, size=base.shape).astype(np.float32)
+        if step >= steps // 2:
+            X[shifted, seismic] += 3.0
+        start = time.perf_counter()
+        alerts, n_scored = detector.process(sensors, np.full(n_sensors, step * 2.0), X, booster.inplace_predict, pipeline)
+        elapsed += time.perf_counter() - start
+        readings += n_sensors
+        scored += n_scored
+        cusum_alerts += sum(alert['type'] == 'cusum' for alert in alerts)
+        risk_alerts += sum(alert['type'] == 'risk' for alert in alerts)
+
+    print(f"{readings} readings from {n_sensors} sensors in {elapsed:.2f}s "
+          f"({readings / elapsed:,.0f} readings/s, {elapsed / steps * 1000:.2f} ms per batch)")
+    print(f"Risk model scored {scored} readings ({scored / readings:.1%})")
+    print(f"{cusum_alerts} CUSUM alarms ({shifted.sum()} sensors shifted), {risk_alerts} risk-level changes")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay synthetic sensor streams through the streaming detector")
+    parser.add_argument('--sensors', type=int, default=1000, help="Number of simulated sensors")
+    parser.add_argument('--steps', type=int, default=200, help="Readings per sensor")
+    args = parser.parse_args()
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from model_registry import ModelRegistry
+    from feature_pipeline import FeaturePipeline
+
+    handle = ModelRegistry(os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")).load("glof_risk_model")
+    config = handle.extra.get('feature_pipeline')
+    pipeline = FeaturePipeline.from_config(config, capacity=args.sensors) if config else None
+    simulate(StreamDetector(capacity=args.sensors), handle.model, args.sensors, args.steps, pipeline=pipeline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from telemetry_store import DEFAULT_ROOT as STORE_ROOT, FIREBASE_FIELDS, SensorLocks, TelemetryStore
+
+# Rollup layout: one file per sensor, resolution and period, rewritten while the period is open:
+#   <root>/sensor=<id>/<resolution>/<period>.parquet
+DEFAULT_ROOT = os.environ.get("GLOF_ROLLUP_ROOT", "telemetry_rollups")
+
+# Rollup resolutions, finest first: bucket width in seconds and the period (strftime) of their files.
+# Each resolution is rolled up from the one before it (minutes from raw readings).
+RESOLUTIONS = {
+    'minute': (60, '%Y-%m-%d'),
+    'hour': (3600, '%Y-%m'),
+    'day': (86400, '%Y'),
+}
+
+# Numeric reading channels (positions are not rolled up)
+CHANNELS = [column for column in FIREBASE_FIELDS.values() if column not in ('latitude', 'longitude')]
+
+# Dashboard time ranges in seconds (None = whole history)
+RANGES = {'hour': 3600, 'day': 86400, 'week': 604800, 'all': None}
+
+# Points returned per history request, and the most buckets read to build them:
+# a range is served from the finest resolution that has at most MAX_BUCKETS buckets
+DEFAULT_POINTS = 300
+MAX_BUCKETS = 10080
+
+def _period(timestamp, resolution):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime(RESOLUTIONS[resolution][1])
+
+def _empty(channels):
+    stats = {'bucket': np.empty(0, dtype=np.int64)}
+    for channel in channels:
+        stats[f"{channel}_count"] = np.empty(0, dtype=np.int32)
+        stats[f"{channel}_sum"] = np.empty(0, dtype=np.float64)
+        stats[f"{channel}_min"] = np.empty(0, dtype=np.float32)
+        stats[f"{channel}_max"] = np.empty(0, dtype=np.float32)
+    return stats
+
+def _concat(parts, channels):
+    parts = [part for part in parts if len(part['bucket'])]
+    if not parts:
+        return _empty(channels)
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+def raw_stats(table, channels=CHANNELS):
+    """
+    Per-reading statistics of raw store rows (one "bucket" per reading).
+
+    Args:
+        table: Store query result (pyarrow Table with `timestamp` and the channels)
+        channels: Channels to include
+
+    Returns:
+        Dictionary of arrays: `bucket` (the timestamp) and, per channel,
+        `<channel>_count` / `_sum` / `_min` / `_max` (a missing reading has count 0)
+    """
+    stats = {'bucket': table.column('timestamp').to_numpy()}
+    for channel in channels:
+        values = table.column(channel).to_numpy(zero_copy_only=False).astype(np.float32)
+        valid = ~np.isnan(values)
+        stats[f"{channel}_count"] = valid.astype(np.int32)
+        stats[f"{channel}_sum"] = np.where(valid, values, 0).astype(np.float64)
+        stats[f"{channel}_min"] = values
+        stats[f"{channel}_max"] = values
+    return stats
+
+def rollup(stats, seconds, channels=CHANNELS):
+    """
+    Merge statistics rows (sorted by bucket) into buckets of `seconds`.
+
+    Count/sum/min/max combine exactly, so minutes roll up from readings,
+    hours from minutes and days from hours, each with one reduceat per array.
+    """
+    buckets = stats['bucket'] // seconds * seconds
+    if not len(buckets):
+        return _empty(channels)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+
+    merged = {'bucket': buckets[starts]}
+    for channel in channels:
+        merged[f"{channel}_count"] = np.add.reduceat(stats[f"{channel}_count"], starts)
+        merged[f"{channel}_sum"] = np.add.reduceat(stats[f"{channel}_sum"], starts)
+        # fmin/fmax skip NaN (missing readings); an all-missing bucket stays NaN
+        merged[f"{channel}_min"] = np.fmin.reduceat(stats[f"{channel}_min"], starts)
+        merged[f"{channel}_max"] = np.fmax.reduceat(stats[f"{channel}_max"], starts)
+    return merged
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets decimation.
+
+    Keeps the first and last points and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the mean of the next bucket.
+
+    Returns:
+        Sorted indices of the kept points (all of them if threshold >= len(x))
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x, next_y = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+class TelemetryRollups:
+    """
+    Incremental min/max/mean rollups of a TelemetryStore, per minute, hour and day.
+
+    update() only rolls up buckets that closed since the last call (a bucket
+    is closed once a later reading is stored), so its cost follows the new
+    data, not the history. Reads combine the stored rollups with the still
+    open tail, rolled up on the fly from the next finer level. Updates of
+    one sensor are serialized by a per-sensor lock, since each reads period
+    files and writes them back.
+    """
+
+    def __init__(self, store, root=DEFAULT_ROOT):
+        self.store = store
+        self.root = root
+        self.lock = SensorLocks()
+
+    def _dir(self, sensor, resolution):
+        return os.path.join(self.root, f"sensor={sensor}", resolution)
+
+    def _periods(self, sensor, resolution):
+        directory = self._dir(sensor, resolution)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len('.parquet')] for name in os.listdir(directory) if name.endswith('.parquet'))
+
+    def _read_period(self, sensor, resolution, period, channels):
+        path = os.path.join(self._dir(sensor, resolution), f"{period}.parquet")
+        columns = ['bucket'] + [f"{channel}_{stat}" for channel in channels for stat in ('count', 'sum', 'min', 'max')]
+        table = pq.read_table(path, columns=columns)
+        return {name: table.column(name).to_numpy() for name in columns}
+
+    def _write_period(self, sensor, resolution, period, stats):
+        # Write to a unique hidden temp file and rename, so readers never see a partial file
+        directory = self._dir(sensor, resolution)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{period}.", suffix='.tmp', dir=directory)
+        os.close(fd)
+        try:
+            pq.write_table(pa.table(stats), tmp_path, compression='zstd')
+            os.replace(tmp_path, os.path.join(directory, f"{period}.parquet"))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def read(self, sensor, resolution, start=None, end=None, channels=CHANNELS):
+        """Stored rollup buckets of a resolution with start <= bucket < end."""
+        periods = self._periods(sensor, resolution)
+        # Period names sort chronologically, so files outside the range are skipped by name
+        if start is not None:
+            periods = [p for p in periods if p >= _period(start, resolution)]
+        if end is not None:
+            periods = [p for p in periods if p <= _period(end - 1, resolution)]
+        stats = _concat([self._read_period(sensor, resolution, p, channels) for p in periods], channels)
+
+        keep = np.ones(len(stats['bucket']), dtype=bool)
+        if start is not None:
+            keep &= stats['bucket'] >= start
+        if end is not None:
+            keep &= stats['bucket'] < end
+        return stats if keep.all() else {key: values[keep] for key, values in stats.items()}
+
+    def watermark(self, sensor, resolution):
+        """End of the last stored bucket of a resolution (everything before it is rolled up), or None."""
+        periods = self._periods(sensor, resolution)
+        if not periods:
+            return None
+        buckets = self._read_period(sensor, resolution, periods[-1], [])['bucket']
+        return int(buckets[-1]) + RESOLUTIONS[resolution][0] if len(buckets) else None
+
+    def _append(self, sensor, resolution, stats):
+        """Add closed buckets, merging them into the files of their periods."""
+        periods = np.array([_period(int(bucket), resolution) for bucket in stats['bucket']])
+        existing = set(self._periods(sensor, resolution))
+        for period in np.unique(periods):
+            rows = periods == period
+            part = {key: values[rows] for key, values in stats.items()}
+            if period in existing:
+                part = _concat([self._read_period(sensor, resolution, period, CHANNELS), part], CHANNELS)
+            self._write_period(sensor, resolution, period, part)
+
+    def _raw(self, sensor, start, end, channels):
+        # Read day by day, so a first update over a long history stays bounded in memory
+        parts = []
+        for day in self.store.days(sensor):
+            day_start = int(datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+            lo = day_start if start is None else max(start, day_start)
+            hi = day_start + 86400 if end is None else min(end, day_start + 86400)
+            if lo < hi:
+                parts.append(raw_stats(self.store.query([sensor], lo, hi, channels), channels))
+        return _concat(parts, channels)
+
+    def update(self, sensor):
+        """
+        Roll up the buckets of a sensor that closed since the last update.
+
+        Returns:
+            Dictionary of resolution -> number of new buckets
+        """
+        with self.lock(sensor):
+            return self._update(sensor)
+
+    def _update(self, sensor):
+        latest = self.store.latest_timestamp(sensor)
+        if latest is None:
+            return {resolution: 0 for resolution in RESOLUTIONS}
+
+        added = {}
+        source, source_end = None, latest  # (finer resolution, end of its closed data); raw first
+        for resolution, (seconds, _) in RESOLUTIONS.items():
+            start = self.watermark(sensor, resolution)
+            # Only buckets fully covered by the finer level are closed
+            end = source_end // seconds * seconds
+            if start is not None and start >= end:
+                added[resolution] = 0
+            else:
+                if source is None:
+                    stats = self._raw(sensor, start, end, CHANNELS)
+                else:
+                    stats = self.read(sensor, source, start, end)
+                stats = rollup(stats, seconds)
+                if len(stats['bucket']):
+                    self._append(sensor, resolution, stats)
+                added[resolution] = len(stats['bucket'])
+            source, source_end = resolution, self.watermark(sensor, resolution) or end
+        return added
+
+    def buckets(self, sensor, resolution, start, end, channels=CHANNELS):
+        """
+        Buckets of a resolution in [start, end), including the still-open tail.
+
+        Args:
+            sensor: Sensor id
+            resolution: 'raw' (individual readings) or a key of RESOLUTIONS
+            start: Inclusive start, epoch seconds
+            end: Exclusive end, epoch seconds
+            channels: Channels to include
+
+        Returns:
+            Statistics dictionary (see raw_stats)
+        """
+        if resolution == 'raw':
+            return self._raw(sensor, start, end, channels)
+
+        levels = list(RESOLUTIONS)
+        seconds = RESOLUTIONS[resolution][0]
+        start = start // seconds * seconds
+        watermark = self.watermark(sensor, resolution)
+        stored = self.read(sensor, resolution, start, end, channels) if watermark else _empty(channels)
+
+        # Anything after the watermark comes from the next finer level (or raw readings)
+        tail_start = start if watermark is None else max(start, watermark)
+        if tail_start >= end:
+            return stored
+        finer = levels[levels.index(resolution) - 1] if levels.index(resolution) else 'raw'
+        tail = rollup(self.buckets(sensor, finer, tail_start, end, channels), seconds, channels)
+        return _concat([stored, tail], channels)
+
+    def history(self, sensor, start=None, end=None, channels=CHANNELS, points=DEFAULT_POINTS):
+        """
+        Downsampled history of a sensor for plotting.
+
+        The finest resolution with at most MAX_BUCKETS buckets in the range is
+        read (raw readings when the range spans fewer minutes than `points`),
+        then each channel's mean is decimated with LTTB to points / channels
+        points; the union of the kept buckets is returned, so a response
+        never exceeds `points` rows whatever the history length.
+
+        Args:
+            sensor: Sensor id
+            start: Inclusive start, epoch seconds (first stored day if None)
+            end: Exclusive end, epoch seconds (after the latest reading if None)
+            channels: Channels to return
+            points: Maximum number of points
+
+        Returns:
+            Dictionary with `resolution`, `timestamps` and per channel
+            `mean`/`min`/`max` lists (None where a bucket has no reading)
+        """
+        channels = list(channels)
+        days = self.store.days(sensor)
+        if not days:
+            return {'resolution': 'raw', 'timestamps': [], 'series': {channel: {'mean': [], 'min': [], 'max': []} for channel in channels}}
+        if end is None:
+            end = self.store.latest_timestamp(sensor) + 1
+        if start is None:
+            start = int(datetime.strptime(days[0], '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+
+        resolution = 'raw'
+        if (end - start) / 60 > points:
+            resolution = next(
+                (name for name, (seconds, _) in RESOLUTIONS.items() if (end - start) / seconds <= MAX_BUCKETS),
+                list(RESOLUTIONS)[-1]
+            )
+        stats = self.buckets(sensor, resolution, start, end, channels)
+        x = stats['bucket']
+
+        means = {}
+        keep = np.zeros(len(x), dtype=bool)
+        for channel in channels:
+            count = stats[f"{channel}_count"]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                means[channel] = np.where(count > 0, stats[f"{channel}_sum"] / count, np.nan)
+            valid = np.flatnonzero(count > 0)
+            keep[valid[lttb(x[valid], means[channel][valid], max(3, points // max(len(channels), 1)))]] = True
+        keep = np.flatnonzero(keep)
+
+        def to_list(values):
+            values = values[keep].astype(np.float64)
+            return [None if np.isnan(v) else round(float(v), 4) for v in values]
+
+        return {
+            'resolution': resolution,
+            'timestamps': x[keep].tolist(),
+            'series': {
+                channel: {
+                    'mean': to_list(means[channel]),
+                    'min': to_list(stats[f"{channel}_min"]),
+                    'max': to_list(stats[f"{channel}_max"]),
+                }
+                for channel in channels
+            }
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Sensor telemetry rollups")
+    parser.add_argument('--store', default=STORE_ROOT, help="Telemetry store directory")
+    parser.add_argument('--root', default=DEFAULT_ROOT, help="Rollup directory")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update = subparsers.add_parser('update', help="Roll up the buckets closed since the last update")
+    update.add_argument('--sensor', action='append', help="Sensor id (repeatable; default all)")
+
+    history = subparsers.add_parser('history', help="Print the downsampled history of a sensor as CSV")
+    history.add_argument('sensor', help="Sensor id")
+    history.add_argument('--range', choices=list(RANGES), default='all', help="Time range ending now")
+    history.add_argument('--points', type=int, default=DEFAULT_POINTS, help="Maximum number of points")
+    history.add_argument('--columns', default=None, help="Comma-separated channels")
+
+    args = parser.parse_args()
+    store = TelemetryStore(args.store)
+    rollups = TelemetryRollups(store, args.root)
+
+    if args.command == 'update':
+        for sensor in args.sensor or store.sensors():
+            added = rollups.update(sensor)
+            print(f"Sensor {sensor}: " + ", ".join(f"{n} new {resolution} buckets" for resolution, n in added.items()))
+    else:
+        channels = args.columns.split(',') if args.columns else CHANNELS
+        span = RANGES[args.range]
+        start = int(time.time()) - span if span else None
+        result = rollups.history(args.sensor, start, None, channels, args.points)
+        frame = pd.DataFrame({'timestamp': result['timestamps']})
+        for channel, series in result['series'].items():
+            frame[channel] = series['mean']
+        print(f"# resolution: {result['resolution']}")
+        print(frame.to_csv(index=False), end='')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.middleware.cors import CORSMiddleware
+
+from telemetry_rollups import CHANNELS, DEFAULT_POINTS, DEFAULT_ROOT as ROLLUP_ROOT, RANGES, TelemetryRollups
+from telemetry_store import DEFAULT_ROOT as STORE_ROOT, TelemetryStore
+from telemetry_sync import SENSORS as FIREBASE_SENSORS, FirebaseSync
+
+# Seconds between background rollup updates of all sensors
+ROLLUP_INTERVAL_S = float(os.environ.get("GLOF_ROLLUP_INTERVAL_S", 60))
+
+# Seconds between Firebase syncs (the first one backfills the whole history)
+FIREBASE_SYNC_INTERVAL_S = float(os.environ.get("GLOF_FIREBASE_SYNC_INTERVAL_S", 15))
+
+# Upper bound on the points a client may ask for
+MAX_POINTS = 2000
+
+async def refresh_rollups(rollups, interval=ROLLUP_INTERVAL_S):
+    """Roll up newly closed buckets of every sensor, forever."""
+    loop = asyncio.get_running_loop()
+    while True:
+        for sensor in rollups.store.sensors():
+            try:
+                await loop.run_in_executor(None, rollups.update, sensor)
+            except Exception as e:
+                print(f"Rollup update failed for sensor {sensor}: {e}")
+        await asyncio.sleep(interval)
+
+async def sync_firebase(syncer, rollups, sensors=FIREBASE_SENSORS, interval=FIREBASE_SYNC_INTERVAL_S):
+    """Copy new Firebase readings of every sensor into the store and roll them up, forever."""
+    loop = asyncio.get_running_loop()
+    while True:
+        for sensor in sensors:
+            try:
+                stored, rejected = await loop.run_in_executor(None, syncer.sync, sensor)
+                if rejected:
+                    print(f"Skipped {len(rejected)} Firebase readings of sensor {sensor} with invalid timestamps")
+                if stored:
+                    await loop.run_in_executor(None, rollups.update, sensor)
+            except Exception as e:
+                print(f"Firebase sync failed for sensor {sensor}: {e}")
+        await asyncio.sleep(interval)
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.rollups = TelemetryRollups(TelemetryStore(STORE_ROOT), ROLLUP_ROOT)
+    workers = [
+        asyncio.create_task(refresh_rollups(app.state.rollups)),
+        asyncio.create_task(sync_firebase(FirebaseSync(app.state.rollups.store), app.state.rollups)),
+    ]
+    yield
+    for worker in workers:
+        worker.cancel()
+    for worker in workers:
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+
+app = FastAPI(title="GLOF Sensor Telemetry", lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+@app.get("/history/{sensor}")
+async def history(sensor: str, range: str = 'all', points: int = DEFAULT_POINTS, channels: list[str] = Query(None)):
+    """
+    Downsampled history of a sensor for the dashboard graphs.
+
+    `range` is one of RANGES, ending now; at most `points` points are
+    returned whatever the length of the history.
+    """
+    if range not in RANGES:
+        raise HTTPException(status_code=422, detail=f"Unknown range '{range}' (expected {', '.join(RANGES)})")
+    channels = channels or CHANNELS
+    unknown = [channel for channel in channels if channel not in CHANNELS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown channels: {', '.join(unknown)}")
+
+    start = int(time.time()) - RANGES[range] if RANGES[range] else None
+    points = min(max(points, 3), MAX_POINTS)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, app.state.rollups.history, sensor, start, None, channels, points)
+
+@app.post("/readings/{sensor}")
+async def ingest(sensor: str, readings: dict[str, dict]):
+    """
+    Store a Firebase readings snapshot ({timestamp: {field: value}}) and roll it up.
+
+    Readings whose key is not an epoch-second timestamp are skipped and
+    listed under `rejected`; the rest of the batch is still stored.
+    """
+    rollups = app.state.rollups
+    loop = asyncio.get_running_loop()
+    stored, rejected = await loop.run_in_executor(None, rollups.store.ingest_firebase, sensor, readings)
+    if stored:
+        await loop.run_in_executor(None, rollups.update, sensor)
+    return {'stored': stored, 'rejected': rejected}
+
+@app.get("/health")
+async def health():
+    return {'status': 'ok', 'sensors': app.state.rollups.store.sensors()}
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8001)))
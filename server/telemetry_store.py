@@ -0,0 +1,301 @@
+import argparse
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Store layout (append-only, one file per appended batch and day):
+#   <root>/sensor=<id>/date=<YYYY-MM-DD>/part-<first timestamp>-<uid>.parquet
+DEFAULT_ROOT = os.environ.get("GLOF_TELEMETRY_ROOT", "telemetry")
+
+# Firebase reading fields (UsersData/<uid>/readings/<timestamp>) -> store columns.
+# The first ten columns are the sensor model's features, in model order.
+FIREBASE_FIELDS = {
+    'floatTemperature': 'air_temp_C',
+    'floatHumidity': 'air_humidity_%',
+    'floatWaterTemperature': 'water_temp_C',
+    'floatAltitude': 'altitude_change_m',
+    'floatX-Axis': 'tilt_x_deg',
+    'floatY-Axis': 'tilt_y_deg',
+    'floatZ-Axis': 'tilt_z_deg',
+    'shoreTemperature': 'ground_temp_C',
+    'shoreVibration': 'seismic_activity_Hz',
+    'floatVelocity': 'flow_velocity_mps',
+    'shoreHumidity': 'shore_humidity_%',
+    'floatLatitude': 'latitude',
+    'floatLongitude': 'longitude',
+}
+
+# Stored schema: epoch-second timestamps, float32 readings, optional int8 risk label
+SCHEMA = pa.schema(
+    [('timestamp', pa.int64())]
+    + [(column, pa.float32()) for column in FIREBASE_FIELDS.values()]
+    + [('glof_risk', pa.int8())]
+)
+RISK_CODES = {'Low': 0, 'Medium': 1, 'High': 2}
+
+# Partition keys are kept as strings (sensor ids may look numeric, dates sort lexically)
+PARTITIONING = ds.partitioning(pa.schema([('sensor', pa.string()), ('date', pa.string())]), flavor='hive')
+
+def _day(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y-%m-%d')
+
+def parse_timestamp(key):
+    """Epoch seconds of a Firebase reading key (e.g. '1712345678'), or None if it isn't one."""
+    try:
+        timestamp = float(key)
+    except (TypeError, ValueError):
+        return None
+    return int(timestamp) if np.isfinite(timestamp) and timestamp >= 0 else None
+
+def _to_table(readings):
+    """
+    Normalize readings to SCHEMA.
+
+    Args:
+        readings: DataFrame, dict of columns or list of row dicts, with a
+            `timestamp` (epoch seconds) and any subset of the store columns
+
+    Returns:
+        pyarrow Table sorted by timestamp (missing columns are null)
+    """
+    frame = readings if isinstance(readings, pd.DataFrame) else pd.DataFrame(readings)
+    if 'timestamp' not in frame:
+        raise ValueError("Readings need a 'timestamp' column (epoch seconds)")
+    frame = frame.sort_values('timestamp')
+
+    columns = {}
+    for field in SCHEMA:
+        if field.name not in frame:
+            columns[field.name] = pa.nulls(len(frame), field.type)
+        elif field.name == 'glof_risk' and not pd.api.types.is_numeric_dtype(frame[field.name]):
+            columns[field.name] = pa.array(frame[field.name].map(RISK_CODES), type=field.type, from_pandas=True)
+        else:
+            values = pd.to_numeric(frame[field.name], errors='coerce')
+            columns[field.name] = pa.array(values, type=field.type, from_pandas=True, safe=False)
+    return pa.table(columns, schema=SCHEMA)
+
+class SensorLocks:
+    """
+    One re-entrant lock per sensor id, created on first use.
+
+    Locks only serialize threads of one process (e.g. the telemetry
+    server's background tasks and request handlers).
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def __call__(self, sensor):
+        with self._guard:
+            return self._locks.setdefault(str(sensor), threading.RLock())
+
+class TelemetryStore:
+    """
+    Append-only columnar store of sensor readings, partitioned by sensor and UTC day.
+
+    Each append writes new zstd-compressed Parquet files (float32 columns),
+    so files are never rewritten under a reader except by compact(). Queries
+    prune partitions by sensor and date and read only the requested columns.
+    Writes of one sensor are serialized by a per-sensor lock.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self.lock = SensorLocks()
+
+    def _partition_dir(self, sensor, day):
+        return os.path.join(self.root, f"sensor={sensor}", f"date={day}")
+
+    def _write(self, table, directory, name):
+        # Write to a hidden temp name and rename, so readers never see a partial file
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, os.path.join(directory, name))
+
+    def append(self, sensor, readings):
+        """
+        Append readings of one sensor.
+
+        Returns:
+            Number of rows written
+        """
+        table = _to_table(readings)
+        if table.num_rows == 0:
+            return 0
+
+        timestamps = table.column('timestamp').to_numpy()
+        days = np.array([_day(int(ts)) for ts in timestamps])
+        with self.lock(sensor):
+            for day in np.unique(days):
+                rows = np.flatnonzero(days == day)
+                part = table.slice(rows[0], len(rows))  # sorted, so each day is one contiguous slice
+                name = f"part-{int(timestamps[rows[0]])}-{uuid.uuid4().hex[:8]}.parquet"
+                self._write(part, self._partition_dir(sensor, day), name)
+        return table.num_rows
+
+    def ingest_firebase(self, sensor, readings):
+        """
+        Append a Firebase `readings` snapshot ({timestamp: {field: value}}).
+
+        Only readings newer than the latest stored timestamp of the sensor are
+        written, so the same snapshot can be ingested repeatedly. Readings
+        whose key is not an epoch-second timestamp (or whose value is not an
+        object of fields) are skipped and reported instead of failing the batch.
+        The sensor's lock is held from the check to the append, so concurrent
+        ingests of overlapping snapshots don't store a reading twice.
+
+        Returns:
+            stored: Number of rows written
+            rejected: Keys of the skipped readings
+        """
+        with self.lock(sensor):
+            latest = self.latest_timestamp(sensor)
+            rows, rejected = [], []
+            for key, values in readings.items():
+                timestamp = parse_timestamp(key)
+                if timestamp is None or not isinstance(values, dict):
+                    rejected.append(key)
+                    continue
+                if latest is not None and timestamp <= latest:
+                    continue
+                row = {'timestamp': timestamp}
+                for field, column in FIREBASE_FIELDS.items():
+                    if field in values:
+                        row[column] = values[field]
+                rows.append(row)
+            return (self.append(sensor, rows) if rows else 0), rejected
+
+    def sensors(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(entry.split('=', 1)[1] for entry in os.listdir(self.root) if entry.startswith('sensor='))
+
+    def days(self, sensor):
+        sensor_dir = os.path.join(self.root, f"sensor={sensor}")
+        if not os.path.isdir(sensor_dir):
+            return []
+        return sorted(entry.split('=', 1)[1] for entry in os.listdir(sensor_dir) if entry.startswith('date='))
+
+    def dataset(self):
+        """The whole store as a pyarrow Dataset (with `sensor` and `date` partition columns)."""
+        return ds.dataset(self.root, format='parquet', partitioning=PARTITIONING, exclude_invalid_files=True)
+
+    def _filter(self, sensors=None, start=None, end=None):
+        expression = None
+
+        def both(a, b):
+            return b if a is None else a & b
+
+        if sensors is not None:
+            expression = both(expression, ds.field('sensor').isin([str(s) for s in sensors]))
+        # Date bounds prune whole partitions; timestamp bounds trim within them
+        if start is not None:
+            expression = both(expression, (ds.field('date') >= _day(start)) & (ds.field('timestamp') >= start))
+        if end is not None:
+            expression = both(expression, (ds.field('date') <= _day(end)) & (ds.field('timestamp') < end))
+        return expression
+
+    def query(self, sensors=None, start=None, end=None, columns=None):
+        """
+        Readings in a time range.
+
+        Args:
+            sensors: Sensor ids to include (all if None)
+            start: Inclusive start, epoch seconds (unbounded if None)
+            end: Exclusive end, epoch seconds (unbounded if None)
+            columns: Store columns to read (all if None); `timestamp` is always included
+
+        Returns:
+            pyarrow Table sorted by sensor and timestamp
+        """
+        if columns is not None:
+            columns = ['sensor', 'timestamp'] + [c for c in columns if c not in ('sensor', 'timestamp')]
+        if not self.sensors():
+            table = SCHEMA.append(pa.field('sensor', pa.string())).empty_table()
+            return table if columns is None else table.select(columns)
+        table = self.dataset().to_table(columns=columns, filter=self._filter(sensors, start, end))
+        return table.sort_by([('sensor', 'ascending'), ('timestamp', 'ascending')])
+
+    def latest_timestamp(self, sensor):
+        """Newest stored timestamp of a sensor (only its last day is scanned), or None."""
+        days = self.days(sensor)
+        if not days:
+            return None
+        table = ds.dataset(self._partition_dir(sensor, days[-1]), format='parquet').to_table(columns=['timestamp'])
+        return pc.max(table.column('timestamp')).as_py() if table.num_rows else None
+
+    def compact(self, sensor, day):
+        """
+        Merge the part files of one sensor-day into a single sorted file.
+
+        Meant for closed days; appends to the same day during compaction
+        are kept (only the parts read here are removed).
+
+        Returns:
+            Number of files merged
+        """
+        directory = self._partition_dir(sensor, day)
+        parts = sorted(name for name in os.listdir(directory) if name.startswith('part-') and name.endswith('.parquet'))
+        if len(parts) < 2:
+            return len(parts)
+
+        table = pa.concat_tables([pq.read_table(os.path.join(directory, name), schema=SCHEMA) for name in parts])
+        table = table.sort_by('timestamp')
+        self._write(table, directory, f"part-{table.column('timestamp')[0].as_py()}-{uuid.uuid4().hex[:8]}.parquet")
+        for name in parts:
+            os.remove(os.path.join(directory, name))
+        return len(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sensor telemetry store")
+    parser.add_argument('--root', default=DEFAULT_ROOT, help="Store directory")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest = subparsers.add_parser('ingest', help="Append a Firebase readings export (JSON)")
+    ingest.add_argument('sensor', help="Sensor id (e.g. the Firebase user id)")
+    ingest.add_argument('path', help="JSON file of {timestamp: {field: value}}")
+
+    query = subparsers.add_parser('query', help="Print readings in a time range as CSV")
+    query.add_argument('--sensor', action='append', help="Sensor id (repeatable; default all)")
+    query.add_argument('--start', type=int, default=None, help="Start, epoch seconds")
+    query.add_argument('--end', type=int, default=None, help="End (exclusive), epoch seconds")
+    query.add_argument('--columns', default=None, help="Comma-separated columns")
+
+    compact = subparsers.add_parser('compact', help="Merge the part files of past days")
+    compact.add_argument('--sensor', action='append', help="Sensor id (repeatable; default all)")
+
+    args = parser.parse_args()
+    store = TelemetryStore(args.root)
+
+    if args.command == 'ingest':
+        with open(args.path) as f:
+            readings = json.load(f)
+        stored, rejected = store.ingest_firebase(args.sensor, readings)
+        print(f"Stored {stored} new readings for sensor {args.sensor}")
+        if rejected:
+            print(f"Skipped {len(rejected)} readings with invalid timestamps: {', '.join(map(str, rejected[:10]))}")
+    elif args.command == 'query':
+        columns = args.columns.split(',') if args.columns else None
+        print(store.query(args.sensor, args.start, args.end, columns).to_pandas().to_csv(index=False), end='')
+    else:
+        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        for sensor in args.sensor or store.sensors():
+            for day in store.days(sensor):
+                if day < today:
+                    merged = store.compact(sensor, day)
+                    if merged > 1:
+                        print(f"Compacted {merged} files for sensor {sensor} on {day}")
+
+if __name__ == "__main__":
+    main()
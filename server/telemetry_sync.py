@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+
+import requests
+
+from telemetry_store import DEFAULT_ROOT as STORE_ROOT, TelemetryStore
+
+# Realtime Database the sensors write to (client/src/firebase.js)
+DATABASE_URL = os.environ.get("GLOF_FIREBASE_URL", "https://glof-detection-default-rtdb.asia-southeast1.firebasedatabase.app")
+
+# Optional database secret or ID token, for rules that don't allow public reads
+AUTH_TOKEN = os.environ.get("GLOF_FIREBASE_AUTH")
+
+# Firebase user ids whose readings are synced (comma-separated); the default is the dashboard's sensor
+SENSORS = [s for s in os.environ.get("GLOF_FIREBASE_SENSORS", "ggVVdic7v3gqsBkbQIRYWvlxOFo2").split(',') if s]
+
+# Readings requested per REST call
+PAGE_SIZE = 1000
+
+REQUEST_TIMEOUT_S = 30
+
+def _key_order(key):
+    """Sort key matching Firebase's orderBy="$key": 32-bit integer keys numerically, then strings."""
+    try:
+        number = int(key)
+    except ValueError:
+        return (1, 0, key)
+    if str(number) == key and -2**31 <= number < 2**31:
+        return (0, number, '')
+    return (1, 0, key)
+
+class FirebaseSync:
+    """
+    Copy sensor readings from the Firebase Realtime Database into a TelemetryStore.
+
+    The `UsersData/<id>/readings` history is paged through the REST API in
+    key order, starting after the last timestamp already synced (initially
+    the newest stored one), so the first sync backfills the whole history
+    and later ones only fetch new readings. Each page is stored as it
+    arrives.
+    """
+
+    def __init__(self, store, database_url=DATABASE_URL, auth=AUTH_TOKEN, page_size=PAGE_SIZE, session=None):
+        self.store = store
+        self.database_url = database_url.rstrip('/')
+        self.auth = auth
+        self.page_size = page_size
+        self.session = session or requests.Session()
+        # Last timestamp key synced per sensor, and keys already reported as invalid
+        self.cursors = {}
+        self.rejected = {}
+
+    def fetch_page(self, sensor, start_key=None):
+        """
+        One page of readings in key order, starting at `start_key` (inclusive).
+
+        Returns:
+            Dictionary of key -> reading (unordered, as returned by the REST API)
+        """
+        params = {'orderBy': json.dumps('$key'), 'limitToFirst': self.page_size}
+        if start_key is not None:
+            params['startAt'] = json.dumps(start_key)
+        if self.auth:
+            params['auth'] = self.auth
+        response = self.session.get(f"{self.database_url}/UsersData/{sensor}/readings.json",
+                                    params=params, timeout=REQUEST_TIMEOUT_S)
+        response.raise_for_status()
+        return response.json() or {}
+
+    def sync(self, sensor):
+        """
+        Store every reading of a sensor newer than the last synced key.
+
+        Non-timestamp keys sort after all timestamps, so the next sync starts
+        from the last timestamp rather than the last key; invalid keys are
+        reported once.
+
+        Returns:
+            stored: Number of readings written
+            rejected: Newly seen keys skipped because they are not epoch-second timestamps
+        """
+        if sensor not in self.cursors:
+            latest = self.store.latest_timestamp(sensor)
+            self.cursors[sensor] = None if latest is None else str(latest)
+        reported = self.rejected.setdefault(sensor, set())
+
+        stored, rejected = 0, []
+        start = self.cursors[sensor]
+        while True:
+            page = self.fetch_page(sensor, start)
+            keys = sorted((key for key in page if key != start), key=_key_order)
+            if keys:
+                written, skipped = self.store.ingest_firebase(sensor, {key: page[key] for key in keys})
+                stored += written
+                rejected += [key for key in skipped if key not in reported]
+                reported.update(skipped)
+                invalid = set(skipped)
+                timestamps = [key for key in keys if _key_order(key)[0] == 0 and key not in invalid]
+                if timestamps:
+                    self.cursors[sensor] = timestamps[-1]
+                start = keys[-1]
+            if len(page) < self.page_size or not keys:
+                break
+        return stored, rejected
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill the telemetry store from Firebase")
+    parser.add_argument('--root', default=STORE_ROOT, help="Store directory")
+    parser.add_argument('--sensor', action='append', help="Firebase user id (repeatable; default GLOF_FIREBASE_SENSORS)")
+    args = parser.parse_args()
+
+    syncer = FirebaseSync(TelemetryStore(args.root))
+    for sensor in args.sensor or SENSORS:
+        stored, rejected = syncer.sync(sensor)
+        print(f"Stored {stored} new readings for sensor {sensor}")
+        if rejected:
+            print(f"Skipped {len(rejected)} readings with invalid timestamps: {', '.join(rejected[:10])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import os
+import sys
+import threading
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from telemetry_rollups import RESOLUTIONS, TelemetryRollups
+from telemetry_store import TelemetryStore
+
+def test_concurrent_updates_write_each_bucket_once(tmp_path):
+    store = TelemetryStore(str(tmp_path / 'store'))
+    # Three days of readings every 20 seconds
+    timestamps = 1700006400 + 20 * np.arange(3 * 86400 // 20)
+    store.append('sensor-1', {'timestamp': timestamps, 'air_temp_C': np.sin(timestamps / 3600.0)})
+    rollups = TelemetryRollups(store, str(tmp_path / 'rollups'))
+
+    # The server updates one sensor from its rollup loop, the Firebase sync and POST /readings
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def update():
+        barrier.wait()
+        try:
+            rollups.update('sensor-1')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=update) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    for resolution in RESOLUTIONS:
+        buckets = rollups.read('sensor-1', resolution)['bucket']
+        assert len(buckets) == len(np.unique(buckets)), resolution
+    assert len(rollups.read('sensor-1', 'minute')['bucket']) == 3 * 1440 - 1
@@ -0,0 +1,48 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from telemetry_store import TelemetryStore
+
+def _snapshot(start, n):
+    return {str(start + 60 * i): {'floatTemperature': i, 'floatHumidity': 50} for i in range(n)}
+
+def test_concurrent_ingest_stores_each_reading_once(tmp_path):
+    store = TelemetryStore(str(tmp_path))
+    latest_timestamp = store.latest_timestamp
+
+    def slow_latest_timestamp(sensor):
+        # Widen the window between the check and the append, so an unlocked ingest would interleave
+        latest = latest_timestamp(sensor)
+        time.sleep(0.2)
+        return latest
+
+    store.latest_timestamp = slow_latest_timestamp
+
+    # Overlapping snapshots, as sent by POST /readings and the Firebase sync (150 readings either way round)
+    snapshots = [_snapshot(1700000000, 100), _snapshot(1700000000, 150)]
+    barrier = threading.Barrier(len(snapshots))
+    results = []
+
+    def ingest(readings):
+        barrier.wait()
+        results.append(store.ingest_firebase('sensor-1', readings))
+
+    threads = [threading.Thread(target=ingest, args=(readings,)) for readings in snapshots]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    timestamps = store.query(['sensor-1'], columns=['timestamp']).column('timestamp').to_pylist()
+    assert len(timestamps) == len(set(timestamps)) == 150
+    assert sum(stored for stored, _ in results) == 150
+    assert all(rejected == [] for _, rejected in results)
+
+def test_ingest_skips_invalid_keys(tmp_path):
+    store = TelemetryStore(str(tmp_path))
+    stored, rejected = store.ingest_firebase('sensor-1', {'1700000000': {'floatTemperature': 1}, 'oops': {}, 'nan': {}})
+    assert stored == 1
+    assert rejected == ['oops', 'nan']